@@ -0,0 +1,182 @@
+# benchmarks/run_benchmarks.py
+"""Mesure les opérations principales de la table sur des jeux de tokens synthétiques.
+
+Tourne sans écran (plateforme Qt offscreen) et écrit les résultats en JSON
+pour comparer deux versions :
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 1000000
+    python benchmarks/run_benchmarks.py --sizes 10000 --repeat 5 -o before.json
+    python benchmarks/run_benchmarks.py --sizes 10000 --repeat 5 --baseline before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QItemSelection, QItemSelectionModel, Qt
+from PyQt5.QtWidgets import QApplication
+
+import storage
+from table_manager import TokenTableWidget
+
+CHAINS = ["eth", "polygon", "arbitrum", "base", "optimism"]
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+# ========== DONNEES ==========
+def make_tokens(rows, seed=0):
+    """Table de tokens réaliste : clé (adresse hex, id, chaîne) + colonnes numériques et texte."""
+    rng = np.random.default_rng(seed)
+    contracts = np.array([f"0x{value:040x}" for value in rng.integers(0, 2**62, max(rows // 50, 1))], dtype=object)
+    return pd.DataFrame({
+        "contract_address": contracts[rng.integers(0, len(contracts), rows)],
+        "token_id": rng.integers(0, 10_000, rows),
+        "chain": np.array(CHAINS, dtype=object)[rng.integers(0, len(CHAINS), rows)],
+        "price": rng.gamma(2.0, 0.5, rows).round(4),
+        "volume": rng.integers(0, 1_000_000, rows),
+        "name": np.array([f"Token #{i}" for i in range(rows)], dtype=object),
+        "rarity": np.array(["common", "rare", "epic", "legendary"], dtype=object)[rng.integers(0, 4, rows)],
+        "note": np.where(rng.random(rows) < 0.1, "à vérifier", None).astype(object),
+    })
+
+
+# ========== MESURES ==========
+def timed(action, repeat, setup=None):
+    """Durées (s) de `repeat` exécutions ; `setup` remet l'état en place hors chronométrage."""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - start)
+    return {
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "max": max(durations),
+        "runs": len(durations),
+    }
+
+
+def select_rows(table, rows):
+    selection = QItemSelection()
+    last_col = table.columnCount() - 1
+    for row in rows:
+        selection.select(table.model.index(row, 0), table.model.index(row, last_col))
+    table.selectionModel().select(selection, QItemSelectionModel.ClearAndSelect)
+
+
+def load(table, path, rows):
+    """Comme table.load_data, mais sans avaler les erreurs : un échec interrompt le benchmark."""
+    table.store.load(path)
+    table.show_data()
+    if len(table.df) != rows:
+        raise RuntimeError(f"{path.name} : {len(table.df)} lignes chargées sur {rows}")
+
+
+def bench_size(rows, repeat, workdir):
+    df = make_tokens(rows)
+    path = Path(workdir) / f"tokens_{rows}.parquet"
+    storage.save_table(path, df, {})
+    table = TokenTableWidget()
+    model = table.model
+    results = {}
+
+    # Store appelé directement : table.load_data / save_data journalisent les erreurs sans les lever
+    results["load_data"] = timed(lambda: load(table, path, rows), repeat)
+    results["save_data"] = timed(lambda: table.store.save(Path(workdir) / f"saved_{rows}.parquet"), repeat)
+    results["update_table_from_df"] = timed(table.update_table_from_df, repeat)
+
+    # Filtres : expression neuve à chaque passe pour ne pas mesurer le cache
+    thresholds = iter(np.linspace(1.0, 2.0, repeat))
+    results["apply_filter"] = timed(lambda: table.apply_filter(f"price > {next(thresholds):.6f} and chain == 'eth'"), repeat)
+    table.reset_filters()
+    terms = iter(f"#{i}" for i in range(1, repeat + 1))
+    results["filter_table"] = timed(lambda: table.filter_table(next(terms)), repeat)
+    table.filter_table("")
+
+    values = iter(range(repeat))
+    results["cell_edit"] = timed(lambda: model.setData(model.index(rows // 2, 4), str(next(values)), Qt.EditRole), repeat)
+    results["undo"] = timed(
+        table.undo, repeat,
+        setup=lambda: model.setData(model.index(rows // 3, 4), "42", Qt.EditRole),
+    )
+
+    # Collage : 1 % des lignes sur 3 colonnes (numérique, numérique, texte), contenu neuf à chaque passe
+    height = max(rows // 100, 1)
+    blocks = iter(
+        np.column_stack([
+            (np.arange(height) + run).astype(str),
+            (np.arange(height) + run).astype(str),
+            np.array([f"collé {i + run}" for i in range(height)]),
+        ]).astype(object)
+        for run in range(repeat)
+    )
+    results["paste"] = timed(lambda: table.paste_block(next(blocks), rows // 4, 3), repeat)
+
+    # Suppression : 1 % des lignes, réparties sur toute la table
+    step = max(len(table.filtered_index) // height, 1)
+    results["row_delete"] = timed(
+        table.delete_selected_rows, repeat,
+        setup=lambda: select_rows(table, range(0, len(table.filtered_index), step)),
+    )
+
+    table.deleteLater()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de la table de tokens (Qt offscreen).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="Fichier JSON (par défaut : benchmarks/results/<date>.json)")
+    parser.add_argument("--baseline", help="Résultats JSON d'une exécution précédente, pour comparaison")
+    args = parser.parse_args(argv)
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["sizes"] if args.baseline else {}
+
+    app = QApplication.instance() or QApplication([])
+    report = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            print(f"⏱️ {rows} lignes…", flush=True)
+            try:
+                report["sizes"][str(rows)] = bench_size(rows, args.repeat, workdir)
+            except Exception as e:
+                print(f"❌ {rows} lignes : {type(e).__name__}: {e}", file=sys.stderr)
+                return 1
+            app.processEvents()
+            previous = baseline.get(str(rows), {})
+            for name, timing in report["sizes"][str(rows)].items():
+                line = f"   {name:<22} {timing['median'] * 1000:10.1f} ms"
+                if name in previous:
+                    line += f"   (×{previous[name]['median'] / max(timing['median'], 1e-9):.2f} vs référence)"
+                print(line)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y-%m-%d_%H-%M-%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"📄 Résultats : {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
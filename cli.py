@@ -0,0 +1,118 @@
+# cli.py
+"""Traitements en lot sur les fichiers de données, sans interface graphique.
+
+Exemples :
+    python cli.py filter data/token_data.parquet "chain == 'eth'" -o exports/eth.xlsx
+    python cli.py export data/token_data.parquet exports/export.xlsx
+    python cli.py dedupe data/token_data.parquet --keep last
+    python cli.py import data/token_data.parquet data/import.xlsx
+    python cli.py export data/token_data.parquet data/token_data.sqlite
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import config
+import instrumentation
+from logger import logger
+from token_store import TokenStore
+
+
+def open_store(path, expression=None):
+    # Pas d'historique : aucune copie des lignes supprimées ou remplacées
+    store = TokenStore(max_undo=0)
+    store.load(path, expression=expression)
+    logger.info(f"📂 {path} : {len(store)} lignes, {len(store.df.columns)} colonnes")
+    return store
+
+
+def save_store(store, path):
+    store.save(path)
+    logger.info(f"💾 {path} : {len(store)} lignes écrites")
+
+
+# ========== COMMANDES ==========
+def run_filter(args):
+    store = open_store(args.source, args.expression)  # SQLite : filtre appliqué par la requête
+    visible = np.ones(len(store), dtype=bool)
+    if args.expression:
+        visible &= store.advanced_filter_mask(args.expression)
+    if args.search:
+        text = store.normalize_text(args.search)
+        visible &= store.search_index.search(store.df, store.visible_column_names(), text)
+    store.delete_rows(np.flatnonzero(~visible))
+    logger.info(f"🔍 Filtre : {len(store)} lignes retenues")
+    save_store(store, args.output)
+
+
+def run_export(args):
+    store = open_store(args.source)
+    save_store(store, args.output)
+
+
+def run_dedupe(args):
+    store = open_store(args.source)
+    positions = store.duplicate_key_positions(keep=args.keep)
+    store.delete_rows(positions)
+    logger.info(f"🧹 Dédoublonnage : {len(positions)} lignes supprimées")
+    save_store(store, args.output or args.source)
+
+
+def run_import(args):
+    store = open_store(args.target)
+    store.import_file(args.source, args.chunk_size)
+    save_store(store, args.output or args.target)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Token Manager : traitements en lot sans interface.")
+    parser.add_argument("--perf", action="store_true", help="Mesure les méthodes critiques et journalise un résumé.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    filter_parser = commands.add_parser("filter", help="Écrit les lignes qui satisfont un filtre.")
+    filter_parser.add_argument("source")
+    filter_parser.add_argument("expression", nargs="?", default="", help="Expression du filtre avancé (df.eval).")
+    filter_parser.add_argument("-s", "--search", default="", help="Texte de recherche rapide.")
+    filter_parser.add_argument("-o", "--output", required=True)
+    filter_parser.set_defaults(run=run_filter)
+
+    export_parser = commands.add_parser("export", help="Convertit un fichier (format déduit de l'extension).")
+    export_parser.add_argument("source")
+    export_parser.add_argument("output")
+    export_parser.set_defaults(run=run_export)
+
+    dedupe_parser = commands.add_parser("dedupe", help="Supprime les lignes dont la clé est en double.")
+    dedupe_parser.add_argument("source")
+    dedupe_parser.add_argument("--keep", choices=["first", "last"], default="first")
+    dedupe_parser.add_argument("-o", "--output", help="Fichier de sortie (par défaut : le fichier source).")
+    dedupe_parser.set_defaults(run=run_dedupe)
+
+    import_parser = commands.add_parser("import", help="Ajoute les lignes d'un fichier csv / parquet / xlsx.")
+    import_parser.add_argument("target", help="Fichier de données qui reçoit les lignes.")
+    import_parser.add_argument("source", help="Fichier à importer.")
+    import_parser.add_argument("--chunk-size", type=int, default=config.IO_CHUNK_ROWS)
+    import_parser.add_argument("-o", "--output", help="Fichier de sortie (par défaut : le fichier cible).")
+    import_parser.set_defaults(run=run_import)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    instrumentation.enable(args.perf or instrumentation.enabled)
+    start = time.perf_counter()
+    try:
+        args.run(args)
+    except Exception as e:
+        logger.error(f"❌ {args.command} : {e}")
+        return 1
+    logger.info(f"✅ {args.command} terminé en {time.perf_counter() - start:.2f} s")
+    if instrumentation.enabled:
+        instrumentation.log_summary()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# compaction.py
+
+import numpy as np
+import pandas as pd
+
+import config
+
+try:
+    import pyarrow  # noqa: F401 (stockage Arrow des colonnes de texte)
+    TEXT_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:  # pyarrow absent : le texte reste en object
+    TEXT_DTYPE = None
+
+
+def is_text(values):
+    """True si toutes les valeurs non vides sont des str (et qu'il y en a)."""
+    return pd.api.types.infer_dtype(values, skipna=True) == "string"
+
+
+def compact_series(series):
+    """Type compact d'une colonne, sans perte.
+
+    Texte : catégories si peu de valeurs distinctes, sinon stockage Arrow.
+    Entiers : le plus petit type signé qui contient les valeurs. Flottants :
+    float32 si chaque valeur s'y écrit exactement. Les autres colonnes
+    (booléens, dates, texte mélangé à des nombres...) sont laissées telles quelles.
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pd.StringDtype) and series.count():
+        pass  # texte déjà typé (parquet écrit par pandas) : mêmes règles que le texte object
+    elif pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return series
+    elif pd.api.types.is_integer_dtype(dtype):
+        return pd.to_numeric(series, downcast="integer")
+    elif dtype == np.float64:
+        values = series.to_numpy()
+        narrow = values.astype(np.float32)
+        same = (narrow.astype(np.float64) == values) | np.isnan(values)
+        return series.astype(np.float32) if same.all() else series
+    elif dtype != object or not is_text(series):
+        return series
+
+    distinct = series.nunique(dropna=True)
+    if distinct <= min(config.COMPACT_CATEGORY_RATIO * series.count(), config.COMPACT_CATEGORY_MAX):
+        return series.astype("category")
+    if TEXT_DTYPE is not None:
+        return series.astype(TEXT_DTYPE)
+    return series
+
+
+def compact_frame(df, columns=None):
+    """Compacte les colonnes `columns` (toutes si None) ; retourne {colonne: nouveau type}."""
+    changed = {}
+    for column in df.columns if columns is None else columns:
+        values = compact_series(df[column])
+        if values.dtype != df[column].dtype:
+            df[column] = values
+            changed[column] = values.dtype
+    return changed
+
+
+def memory_mb(df, columns=None):
+    """Mémoire occupée (Mo, memory_usage(deep=True)) par les colonnes `columns`, toutes si None."""
+    if columns is None:
+        return df.memory_usage(deep=True).sum() / (1024 * 1024)
+    return sum(df[column].memory_usage(deep=True, index=False) for column in columns) / (1024 * 1024)
+
+
+def is_nullable_int(dtype):
+    return isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype)
+
+
+def is_compact(dtype):
+    """Types produits par compact_series (ou nullable_dtype), à préserver lors des éditions."""
+    if isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)):
+        return True
+    if is_nullable_int(dtype):
+        return dtype.itemsize < 8
+    return dtype in (np.int8, np.int16, np.int32, np.float32)
+
+
+def nullable_dtype(dtype):
+    """Entier nullable de même taille (Int8...) : une cellule vidée ne fait pas passer la colonne en float64."""
+    if is_nullable_int(dtype):
+        return dtype
+    return pd.api.types.pandas_dtype(dtype.name.capitalize())
+
+
+def fitting_dtype(dtype, values):
+    """Type qui reçoit `values` sans perte en restant compact : `dtype` lui-même,
+    un entier plus large, float64, des catégories ajoutées, ou object (valeurs
+    autres que du texte dans une colonne de texte)."""
+    if not is_compact(dtype):
+        return dtype
+    values = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    present = values[values.notna().to_numpy()]
+    if not len(present):
+        return dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        if not is_text(present):
+            return np.dtype(object)
+        new = pd.Index(pd.unique(present.to_numpy(dtype=object))).difference(dtype.categories)
+        return pd.CategoricalDtype(dtype.categories.append(new)) if len(new) else dtype
+    if isinstance(dtype, pd.StringDtype):
+        return dtype if is_text(present) else np.dtype(object)
+    if is_nullable_int(dtype):
+        target = fitting_dtype(dtype.numpy_dtype, present)
+        return nullable_dtype(target) if pd.api.types.is_integer_dtype(target) else target
+
+    numbers = pd.to_numeric(present, errors="coerce").to_numpy(dtype=np.float64)
+    if np.isnan(numbers).any():
+        return np.dtype(object)  # texte dans une colonne de nombres, comme à la saisie
+    if dtype == np.float32:
+        exact = numbers.astype(np.float32).astype(np.float64) == numbers
+        return dtype if exact.all() else np.dtype(np.float64)
+    if (numbers % 1 != 0).any():
+        return np.dtype(np.float64)
+    for candidate in (dtype, np.int16, np.int32, np.int64):
+        info = np.iinfo(candidate)
+        if info.min <= numbers.min() and numbers.max() <= info.max and np.dtype(candidate).itemsize >= dtype.itemsize:
+            return np.dtype(candidate)
+    return np.dtype(np.float64)
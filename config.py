@@ -8,22 +8,38 @@ DATA_DIR = BASE_DIR / "data"
 EXPORT_DIR = BASE_DIR / "exports"
 LOG_DIR = BASE_DIR / "logs"
 
-DEFAULT_DB_FILE = DATA_DIR / "token_data.xlsx"
+DEFAULT_DB_FILE = DATA_DIR / "token_data.parquet"  # store principal (colonnaire)
+LEGACY_DB_FILE = BASE_DIR / "data.xlsx"  # ancien format, lu si le store n'existe pas encore
 IMPORT_FILE = DATA_DIR / "import.xlsx"
 EXPORT_FILE = EXPORT_DIR / "export.xlsx"
 
 # === COLONNES IMMUTABLES ===
 IMMUTABLE_COLUMNS = ["contract_address", "token_id", "chain"]
+UNIQUE_TOKEN_KEYS = False  # True : refuser toute ligne dont la clé existe déjà
 
 # === CONFIG TABLE ===
 CHECKBOX_COLUMN = "✔️"
 LOCKED_CELL_STYLE = "font-weight: bold;"
 MODIFIED_CELL_COLOR = "#FFFACD"  # light yellow
 
+IO_CHUNK_ROWS = 50_000  # lignes par paquet en lecture / écriture de fichiers
+FILTER_CACHE_SIZE = 32  # masques de filtre avancé gardés en cache (LRU)
+SORT_CACHE_SIZE = 8  # permutations de tri gardées en cache (LRU)
+SEARCH_CACHE_SIZE = 16  # résultats de recherche rapide gardés en cache (LRU)
+QUICK_SEARCH_DELAY_MS = 200  # délai de frappe avant de lancer la recherche rapide
+PERF_INSTRUMENTATION = False  # mesure des méthodes critiques, résumé dans les logs
+JOURNAL_SYNC_MS = 1000  # fsync du journal des modifications au plus une fois par intervalle
+JOURNAL_COMPACT_BYTES = 64 * 1024 * 1024  # au-delà, le journal est replié dans le fichier de données
+LAZY_HIDDEN_COLUMNS = True  # parquet / feather : colonnes masquées lues seulement à leur premier usage
+COMPACT_DTYPES = True  # au chargement et à l'import : catégories, entiers / flottants réduits, texte Arrow
+COMPACT_CATEGORY_RATIO = 0.05  # texte en catégories si valeurs distinctes <= ratio × valeurs non vides
+COMPACT_CATEGORY_MAX = 10_000  # ... et au plus ce nombre de valeurs distinctes
+
 # === UI ===
 WINDOW_TITLE = "Token Manager"
 WINDOW_WIDTH = 1400
 WINDOW_HEIGHT = 800
 
 # === DIVERS ===
-MAX_UNDO_STACK = 100
\ No newline at end of file
+MAX_UNDO_STACK = 100
+MAX_UNDO_BYTES = 256 * 1024 * 1024  # budget mémoire de l'historique undo/redo
\ No newline at end of file
@@ -0,0 +1,81 @@
+# filter_cache.py
+
+import io
+import re
+import tokenize
+from collections import OrderedDict
+
+import config
+
+BACKTICK_PATTERN = re.compile(r"`([^`]*)`")
+
+
+def normalize_expression(expression):
+    """Forme canonique d'une expression (espaces hors chaînes littérales ignorés)."""
+    try:
+        tokens = tokenize.generate_tokens(io.StringIO(expression.strip()).readline)
+        return " ".join(
+            token.string for token in tokens
+            if token.type not in (tokenize.NEWLINE, tokenize.NL, tokenize.ENDMARKER, tokenize.INDENT, tokenize.DEDENT)
+        )
+    except (tokenize.TokenError, SyntaxError, IndentationError):
+        return expression.strip()
+
+
+def referenced_columns(expression, columns):
+    """Colonnes citées dans l'expression ; toutes les colonnes si on ne sait pas le déterminer."""
+    names = set(BACKTICK_PATTERN.findall(expression))
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(BACKTICK_PATTERN.sub(" ", expression)).readline):
+            if token.type == tokenize.NAME:
+                names.add(token.string)
+    except (tokenize.TokenError, SyntaxError, IndentationError):
+        return set(columns)
+    return {column for column in columns if str(column) in names}
+
+
+class FilterCache:
+    """Cache LRU des masques du filtre avancé.
+
+    La clé combine l'expression normalisée, la version de structure (ajout,
+    suppression, réordonnancement de lignes) et la version de chaque colonne
+    citée : une édition ne périme que les filtres qui lisent sa colonne.
+    """
+
+    def __init__(self, max_entries=config.FILTER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.column_versions = {}
+        self.structure_version = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.structure_version += 1
+
+    def bump_columns(self, columns):
+        for column in columns:
+            self.column_versions[column] = self.column_versions.get(column, 0) + 1
+
+    def bump_structure(self):
+        self.structure_version += 1
+
+    def key(self, expression, columns):
+        refs = sorted(referenced_columns(expression, columns), key=str)
+        return (
+            normalize_expression(expression),
+            self.structure_version,
+            tuple((column, self.column_versions.get(column, 0)) for column in refs),
+        )
+
+    def get(self, expression, columns, compute):
+        """Masque en cache pour `expression`, sinon `compute()` puis mise en cache."""
+        key = self.key(expression, columns)
+        mask = self.entries.get(key)
+        if mask is None:
+            mask = compute()
+            self.entries[key] = mask
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return mask.copy()
@@ -0,0 +1,475 @@
+# history.py
+
+import sys
+from abc import ABC, abstractmethod
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import config
+from instrumentation import timed
+from logger import logger
+
+ENTRY_OVERHEAD = 128  # octets comptés par entrée (objet + références)
+
+
+def value_nbytes(value):
+    return sys.getsizeof(value) if value is not None else 0
+
+
+def array_nbytes(values):
+    values = np.asarray(values)
+    if values.dtype == object:
+        return values.nbytes + sum(value_nbytes(v) for v in values)
+    return values.nbytes
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum()) if df is not None else 0
+
+
+def series_nbytes(series):
+    if isinstance(series, pd.Series):
+        return int(series.memory_usage(index=True, deep=True))
+    return value_nbytes(series)
+
+
+def dtypes_at(dtypes, index):
+    """{colonne: (type avant, type après)} → {colonne: type avant} (index 0) ou après (1)."""
+    return {column: pair[index] for column, pair in dtypes.items()}
+
+
+# ========== OPERATIONS ==========
+# Chaque opération ne garde que le delta nécessaire pour être rejouée dans les
+# deux sens. `table` expose les primitives d'édition (write_cells,
+# insert_rows_at, remove_rows_at, ...), qui n'enregistrent rien dans l'historique.
+
+class Operation(ABC):
+    label = "modification"
+    structural = True  # False : seules quelques cellules sont à rafraîchir
+    rows_only = False  # True : lignes ajoutées / retirées, colonnes et filtres inchangés
+    keyed = False  # True : ne désigne les lignes que par leur identifiant (voir UndoHistory.replayable)
+
+    @abstractmethod
+    def undo(self, table):
+        ...
+
+    @abstractmethod
+    def redo(self, table):
+        ...
+
+    def cells(self):
+        """Cellules (row_id, colonne) touchées par une opération non structurelle."""
+        return []
+
+    def touched_rows(self, table):
+        """Identifiants des lignes insérées ou supprimées par l'opération."""
+        return []
+
+    def journal_copy(self, table):
+        """Version autonome de l'opération (rejouable sans l'état du DataFrame), pour le journal."""
+        return self
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD
+
+
+class CellEdit(Operation):
+    label = "édition de cellule"
+    structural = False
+    keyed = True
+
+    def __init__(self, row_id, column, old, new, dtypes=None):
+        self.row_id = row_id
+        self.column = column
+        self.old = old
+        self.new = new
+        self.dtypes = dtypes or {}  # type de colonne élargi par l'édition : rétabli à l'undo
+
+    def undo(self, table):
+        table.write_cells([self.row_id], [self.column], [self.old])
+        table.set_dtypes(dtypes_at(self.dtypes, 0))
+
+    def redo(self, table):
+        table.set_dtypes(dtypes_at(self.dtypes, 1))
+        table.write_cells([self.row_id], [self.column], [self.new])
+
+    def cells(self):
+        return [(self.row_id, self.column)]
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + value_nbytes(self.old) + value_nbytes(self.new)
+
+
+class CellsEdit(Operation):
+    """Édition groupée (coller, couper, effacer) : une seule entrée d'historique."""
+    label = "édition de cellules"
+    structural = False
+    keyed = True
+
+    def __init__(self, row_ids, columns, olds, news, dtypes=None):
+        self.row_ids = list(row_ids)
+        self.columns = list(columns)
+        self.olds = list(olds)
+        self.news = list(news)
+        self.dtypes = dtypes or {}
+
+    def undo(self, table):
+        table.write_cells(self.row_ids, self.columns, self.olds)
+        table.set_dtypes(dtypes_at(self.dtypes, 0))
+
+    def redo(self, table):
+        table.set_dtypes(dtypes_at(self.dtypes, 1))
+        table.write_cells(self.row_ids, self.columns, self.news)
+
+    def cells(self):
+        return list(zip(self.row_ids, self.columns))
+
+    @property
+    def nbytes(self):
+        payload = sum(value_nbytes(v) for v in self.olds) + sum(value_nbytes(v) for v in self.news)
+        return ENTRY_OVERHEAD + payload + 16 * len(self.row_ids)
+
+
+class BlockEdit(Operation):
+    """Écriture d'un bloc de cellules (collage) : par colonne, les identifiants des
+    lignes écrites et les anciennes / nouvelles valeurs sous forme de tableaux."""
+    label = "collage"
+    structural = False
+    keyed = True
+
+    def __init__(self, columns, row_ids, olds, news, dtypes=None):
+        self.columns = list(columns)
+        self.row_ids = list(row_ids)
+        self.olds = list(olds)
+        self.news = list(news)
+        self.dtypes = dtypes or {}
+
+    def undo(self, table):
+        for column, row_ids, values in zip(self.columns, self.row_ids, self.olds):
+            table.write_block(row_ids, column, values)
+        table.set_dtypes(dtypes_at(self.dtypes, 0))
+
+    def redo(self, table):
+        table.set_dtypes(dtypes_at(self.dtypes, 1))
+        for column, row_ids, values in zip(self.columns, self.row_ids, self.news):
+            table.write_block(row_ids, column, values)
+
+    def cells(self):
+        return [(row_id, column) for column, row_ids in zip(self.columns, self.row_ids) for row_id in row_ids]
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + sum(array_nbytes(a) for a in self.row_ids + self.olds + self.news)
+
+
+class RowsInsert(Operation):
+    """Insertion de lignes : positions finales + contenu (identifiants de ligne compris).
+
+    Les verrous sont rattachés aux identifiants : ils suivent les lignes sans
+    être stockés ici.
+    """
+    label = "insertion de lignes"
+    rows_only = True
+
+    def __init__(self, positions, rows):
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.rows = rows
+
+    def undo(self, table):
+        table.remove_rows_at(self.positions)
+
+    def redo(self, table):
+        table.insert_rows_at(self.positions, self.rows)
+
+    def touched_rows(self, table):
+        return self.rows.index
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + self.positions.nbytes + frame_nbytes(self.rows)
+
+
+class RowsDelete(RowsInsert):
+    """Pas `rows_only` : l'undo réinsère les lignes visibles, les filtres actifs
+    doivent être réévalués (comme pour RowsAppend)."""
+    label = "suppression de lignes"
+    rows_only = False
+
+    def undo(self, table):
+        RowsInsert.redo(self, table)
+
+    def redo(self, table):
+        RowsInsert.undo(self, table)
+
+
+class RowsDuplicate(Operation):
+    """Duplication de lignes : chaque copie est placée juste après sa ligne d'origine.
+
+    Au redo, les copies sont reconstruites à partir des originaux (l'état est
+    alors celui d'avant la duplication) : l'entrée ne garde que les positions
+    d'origine et les identifiants des copies.
+    """
+    label = "duplication de lignes"
+    rows_only = True
+
+    def __init__(self, sources, row_ids):
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.row_ids = np.asarray(row_ids)
+
+    def targets(self):
+        return self.sources + np.arange(1, len(self.sources) + 1)
+
+    def undo(self, table):
+        table.remove_rows_at(self.targets())
+
+    def redo(self, table):
+        table.duplicate_rows_at(self.sources, self.row_ids)
+
+    def touched_rows(self, table):
+        return self.row_ids
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + self.sources.nbytes + self.row_ids.nbytes
+
+
+class RowsAppend(Operation):
+    """Lignes ajoutées en fin de table (import par paquets).
+
+    Tant que l'opération est appliquée, les lignes sont dans le DataFrame :
+    l'entrée ne garde rien. Leur contenu n'est conservé qu'après un undo,
+    le temps qu'elle reste dans la pile redo. Pas `rows_only` : les lignes
+    importées sont insérées visibles, les filtres actifs doivent être réévalués.
+    """
+    label = "import de lignes"
+
+    def __init__(self, start, count):
+        self.start = start
+        self.count = count
+        self.rows = None
+
+    def positions(self):
+        return np.arange(self.start, self.start + self.count)
+
+    def undo(self, table):
+        self.rows = table.remove_rows_at(self.positions())
+
+    def redo(self, table):
+        table.insert_rows_at(self.positions(), self.rows)
+        self.rows = None
+
+    def touched_rows(self, table):
+        return self.rows.index if self.rows is not None else table.df.index[self.positions()]
+
+    def journal_copy(self, table):
+        if self.rows is not None:
+            return self
+        # Lignes appliquées : leur contenu n'est que dans le DataFrame, on le capture
+        return RowsInsert(self.positions(), table.df.iloc[self.positions()])
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + frame_nbytes(self.rows)
+
+
+class ColumnInsert(Operation):
+    label = "ajout de colonne"
+
+    def __init__(self, position, name, values, locked_rows=(), hidden=False):
+        self.position = position
+        self.name = name
+        self.values = values
+        self.locked_rows = list(locked_rows)
+        self.hidden = hidden
+
+    def undo(self, table):
+        table.remove_column_at(self.position)
+
+    def redo(self, table):
+        table.insert_column_at(self.position, self.name, self.values, self.locked_rows, self.hidden)
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + series_nbytes(self.values) + 8 * len(self.locked_rows)
+
+
+class ColumnDelete(ColumnInsert):
+    label = "suppression de colonne"
+
+    def undo(self, table):
+        ColumnInsert.redo(self, table)
+
+    def redo(self, table):
+        ColumnInsert.undo(self, table)
+
+
+class ColumnRename(Operation):
+    label = "renommage de colonne"
+    keyed = True
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+
+    def undo(self, table):
+        table.set_column_name(self.new, self.old)
+
+    def redo(self, table):
+        table.set_column_name(self.old, self.new)
+
+
+class ColumnMove(Operation):
+    label = "déplacement de colonne"
+    keyed = True
+
+    def __init__(self, from_index, to_index):
+        self.from_index = from_index
+        self.to_index = to_index
+
+    def undo(self, table):
+        table.move_column_at(self.to_index, self.from_index)
+
+    def redo(self, table):
+        table.move_column_at(self.from_index, self.to_index)
+
+
+class LocksChange(Operation):
+    label = "verrouillage"
+    structural = False
+    keyed = True
+
+    def __init__(self, cells, locked):
+        self.lock_cells = list(cells)  # (row_id, colonne)
+        self.locked = locked
+
+    def undo(self, table):
+        table.set_locks(self.lock_cells, not self.locked)
+
+    def redo(self, table):
+        table.set_locks(self.lock_cells, self.locked)
+
+    def cells(self):
+        return self.lock_cells
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + 64 * len(self.lock_cells)
+
+
+class CompoundOperation(Operation):
+    """Plusieurs opérations annulées / rétablies comme une seule entrée."""
+
+    def __init__(self, operations, label=None):
+        self.operations = list(operations)
+        self.label = label or "modification groupée"
+        self.structural = any(op.structural for op in self.operations)
+        self.rows_only = all(op.rows_only for op in self.operations)
+        self.keyed = all(op.keyed for op in self.operations)
+
+    def undo(self, table):
+        for op in reversed(self.operations):
+            op.undo(table)
+
+    def redo(self, table):
+        for op in self.operations:
+            op.redo(table)
+
+    def cells(self):
+        return [cell for op in self.operations for cell in op.cells()]
+
+    def touched_rows(self, table):
+        return [row_id for op in self.operations for row_id in op.touched_rows(table)]
+
+    def journal_copy(self, table):
+        return CompoundOperation([op.journal_copy(table) for op in self.operations], self.label)
+
+    @property
+    def nbytes(self):
+        return sum(op.nbytes for op in self.operations)
+
+
+# ========== HISTORIQUE ==========
+class UndoHistory:
+    """Piles undo / redo bornées en nombre d'entrées et en octets."""
+
+    def __init__(self, max_entries=config.MAX_UNDO_STACK, max_bytes=config.MAX_UNDO_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = deque()
+        self.total_bytes = 0
+
+    def __len__(self):
+        return len(self.undo_stack)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.total_bytes = 0
+
+    @timed("history.push")
+    def push(self, op):
+        for dropped in self.redo_stack:
+            self.total_bytes -= dropped.nbytes
+        self.redo_stack.clear()
+        if not self.max_entries:
+            return  # historique désactivé (traitements en lot)
+
+        size = op.nbytes
+        if size > self.max_bytes:
+            # Les entrées plus anciennes désignent des positions que cette opération a décalées
+            logger.warning(
+                f"⚠️ {op.label} trop volumineuse pour l'historique ({size} octets), undo impossible : historique vidé."
+            )
+            self.clear()
+            return
+        self.undo_stack.append(op)
+        self.total_bytes += size
+        self.enforce_limits()
+
+    def replayable(self, row_ids):
+        """True si chaque entrée reste applicable à un DataFrame réduit aux lignes `row_ids`
+        (vue SQLite rechargée) : lignes désignées par identifiant, et toutes présentes."""
+        entries = list(self.undo_stack) + list(self.redo_stack)
+        if not all(op.keyed for op in entries):
+            return False
+        touched = pd.Index([row_id for op in entries for row_id, _ in op.cells()])
+        return bool(touched.isin(row_ids).all())
+
+    def enforce_limits(self):
+        while self.undo_stack and (len(self.undo_stack) > self.max_entries or self.total_bytes > self.max_bytes):
+            self.total_bytes -= self.undo_stack.popleft().nbytes
+        if self.total_bytes > self.max_bytes:
+            # Reste une entrée redo trop volumineuse (lignes retirées par un undo)
+            logger.warning("⚠️ Historique redo trop volumineux, vidé.")
+            self.redo_stack.clear()
+            self.total_bytes = 0
+
+    def undo(self, table):
+        if not self.undo_stack:
+            return None
+        op = self.undo_stack.pop()
+        size = op.nbytes
+        op.undo(table)
+        self.redo_stack.append(op)
+        self.resized(op, size)
+        return op
+
+    def redo(self, table):
+        if not self.redo_stack:
+            return None
+        op = self.redo_stack.pop()
+        size = op.nbytes
+        op.redo(table)
+        self.undo_stack.append(op)
+        self.resized(op, size)
+        return op
+
+    def resized(self, op, size):
+        """Une entrée peut changer de taille en changeant de pile (RowsAppend) : budget mis à jour."""
+        self.total_bytes += op.nbytes - size
+        self.enforce_limits()
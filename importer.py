@@ -0,0 +1,78 @@
+# importer.py
+
+from pathlib import Path
+
+import pandas as pd
+
+import config
+import storage
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow absent : import parquet indisponible
+    pq = None
+
+
+def iter_chunks(path, chunk_size=config.IO_CHUNK_ROWS):
+    """Lit un fichier d'import par paquets de lignes sans le charger en entier.
+
+    Produit (DataFrame, avancement 0..1). Formats : xlsx (openpyxl read-only),
+    csv et parquet.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        size = path.stat().st_size or 1
+        with open(path, "rb") as handle:
+            for chunk in pd.read_csv(handle, chunksize=chunk_size):
+                yield chunk, min(handle.tell() / size, 1.0)
+        return
+
+    if suffix in storage.PARQUET_SUFFIXES:
+        if pq is None:
+            raise ImportError("pyarrow est requis pour importer un fichier parquet")
+        parquet_file = pq.ParquetFile(path)
+        total = parquet_file.metadata.num_rows or 1
+        done = 0
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            done += batch.num_rows
+            yield batch.to_pandas(), done / total
+        return
+
+    if suffix in storage.EXCEL_SUFFIXES:
+        for header, rows, percent in storage.iter_excel_chunks(path, 'Data', chunk_size):
+            if rows:
+                yield storage.excel_rows_to_frame(header, rows), percent
+        return
+
+    raise ValueError(f"Format d'import non supporté : {path}")
+
+
+def coerce_chunk(chunk, dtypes):
+    """Aligne un paquet sur les colonnes et les types de la table.
+
+    `dtypes` : types des colonnes existantes. Les colonnes absentes du paquet
+    sont ajoutées vides, les colonnes inconnues sont gardées en fin de paquet.
+    Une valeur non numérique dans une colonne numérique garde le paquet en
+    object : la colonne de la table sera élargie comme lors d'une saisie.
+    """
+    for col, dtype in dtypes.items():
+        if col not in chunk.columns:
+            continue
+        values = chunk[col]
+        if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+            chunk[col] = values.astype(object) if dtype == object else values
+            continue
+
+        numeric = pd.to_numeric(values, errors='coerce')
+        if numeric.notna().sum() != values.notna().sum():
+            chunk[col] = values.astype(object)
+        elif pd.api.types.is_integer_dtype(dtype) and numeric.notna().all() and (numeric % 1 == 0).all():
+            # int64 : un type compact (int8...) est élargi si besoin à l'insertion des lignes
+            chunk[col] = numeric.astype('int64')
+        else:
+            chunk[col] = numeric
+
+    extra = [col for col in chunk.columns if col not in dtypes]
+    return chunk.reindex(columns=list(dtypes.keys()) + extra)
@@ -0,0 +1,110 @@
+# instrumentation.py
+
+import functools
+import time
+from contextlib import contextmanager
+
+import config
+from logger import logger
+
+enabled = config.PERF_INSTRUMENTATION
+stats = {}  # nom → MethodStats
+
+
+class MethodStats:
+    """Compteurs d'une méthode instrumentée : appels, temps, lignes traitées.
+
+    Les durées sont rangées dans un histogramme à seaux puissances de 2 (en
+    microsecondes) : mémoire constante, percentiles approchés à un facteur 2.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.buckets = {}  # seau (log2 µs) → nombre d'appels
+
+    def add(self, duration, rows=None):
+        self.calls += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        if rows is not None:
+            self.rows += rows
+        bucket = int(duration * 1_000_000).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        """Borne haute (s) du seau qui contient le percentile demandé."""
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.calls:
+                return min((1 << bucket) / 1_000_000, self.max)
+        return self.max
+
+
+def enable(active=True):
+    global enabled
+    enabled = active
+
+
+def reset():
+    stats.clear()
+
+
+def record(name, duration, rows=None):
+    entry = stats.get(name)
+    if entry is None:
+        entry = stats[name] = MethodStats()
+    entry.add(duration, rows)
+
+
+def timed(name, rows=None):
+    """Décorateur : mesure chaque appel quand l'instrumentation est active.
+
+    `rows(*args, **kwargs)` retourne le nombre de lignes traitées (appelé
+    après la méthode). Désactivé, le surcoût se limite à un test de booléen.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start, rows(*args, **kwargs) if rows else None)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def measure(name, rows=None):
+    """Équivalent de `timed` pour un bloc de code."""
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, rows)
+
+
+def table_rows(table, *args, **kwargs):
+    """Nombre de lignes de la table (widget ou TokenStore), pour `timed(rows=...)`."""
+    return len(table.df)
+
+
+def log_summary(clear=False):
+    """Une ligne structurée par méthode instrumentée, triées par temps total."""
+    for name, entry in sorted(stats.items(), key=lambda item: item[1].total, reverse=True):
+        logger.info(
+            f"⏱️ perf name={name} calls={entry.calls} total_ms={entry.total * 1000:.1f} "
+            f"mean_ms={entry.total * 1000 / entry.calls:.2f} p50_ms={entry.percentile(0.5) * 1000:.2f} "
+            f"p95_ms={entry.percentile(0.95) * 1000:.2f} max_ms={entry.max * 1000:.2f} rows={entry.rows}"
+        )
+    if clear:
+        reset()
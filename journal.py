@@ -0,0 +1,445 @@
+# journal.py
+
+import base64
+import datetime
+import json
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import config
+from history import (
+    BlockEdit, CellEdit, CellsEdit, ColumnDelete, ColumnInsert, ColumnMove, ColumnRename,
+    CompoundOperation, LocksChange, RowsAppend, RowsDelete, RowsDuplicate, RowsInsert,
+)
+from instrumentation import timed
+from logger import logger
+
+RECORD_HEADER = struct.Struct("<II")  # longueur du contenu, crc32 du contenu
+JSON_LENGTH = struct.Struct("<I")  # longueur de la partie JSON d'un enregistrement
+JOURNAL_VERSION = 2
+BINARY_KINDS = "biufmM"  # booléens, nombres, dates : tableaux écrits bruts
+
+
+def journal_path(path):
+    """Fichier journal associé au fichier de données `path` (à côté, suffixe .journal)."""
+    path = Path(path)
+    return path.with_name(path.name + ".journal")
+
+
+def snapshot_signature(path):
+    """Identifie une version du fichier de données (taille, date de modification)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class Journal:
+    """Journal en ajout seul des opérations faites depuis le dernier snapshot.
+
+    Le premier enregistrement (en-tête) identifie le snapshot et les
+    identifiants de ligne du DataFrame à cet instant ; les suivants sont des
+    (action, opération, prochain identifiant), action valant "do", "undo" ou
+    "redo". Chaque enregistrement est préfixé de sa longueur et de son crc32 :
+    une fin de fichier tronquée par un crash est détectée et ignorée. Le
+    contenu n'utilise pas pickle (voir RecordWriter) : un journal d'une autre
+    version est écarté, jamais exécuté.
+
+    Chaque ajout est écrit immédiatement (un crash de l'application ne perd
+    rien) ; le fsync, qui protège d'une coupure du système, est regroupé au
+    plus toutes les `sync_interval` secondes.
+    """
+
+    def __init__(self, path, sync_interval=config.JOURNAL_SYNC_MS / 1000):
+        self.path = Path(path)
+        self.sync_interval = sync_interval
+        self.file = None
+        self.size = 0
+        self.records = 0
+        self.dirty = False
+        self.last_sync = time.monotonic()
+
+    # ========== LECTURE ==========
+    def open(self, signature):
+        """Ouvre le journal et retourne (en-tête, [(action, opération, prochain id), ...]).
+
+        En-tête None si le journal est absent, illisible ou d'un autre
+        snapshot : il faut alors le réinitialiser avec `reset`.
+        """
+        header, records, end = self.read(signature)
+        if header is None:
+            return None, []
+        self.file = open(self.path, "r+b")
+        self.file.truncate(end)  # fin tronquée ou corrompue : écartée
+        self.file.seek(end)
+        self.size = end
+        self.records = len(records)
+        return header, records
+
+    def read(self, signature):
+        if not self.path.exists():
+            return None, [], 0
+        header, records, end = None, [], 0
+        with open(self.path, "rb") as f:
+            for payload, offset in self.iter_payloads(f):
+                try:
+                    record = RecordReader(payload).record(header is None)
+                except Exception as e:
+                    logger.warning(f"⚠️ Journal {self.path.name} : enregistrement illisible ({e}), fin ignorée.")
+                    if header is None:
+                        return None, [], 0
+                    break
+                if header is None:
+                    header = record
+                    if header.get("version") != JOURNAL_VERSION:
+                        logger.warning(f"⚠️ Journal {self.path.name} : version {header.get('version')} inconnue, journal ignoré.")
+                        return None, [], 0
+                    if header.get("snapshot") != signature:
+                        logger.warning(f"⚠️ Journal {self.path.name} : fichier de données modifié depuis, journal ignoré.")
+                        return None, [], 0
+                else:
+                    records.append(record)
+                end = offset
+        return header, records, end
+
+    def iter_payloads(self, f):
+        """(contenu, position de fin) de chaque enregistrement complet et intact."""
+        offset = 0
+        while True:
+            prefix = f.read(RECORD_HEADER.size)
+            if len(prefix) < RECORD_HEADER.size:
+                return
+            length, crc = RECORD_HEADER.unpack(prefix)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning(f"⚠️ Journal {self.path.name} : fin tronquée à l'octet {offset}.")
+                return
+            offset += RECORD_HEADER.size + length
+            yield payload, offset
+
+    # ========== ECRITURE ==========
+    def reset(self, signature, row_ids, next_row_id):
+        """Repart d'un journal vide pour le snapshot `signature` (écriture atomique)."""
+        self.close()
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            self.size = f.write(self.encode(RecordWriter().header(signature, row_ids, next_row_id)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "ab")
+        self.records = 0
+        self.dirty = False
+        self.last_sync = time.monotonic()
+
+    @timed("journal.append")
+    def append(self, action, op, next_row_id):
+        if self.file is None:
+            return
+        data = self.encode(RecordWriter().entry(action, op, next_row_id))
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+        self.records += 1
+        self.dirty = True
+        if time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    @staticmethod
+    def encode(payload):
+        return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def sync(self):
+        """Force l'écriture sur disque des ajouts en attente."""
+        if self.file is not None and self.dirty:
+            os.fsync(self.file.fileno())
+            self.dirty = False
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+# ========== FORMAT DES ENREGISTREMENTS ==========
+# Contenu d'un enregistrement : longueur de la partie JSON, JSON, puis les
+# tableaux numériques qu'il référence, bruts. Les opérations y sont décrites
+# par leur nom et leurs champs (identifiants de ligne, noms de colonnes,
+# valeurs) : aucun objet Python n'est sérialisé tel quel.
+
+OPERATIONS = {
+    cls.__name__: cls for cls in (
+        CellEdit, CellsEdit, BlockEdit, RowsInsert, RowsDelete, RowsDuplicate, RowsAppend,
+        ColumnInsert, ColumnDelete, ColumnRename, ColumnMove, LocksChange, CompoundOperation,
+    )
+}
+
+
+class RecordWriter:
+    """Encode un en-tête ou une entrée du journal."""
+
+    def __init__(self):
+        self.buffers = []
+        self.size = 0
+
+    def header(self, signature, row_ids, next_row_id):
+        return self.payload({
+            "version": JOURNAL_VERSION,
+            "snapshot": list(signature) if signature is not None else None,
+            "row_ids": self.array(row_ids) if row_ids is not None else None,
+            "next_row_id": int(next_row_id),
+        })
+
+    def entry(self, action, op, next_row_id):
+        return self.payload({"action": action, "op": self.operation(op), "next_row_id": int(next_row_id)})
+
+    def payload(self, record):
+        text = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        return b"".join([JSON_LENGTH.pack(len(text)), text, *self.buffers])
+
+    # ---------- opérations ----------
+    def operation(self, op):
+        kind = type(op).__name__
+        if OPERATIONS.get(kind) is not type(op):
+            raise TypeError(f"Opération non journalisable : {kind}")
+        if kind == "CompoundOperation":
+            return {"kind": kind, "label": op.label, "operations": [self.operation(o) for o in op.operations]}
+        if kind == "CellEdit":
+            fields = {"row_id": op.row_id, "column": op.column, "old": op.old, "new": op.new}
+            return {"kind": kind, **{name: self.value(value) for name, value in fields.items()}, "dtypes": self.dtypes(op.dtypes)}
+        if kind == "CellsEdit":
+            fields = {"row_ids": op.row_ids, "columns": op.columns, "olds": op.olds, "news": op.news}
+            return {"kind": kind, **{name: self.values(values) for name, values in fields.items()}, "dtypes": self.dtypes(op.dtypes)}
+        if kind == "BlockEdit":
+            return {
+                "kind": kind,
+                "columns": self.values(op.columns),
+                **{name: [self.array(a) for a in arrays]
+                   for name, arrays in (("row_ids", op.row_ids), ("olds", op.olds), ("news", op.news))},
+                "dtypes": self.dtypes(op.dtypes),
+            }
+        if kind in ("RowsInsert", "RowsDelete"):
+            return {"kind": kind, "positions": self.array(op.positions), "rows": self.frame(op.rows)}
+        if kind == "RowsDuplicate":
+            return {"kind": kind, "sources": self.array(op.sources), "row_ids": self.array(op.row_ids)}
+        if kind == "RowsAppend":
+            rows = self.frame(op.rows) if op.rows is not None else None
+            return {"kind": kind, "start": int(op.start), "count": int(op.count), "rows": rows}
+        if kind in ("ColumnInsert", "ColumnDelete"):
+            values = {"series": self.column(op.values)} if isinstance(op.values, pd.Series) else self.value(op.values)
+            return {
+                "kind": kind, "position": int(op.position), "name": self.value(op.name), "values": values,
+                "locked_rows": self.values(op.locked_rows), "hidden": bool(op.hidden),
+            }
+        if kind == "ColumnRename":
+            return {"kind": kind, "old": self.value(op.old), "new": self.value(op.new)}
+        if kind == "ColumnMove":
+            return {"kind": kind, "from_index": int(op.from_index), "to_index": int(op.to_index)}
+        return {  # LocksChange
+            "kind": kind, "cells": [self.values(cell) for cell in op.lock_cells], "locked": bool(op.locked),
+        }
+
+    # ---------- tableaux ----------
+    def frame(self, df):
+        return {
+            "index": self.column(df.index),
+            "columns": self.values(df.columns),
+            "data": [self.column(df.iloc[:, i]) for i in range(df.shape[1])],
+        }
+
+    def column(self, values):
+        """Series ou Index : type pandas + valeurs."""
+        dtype = values.dtype
+        if isinstance(dtype, (np.dtype, pd.SparseDtype)):
+            raw = np.asarray(values)  # colonne différée (creuse) : écrite pleine
+        else:
+            raw = values.to_numpy(dtype=object)
+        return {"dtype": self.dtype(dtype), "values": self.array(raw), "name": self.value(getattr(values, "name", None))}
+
+    def dtype(self, dtype):
+        if isinstance(dtype, np.dtype):
+            return {"numpy": dtype.str}
+        if isinstance(dtype, pd.CategoricalDtype):
+            return {"categories": self.column(dtype.categories), "ordered": bool(dtype.ordered)}
+        if isinstance(dtype, pd.StringDtype):
+            return {"string": dtype.storage}
+        return {"pandas": str(dtype)}
+
+    def dtypes(self, dtypes):
+        """{colonne: (type avant, type après)} en liste (noms de colonnes pas forcément des str)."""
+        return [[self.value(column), self.dtype(old), self.dtype(new)] for column, (old, new) in dtypes.items()]
+
+    def array(self, values):
+        values = np.asarray(values)
+        if values.dtype.kind in BINARY_KINDS:
+            data = np.ascontiguousarray(values).tobytes()
+            spec = {"array": values.dtype.str, "length": len(values), "offset": self.size}
+            self.buffers.append(data)
+            self.size += len(data)
+            return spec
+        return self.values(values)
+
+    # ---------- valeurs ----------
+    def values(self, values):
+        return [self.value(value) for value in values]
+
+    def value(self, value):
+        """Valeur de cellule ou nom : JSON natif, ou objet {type: ...} pour les autres types."""
+        if value is None or isinstance(value, (bool, str)):
+            return value
+        if isinstance(value, np.bool_):
+            return bool(value)
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        if isinstance(value, (float, np.floating)):
+            return float(value)
+        if value is pd.NA:
+            return {"na": True}
+        if value is pd.NaT:
+            return {"nat": True}
+        if isinstance(value, (datetime.datetime, np.datetime64)):
+            return {"timestamp": pd.Timestamp(value).isoformat()}
+        if isinstance(value, datetime.date):
+            return {"date": value.isoformat()}
+        if isinstance(value, (datetime.timedelta, np.timedelta64)):
+            return {"timedelta": int(pd.Timedelta(value).value)}
+        if isinstance(value, bytes):
+            return {"bytes": base64.b64encode(value).decode("ascii")}
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return {"list": self.values(value)}
+        if isinstance(value, dict):
+            return {"dict": [[self.value(k), self.value(v)] for k, v in value.items()]}
+        return str(value)  # autre objet : écrit en texte, comme à la sauvegarde Arrow
+
+
+class RecordReader:
+    """Décode un enregistrement écrit par RecordWriter."""
+
+    def __init__(self, payload):
+        (length,) = JSON_LENGTH.unpack_from(payload)
+        self.record_json = json.loads(bytes(payload[JSON_LENGTH.size:JSON_LENGTH.size + length]).decode("utf-8"))
+        self.binary = memoryview(payload)[JSON_LENGTH.size + length:]
+
+    def record(self, is_header):
+        record = self.record_json
+        if is_header:
+            if record.get("version") != JOURNAL_VERSION:
+                return {"version": record.get("version")}
+            row_ids = record["row_ids"]
+            return {
+                "version": record["version"],
+                "snapshot": tuple(record["snapshot"]) if record["snapshot"] is not None else None,
+                "row_ids": self.array(row_ids) if row_ids is not None else None,
+                "next_row_id": record["next_row_id"],
+            }
+        if record["action"] not in ("do", "undo", "redo"):
+            raise ValueError(f"action inconnue : {record['action']}")
+        return record["action"], self.operation(record["op"]), record["next_row_id"]
+
+    # ---------- opérations ----------
+    def operation(self, spec):
+        kind = spec["kind"]
+        cls = OPERATIONS.get(kind)
+        if cls is None:
+            raise ValueError(f"opération inconnue : {kind}")
+        if cls is CompoundOperation:
+            return cls([self.operation(o) for o in spec["operations"]], spec["label"])
+        if cls is CellEdit:
+            return cls(*(self.value(spec[name]) for name in ("row_id", "column", "old", "new")), self.dtypes(spec))
+        if cls is CellsEdit:
+            return cls(*(self.values(spec[name]) for name in ("row_ids", "columns", "olds", "news")), self.dtypes(spec))
+        if cls is BlockEdit:
+            return cls(
+                self.values(spec["columns"]),
+                *([self.array(a) for a in spec[name]] for name in ("row_ids", "olds", "news")),
+                self.dtypes(spec),
+            )
+        if cls in (RowsInsert, RowsDelete):
+            return cls(self.array(spec["positions"]), self.frame(spec["rows"]))
+        if cls is RowsDuplicate:
+            return cls(self.array(spec["sources"]), self.array(spec["row_ids"]))
+        if cls is RowsAppend:
+            op = cls(spec["start"], spec["count"])
+            op.rows = self.frame(spec["rows"]) if spec["rows"] is not None else None
+            return op
+        if cls in (ColumnInsert, ColumnDelete):
+            values = spec["values"]
+            values = self.column(values["series"]) if isinstance(values, dict) and "series" in values else self.value(values)
+            return cls(spec["position"], self.value(spec["name"]), values, self.values(spec["locked_rows"]), spec["hidden"])
+        if cls is ColumnRename:
+            return cls(self.value(spec["old"]), self.value(spec["new"]))
+        if cls is ColumnMove:
+            return cls(spec["from_index"], spec["to_index"])
+        return cls([tuple(self.values(cell)) for cell in spec["cells"]], spec["locked"])  # LocksChange
+
+    # ---------- tableaux ----------
+    def frame(self, spec):
+        index = self.column(spec["index"], as_index=True)
+        data = {i: self.column(column).set_axis(index) for i, column in enumerate(spec["data"])}
+        df = pd.DataFrame(data, index=index) if data else pd.DataFrame(index=index)
+        df.columns = pd.Index(self.values(spec["columns"]), dtype=object)
+        return df
+
+    def column(self, spec, as_index=False):
+        raw = self.array(spec["values"])
+        dtype = self.dtype(spec["dtype"])
+        name = self.value(spec["name"])
+        if as_index:
+            return pd.Index(raw, dtype=raw.dtype, name=name).astype(dtype)
+        return pd.Series(raw, dtype=raw.dtype, name=name).astype(dtype)
+
+    def dtype(self, spec):
+        if "numpy" in spec:
+            return np.dtype(spec["numpy"])
+        if "categories" in spec:
+            return pd.CategoricalDtype(self.column(spec["categories"], as_index=True), ordered=spec["ordered"])
+        if "string" in spec:
+            return pd.StringDtype(spec["string"])
+        return pd.api.types.pandas_dtype(spec["pandas"])
+
+    def dtypes(self, spec):
+        # Absent des enregistrements écrits avant le suivi des types élargis
+        return {self.value(column): (self.dtype(old), self.dtype(new)) for column, old, new in spec.get("dtypes", [])}
+
+    def array(self, spec):
+        if isinstance(spec, dict):
+            dtype = np.dtype(spec["array"])
+            if dtype.hasobject:
+                raise ValueError("tableau d'objets dans la partie binaire")
+            return np.frombuffer(self.binary, dtype=dtype, count=spec["length"], offset=spec["offset"]).copy()
+        return np.fromiter((self.value(value) for value in spec), dtype=object, count=len(spec))
+
+    # ---------- valeurs ----------
+    def values(self, values):
+        return [self.value(value) for value in values]
+
+    def value(self, value):
+        if not isinstance(value, dict):
+            return value
+        (tag, content), = value.items()
+        if tag == "na":
+            return pd.NA
+        if tag == "nat":
+            return pd.NaT
+        if tag == "timestamp":
+            return pd.Timestamp(content)
+        if tag == "date":
+            return datetime.date.fromisoformat(content)
+        if tag == "timedelta":
+            return pd.Timedelta(content)
+        if tag == "bytes":
+            return base64.b64decode(content)
+        if tag == "list":
+            return self.values(content)
+        if tag == "dict":
+            return {self.value(k): self.value(v) for k, v in content}
+        raise ValueError(f"valeur de type inconnu : {tag}")
@@ -0,0 +1,143 @@
+# key_index.py
+
+import numpy as np
+import pandas as pd
+
+import config
+
+
+def key_value(value):
+    """Forme canonique d'une partie de clé (None si vide).
+
+    1, 1.0 et "1" donnent la même clé ; le texte est comparé sans la casse
+    ni les espaces de bord (adresses hexadécimales, noms de chaîne).
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    text = str(value).strip().lower()
+    return text or None
+
+
+def key_values(series):
+    """key_value appliqué à toute une colonne : normalisation des seules valeurs distinctes."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    normalized = np.array([key_value(value) for value in uniques] + [None], dtype=object)
+    return normalized[codes].tolist()  # code -1 (NaN) → dernier élément, None
+
+
+class KeyIndex:
+    """Index de hachage de la clé naturelle (contract_address, token_id, chain) → identifiant de ligne.
+
+    Construit à la première utilisation puis tenu à jour ligne par ligne
+    (ajout, suppression, duplication, édition d'une colonne de la clé). Les
+    lignes dont la clé est incomplète ne sont pas indexées. Les clés portées
+    par plusieurs lignes sont regroupées à part dans `duplicates`.
+    """
+
+    def __init__(self, columns=config.IMMUTABLE_COLUMNS, unique=config.UNIQUE_TOKEN_KEYS):
+        self.columns = list(columns)
+        self.unique = unique
+        self.rows = {}  # clé → identifiant de ligne
+        self.duplicates = {}  # clé → identifiants, pour les clés portées par plusieurs lignes
+        self.built = False
+
+    def invalidate(self):
+        self.rows.clear()
+        self.duplicates.clear()
+        self.built = False
+
+    def available(self, df):
+        return all(column in df.columns for column in self.columns)
+
+    def tracks(self, column):
+        """True si l'écriture dans `column` doit mettre l'index à jour."""
+        return self.built and column in self.columns
+
+    # ========== CLES ==========
+    def make_key(self, *values):
+        key = tuple(key_value(value) for value in values)
+        return None if None in key else key
+
+    def row_key(self, df, position):
+        return self.make_key(*(df[column].iat[position] for column in self.columns))
+
+    def frame_keys(self, df):
+        parts = [key_values(df[column]) for column in self.columns]
+        return [None if None in key else key for key in zip(*parts)]
+
+    # ========== CONSTRUCTION / MISE A JOUR ==========
+    def build(self, df):
+        self.invalidate()
+        if self.available(df):
+            self.add(df.index, self.frame_keys(df))
+            self.built = True
+
+    def ensure(self, df):
+        if not self.built:
+            self.build(df)
+        return self.built
+
+    def add(self, row_ids, keys):
+        for row_id, key in zip(row_ids, keys):
+            if key is None:
+                continue
+            existing = self.rows.get(key)
+            if existing is None:
+                self.rows[key] = row_id
+            else:
+                self.duplicates.setdefault(key, {existing}).add(row_id)
+
+    def remove(self, row_ids, keys):
+        for row_id, key in zip(row_ids, keys):
+            if key is None:
+                continue
+            ids = self.duplicates.get(key)
+            if ids is not None:
+                ids.discard(row_id)
+                if self.rows.get(key) == row_id:
+                    self.rows[key] = next(iter(ids))
+                if len(ids) == 1:
+                    del self.duplicates[key]
+            elif self.rows.get(key) == row_id:
+                del self.rows[key]
+
+    def add_rows(self, rows):
+        if self.built:
+            self.add(rows.index, self.frame_keys(rows))
+
+    def remove_rows(self, rows):
+        if self.built:
+            self.remove(rows.index, self.frame_keys(rows))
+
+    def replace(self, row_id, old_key, new_key):
+        if old_key != new_key:
+            self.remove([row_id], [old_key])
+            self.add([row_id], [new_key])
+
+    # ========== RECHERCHE ==========
+    def lookup(self, *values):
+        """Identifiants des lignes portant la clé (contract_address, token_id, chain)."""
+        key = self.make_key(*values)
+        if key is None:
+            return []
+        if key in self.duplicates:
+            return sorted(self.duplicates[key])
+        row_id = self.rows.get(key)
+        return [] if row_id is None else [row_id]
+
+    def is_shared(self, key):
+        """True si la clé est portée par plusieurs lignes (O(1))."""
+        return key is not None and key in self.duplicates
+
+    def new_key_mask(self, rows):
+        """Masque des lignes de `rows` dont la clé n'est ni indexée ni répétée dans `rows`."""
+        seen = set()
+        mask = []
+        for key in self.frame_keys(rows):
+            keep = key is None or (key not in self.rows and key not in seen)
+            mask.append(keep)
+            if key is not None:
+                seen.add(key)
+        return mask
@@ -0,0 +1,135 @@
+# lazy_columns.py
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+import storage
+from logger import logger
+
+PLACEHOLDER_DTYPE = pd.SparseDtype(float, np.nan)
+
+
+def placeholder(length):
+    """Colonne fictive d'une colonne différée : creuse et vide, aucune mémoire par ligne."""
+    return pd.arrays.SparseArray(np.full(length, np.nan), fill_value=np.nan)
+
+
+def is_placeholder(values):
+    return values.dtype == PLACEHOLDER_DTYPE
+
+
+def deferred_columns(names, hidden_columns):
+    """Colonnes masquées (positions) à laisser sur disque ; jamais les colonnes de la clé."""
+    return [
+        names[col] for col in sorted(hidden_columns)
+        if 0 <= col < len(names) and names[col] not in config.IMMUTABLE_COLUMNS
+    ]
+
+
+def insert_placeholders(df, names, deferred):
+    """Remet les colonnes différées à leur place dans le DataFrame lu sans elles."""
+    for position, name in enumerate(names):
+        if name in deferred:
+            df.insert(position, name, placeholder(len(df)))
+
+
+class LazyColumns:
+    """Colonnes masquées laissées dans le fichier de données jusqu'à leur premier usage.
+
+    Dans le DataFrame, une colonne différée est une colonne fictive vide
+    (voir `placeholder`). Elle est lue dans le fichier, seule, quand elle est
+    affichée, citée par un filtre ou un tri, écrite, ou avant une sauvegarde.
+    Les lignes du fichier sont reliées aux identifiants de ligne : les
+    suppressions et réordonnancements n'ont rien à mettre à jour, les copies
+    (duplication) pointent vers leur ligne d'origine.
+    """
+
+    def __init__(self, path, columns, row_ids):
+        self.path = path
+        self.pending = {name: name for name in columns}  # nom courant → nom dans le fichier
+        self.row_ids = row_ids  # identifiant de ligne de chaque ligne du fichier
+        self.copies = {}  # identifiant d'une copie → position dans le fichier
+        self.retained = {}  # colonne lue → valeurs des lignes absentes du DataFrame à la lecture
+
+    def __contains__(self, name):
+        return name in self.pending
+
+    def __bool__(self):
+        return bool(self.pending or self.retained)
+
+    # ========== LIGNES ==========
+    def positions(self, row_ids):
+        """Position dans le fichier de chaque identifiant (-1 : ligne créée depuis le chargement)."""
+        positions = self.row_ids.get_indexer(row_ids)
+        if self.copies:
+            missing = np.flatnonzero(positions < 0)
+            positions[missing] = [self.copies.get(row_id, -1) for row_id in row_ids[missing]]
+        return positions
+
+    def copy_rows(self, mapping):
+        """`mapping` : identifiant d'origine → identifiant de la copie."""
+        positions = self.positions(pd.Index(list(mapping)))
+        for copy, position in zip(mapping.values(), positions):
+            if position >= 0:
+                self.copies[copy] = position
+
+    def take(self, column, row_ids):
+        """Valeurs du fichier pour `row_ids` (NaN pour les lignes créées depuis)."""
+        positions = self.positions(row_ids)
+        found = positions >= 0
+        values = column.iloc[positions[found]]
+        values.index = row_ids[found]
+        return values if found.all() else values.reindex(row_ids)
+
+    # ========== COLONNES ==========
+    def rename_column(self, old, new):
+        if old in self.pending:
+            self.pending[new] = self.pending.pop(old)
+        if old in self.retained:
+            self.retained[new] = self.retained.pop(old)
+
+    def load(self, name, df):
+        """Lit la colonne différée `name`, alignée sur le DataFrame ; elle cesse d'être différée.
+
+        Les valeurs des lignes connues du fichier mais absentes du DataFrame
+        (supprimées, encore dans l'historique) sont retenues pour `fill_rows`.
+        """
+        start = time.perf_counter()
+        column = storage.read_column(self.path, self.pending.pop(name))
+        values = self.take(column, df.index)
+
+        current = df[name]
+        written = values.isna().to_numpy() & current.notna().to_numpy()
+        if written.any():
+            # Lignes créées avec une valeur dans la colonne avant sa lecture
+            values = values.astype(object)
+            values[written] = current[written].astype(object)
+            values = values.infer_objects()
+
+        known = self.row_ids.append(pd.Index(list(self.copies))) if self.copies else self.row_ids
+        absent = known[~known.isin(df.index)]
+        if len(absent):
+            self.retained[name] = self.take(column, absent)
+        logger.info(f"📂 Colonne '{name}' lue à la demande ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return values
+
+    def fill_rows(self, rows):
+        """Lignes réinsérées (undo) capturées quand une colonne était encore différée :
+        ses valeurs sont reprises de celles retenues à la lecture."""
+        columns = [name for name in rows.columns if name in self.retained and is_placeholder(rows[name])]
+        if not columns:
+            return rows
+        rows = rows.copy(deep=False)
+        for name in columns:
+            values = self.retained[name].reindex(rows.index)
+            current = rows[name].sparse.to_dense()
+            written = values.isna().to_numpy() & current.notna().to_numpy()
+            if written.any():
+                values = values.astype(object)
+                values[written] = current[written]
+                values = values.infer_objects()
+            rows[name] = values
+        return rows
@@ -0,0 +1,107 @@
+# locks.py
+
+import numpy as np
+
+
+class LockStore:
+    """Cellules verrouillées : nom de colonne → ensemble d'identifiants de ligne.
+
+    Les identifiants de ligne sont les labels de l'index du DataFrame, qui ne
+    changent jamais : trier, filtrer, insérer ou supprimer des lignes ne
+    demande aucun remappage. Les verrous d'une ligne supprimée restent en
+    place pour l'undo ; ils sont sans effet tant que la ligne est absente et
+    ne sont pas sauvegardés.
+    """
+
+    def __init__(self):
+        self.columns = {}
+
+    def __len__(self):
+        return sum(len(rows) for rows in self.columns.values())
+
+    def __bool__(self):
+        return any(self.columns.values())
+
+    def clear(self):
+        self.columns.clear()
+
+    # ========== CELLULES ==========
+    def is_locked(self, row_id, column):
+        rows = self.columns.get(column)
+        return rows is not None and row_id in rows
+
+    def lock(self, row_id, column):
+        rows = self.columns.setdefault(column, set())
+        if row_id in rows:
+            return False
+        rows.add(row_id)
+        return True
+
+    def unlock(self, row_id, column):
+        rows = self.columns.get(column)
+        if not rows or row_id not in rows:
+            return False
+        rows.discard(row_id)
+        return True
+
+    def mask(self, column, row_ids):
+        """Masque booléen des lignes `row_ids` verrouillées dans `column`."""
+        rows = self.columns.get(column)
+        if not rows:
+            return np.zeros(len(row_ids), dtype=bool)
+        return np.isin(np.asarray(row_ids), np.fromiter(rows, dtype=np.int64, count=len(rows)))
+
+    # ========== LIGNES / COLONNES ==========
+    def copy_rows(self, id_map):
+        """Duplique les verrous des lignes `id_map` (ancien id → nouvel id)."""
+        for rows in self.columns.values():
+            rows.update(id_map[row_id] for row_id in rows.intersection(id_map))
+
+    def pop_column(self, column):
+        return self.columns.pop(column, set())
+
+    def set_column(self, column, row_ids):
+        if row_ids:
+            self.columns[column] = set(row_ids)
+
+    def rename_column(self, old, new):
+        if old in self.columns:
+            self.columns[new] = self.columns.pop(old)
+
+    # ========== PERSISTANCE ==========
+    def to_positions(self, df):
+        """{colonne: positions (tableau trié)} des lignes présentes, pour les métadonnées du fichier."""
+        result = {}
+        for column, rows in self.columns.items():
+            if column not in df.columns or not rows:
+                continue
+            positions = df.index.get_indexer(list(rows))
+            positions = np.sort(positions[positions >= 0])
+            if len(positions):
+                result[str(column)] = positions
+        return result
+
+    @classmethod
+    def from_metadata(cls, locked_cells, df):
+        """Relit les verrous sauvegardés (lignes repérées par leur position).
+
+        Accepte le format par colonne et l'ancien format [(ligne, index de colonne), ...].
+        """
+        store = cls()
+        if isinstance(locked_cells, dict):
+            items = ((column, positions) for column, positions in locked_cells.items())
+        elif isinstance(locked_cells, list):
+            by_index = {}
+            for row, col in locked_cells:
+                by_index.setdefault(col, []).append(row)
+            items = ((df.columns[col], rows) for col, rows in by_index.items() if 0 <= col < len(df.columns))
+        else:
+            return store
+
+        for column, positions in items:
+            if column not in df.columns:
+                continue
+            positions = np.asarray(positions, dtype=np.int64)
+            positions = positions[(positions >= 0) & (positions < len(df))]
+            store.set_column(column, df.index[positions].tolist())
+        return store
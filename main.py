@@ -1,11 +1,16 @@
 import sys
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QHBoxLayout,
-    QLineEdit, QLabel, QComboBox, QMenu, QCompleter, QAbstractItemView
+    QLineEdit, QLabel, QComboBox, QMenu, QCompleter, QAbstractItemView, QFileDialog, QProgressBar,
+    QInputDialog
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QStringListModel, QTimer
+from pathlib import Path
 from table_manager import TokenTableWidget
+from workers import ImportWorker, LoadWorker, SaveWorker
 import config
+import storage
+import instrumentation
 from logger import logger
 import json
 
@@ -15,6 +20,12 @@ class MainWindow(QWidget):
         self.setWindowTitle("Token Manager")
         self.resize(1200, 800)
         self.table = TokenTableWidget(self)
+        self.worker = None  # chargement / sauvegarde en arrière-plan
+        self.data_path = None  # fichier chargé, dont le journal reçoit les modifications
+        self.loading_path = None
+        self.journal_timer = QTimer(self)  # fsync groupé du journal + repli quand il grossit
+        self.journal_timer.timeout.connect(self.check_journal)
+        self.journal_timer.start(config.JOURNAL_SYNC_MS)
         self.table.horizontalHeader().setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.horizontalHeader().customContextMenuRequested.connect(self.show_header_menu)
 
@@ -39,11 +50,16 @@ class MainWindow(QWidget):
         undo_btn = QPushButton("↩ Undo")
         redo_btn = QPushButton("↪ Redo")
         select_all_btn = QPushButton("v Tout cocher")
+        open_xlsx_btn = QPushButton("📥 Ouvrir xlsx")
+        export_xlsx_btn = QPushButton("📤 Exporter xlsx")
+        import_btn = QPushButton("📥 Importer")
+        jump_btn = QPushButton("🎯 Aller au token")
 
         # Champ de recherche rapide
         self.quick_search_input = QLineEdit()
         self.quick_search_input.setPlaceholderText("🔎 Recherche rapide (insensible à la casse)")
-        self.quick_search_input.textChanged.connect(self.table.filter_table)
+        self.quick_search_input.textChanged.connect(self.table.schedule_quick_search)
+        self.quick_search_input.returnPressed.connect(lambda: self.table.filter_table(self.quick_search_input.text()))
 
         # Champs recherche et filtre
         self.filter_input = QLineEdit()
@@ -56,9 +72,10 @@ class MainWindow(QWidget):
         apply_filter_btn = QPushButton("🔍 Appliquer filtre")
         apply_filter_btn.clicked.connect(lambda: self.table.apply_filter(self.filter_input.text()))
         self.result_counter = QLabel("0 lignes visibles")
-         # Autocomplétion des noms de colonnes dans le filtre
-        completer = QCompleter(self.table.df.columns.tolist())
-        completer.setCaseSensitivity(False)
+         # Autocomplétion des noms de colonnes dans le filtre (modèle mis à jour sur place)
+        self.completer_model = QStringListModel(self)
+        completer = QCompleter(self.completer_model, self)
+        completer.setCaseSensitivity(Qt.CaseInsensitive)
         self.filter_input.setCompleter(completer)
 
         # Bouton réinitialiser les filtres
@@ -70,18 +87,40 @@ class MainWindow(QWidget):
         load_selection_btn = QPushButton("📂 Charger sélection")
 
         # Connecter les boutons
-        load_btn.clicked.connect(self.load_file)
+        load_btn.clicked.connect(lambda: self.load_file())
         save_btn.clicked.connect(self.save_file)
+        open_xlsx_btn.clicked.connect(self.open_xlsx_file)
+        export_xlsx_btn.clicked.connect(self.export_xlsx_file)
+        import_btn.clicked.connect(lambda: self.import_file())
+        jump_btn.clicked.connect(self.prompt_jump_to_token)
         undo_btn.clicked.connect(self.table.undo)
         redo_btn.clicked.connect(self.table.redo)
         #select_all_btn.clicked.connect(self.table.select_all_visible)
 
+        # Désactivés pendant un chargement / une sauvegarde
+        self.io_buttons = [load_btn, save_btn, undo_btn, redo_btn, open_xlsx_btn, export_xlsx_btn, import_btn]
+
+        # Avancement des opérations en arrière-plan
+        self.progress_label = QLabel("")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.cancel_btn = QPushButton("⛔ Annuler")
+        self.cancel_btn.clicked.connect(self.cancel_worker)
+        self.set_busy(False)
+
         # Ajouter au layout
         btn_layout.addWidget(load_btn)
         btn_layout.addWidget(save_btn)
         btn_layout.addWidget(undo_btn)
         btn_layout.addWidget(redo_btn)
         btn_layout.addWidget(select_all_btn)
+        btn_layout.addWidget(open_xlsx_btn)
+        btn_layout.addWidget(export_xlsx_btn)
+        btn_layout.addWidget(import_btn)
+        btn_layout.addWidget(jump_btn)
+        btn_layout.addWidget(self.progress_label)
+        btn_layout.addWidget(self.progress_bar)
+        btn_layout.addWidget(self.cancel_btn)
 
         quick_search_layout = QHBoxLayout()
         quick_search_layout.addWidget(QLabel("🔎 Recherche:"))
@@ -104,45 +143,171 @@ class MainWindow(QWidget):
 
         self.setLayout(layout)
 
-    def load_file(self):
-        self.table.load_data()                       # charge df depuis fichier
+    def load_file(self, path=None):
+        if self.worker is not None:
+            return
+        path = storage.resolve_load_path(path)
+        self.loading_path = path
+        worker = LoadWorker(path, self)
+        worker.succeeded.connect(self.on_file_loaded)
+        self.start_worker(worker, f"📂 Chargement de {path.name}")
+
+    def on_file_loaded(self, result):
+        df, metadata = result
+        self.table.set_data(df, metadata)            # installe le df chargé par le worker
+        self.data_path = self.loading_path
+        self.table.attach_storage(self.data_path)    # SQLite, ou journal : rejoue les modifications non sauvegardées
         self.table.update_visible_counter()
-        
-        self.table.update_table_from_df()            # remplit la QTableWidget
         self.load_table_settings()                   # applique les réglages d'affichage
         self.table.update_df_from_table()
 
-    def save_file(self):
-        self.table.save_data()
+    def save_file(self, path=None, export=False):
+        """Sauvegarde (le fichier écrit devient le fichier de travail) ou, avec `export`, copie."""
+        if self.worker is not None:
+            return
+        if path is None and self.table.store.backend is not None:
+            path = self.data_path
+        path = Path(path or storage.default_path())
+        if self.table.store.writes_in_place(path):
+            # Base SQLite : les éditions y sont déjà écrites, pas de réécriture du fichier
+            self.table.save_data(path)
+            self.save_table_settings()
+            logger.info(f"💾 Sauvegarde : {path}")
+            return
+        if self.table.df.empty:
+            logger.error("❌ Le DataFrame est vide. Impossible de sauvegarder.")
+            return
+        self.table.store.materialize_columns()  # colonnes masquées encore sur disque : lues avant l'écriture
+        # Pas de copie du df : la table reste en lecture seule jusqu'à la fin de l'écriture
+        worker = SaveWorker(path, self.table.df, self.table.metadata(), self)
+        worker.succeeded.connect(self.on_file_exported if export else self.on_file_saved)
+        self.start_worker(worker, f"💾 Sauvegarde de {path.name}")
         self.save_table_settings()
-            
+
+    def on_file_saved(self, path):
+        logger.info(f"💾 Sauvegarde : {path}")
+        # Table en lecture seule pendant l'écriture : le fichier contient tout le journal
+        if self.table.store.checkpoint_journal(path):
+            self.data_path = Path(path)  # journal rattaché au fichier écrit
+
+    def on_file_exported(self, path):
+        # Le fichier de travail n'a pas changé : le journal y reste rattaché
+        logger.info(f"📤 Export : {path}")
+
+    def check_journal(self):
+        journal = self.table.store.journal
+        if journal is None:
+            return
+        journal.sync()
+        if journal.size > config.JOURNAL_COMPACT_BYTES and self.worker is None and self.data_path is not None:
+            logger.info(f"📜 Journal de {journal.size // (1024 * 1024)} Mo : repli dans {self.data_path.name}")
+            self.save_file(self.data_path)
+
+    def open_xlsx_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Ouvrir un fichier xlsx", str(config.BASE_DIR), "Excel (*.xlsx)")
+        if path:
+            self.load_file(path)
+
+    def export_xlsx_file(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Exporter en xlsx", str(config.EXPORT_FILE), "Excel (*.xlsx)")
+        if path:
+            self.save_file(path, export=True)
+
+    def import_file(self, path=None):
+        """Ajoute les lignes du fichier d'import (xlsx, csv, parquet) à la table, par paquets."""
+        if self.worker is not None:
+            return
+        path = Path(path or config.IMPORT_FILE)
+        if not path.exists():
+            logger.error(f"❌ Fichier d'import introuvable : {path}")
+            return
+
+        worker = ImportWorker(path, self)
+        worker.chunk_ready.connect(self.on_import_chunk)
+        worker.finished.connect(self.table.end_import)
+        self.table.begin_import()
+        self.start_worker(worker, f"📥 Import de {path.name}")
+
+    def on_import_chunk(self, chunk):
+        try:
+            self.table.append_import_chunk(chunk)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de l'import d'un paquet : {e}")
+            self.worker.requestInterruption()
+        finally:
+            self.worker.chunk_done()
+
+    # ========== TRAVAUX EN ARRIERE-PLAN ==========
+    def start_worker(self, worker, message):
+        self.worker = worker
+        self.table.set_read_only(True)
+        self.set_busy(True)
+        self.progress_label.setText(message)
+        self.progress_bar.setValue(0)
+
+        worker.progress.connect(self.on_worker_progress)
+        worker.failed.connect(lambda error: logger.error(f"❌ {message} : {error}"))
+        worker.cancelled.connect(lambda: logger.warning(f"⛔ {message} : annulé."))
+        worker.finished.connect(self.on_worker_finished)
+        worker.start()
+
+    def on_worker_progress(self, percent, step):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{step} %p%")
+
+    def on_worker_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
+        self.table.set_read_only(False)
+        self.set_busy(False)
+
+    def cancel_worker(self):
+        if self.worker is not None:
+            self.worker.requestInterruption()
+
+    def set_busy(self, busy):
+        for button in self.io_buttons:
+            button.setEnabled(not busy)
+        self.progress_label.setVisible(busy)
+        self.progress_bar.setVisible(busy)
+        self.cancel_btn.setVisible(busy)
+
+    def closeEvent(self, event):
+        if isinstance(self.worker, SaveWorker):
+            # Sauvegarde en cours : menée à terme, puis son résultat traité (journal vidé)
+            logger.info("💾 Fermeture : fin de la sauvegarde en cours...")
+            self.worker.wait()
+            QApplication.processEvents()
+        elif self.worker is not None:
+            # Chargement ou import : annulé, rien n'est encore écrit
+            self.worker.requestInterruption()
+            self.worker.wait()
+        self.table.store.detach_storage()
+        if instrumentation.enabled:
+            instrumentation.log_summary()
+        super().closeEvent(event)
+
+    def prompt_jump_to_token(self):
+        text, ok = QInputDialog.getText(self, "Aller au token", "contract_address token_id chain :")
+        if not ok or not text.strip():
+            return
+        parts = text.replace(",", " ").split()
+        if len(parts) != 3:
+            logger.warning("⚠️ Format attendu : contract_address token_id chain")
+            return
+        self.table.jump_to_token(*parts)
+
     def reset_filters(self):
+        if not self.table.reset_filters():
+            return
         self.quick_search_input.clear()
         self.filter_input.clear()
-        self.table.reset_filters()
         
     def update_filter_autocompletion(self):
-        column_names_with_types = []
-        for col in self.table.df.columns:
-            # Appliquer la fonction type à chaque élément de la colonne
-            types = self.table.df[col].apply(type)
-
-            # Compter la fréquence de chaque type de données
-            type_counts = types.value_counts()
-
-            if not type_counts.empty:
-                # Trouver le type de données le plus fréquent
-                most_common_type = type_counts.idxmax()
-                col_type = most_common_type.__name__
-            else:
-                # Si la colonne est vide, définir le type comme 'unknown'
-                col_type = 'unknown'
-
-            column_names_with_types.append(f"{col} ({col_type})")
-
-        completer = QCompleter(column_names_with_types)
-        completer.setCaseSensitivity(False)
-        self.filter_input.setCompleter(completer)
+        # Types lus dans le schéma maintenu par la table : pas de parcours des colonnes
+        completions = self.table.schema.completions(self.table.df)
+        if completions != self.completer_model.stringList():
+            self.completer_model.setStringList(completions)
         
     def show_header_menu(self, position):
         header = self.table.horizontalHeader()
@@ -154,6 +319,11 @@ class MainWindow(QWidget):
         rename_action = menu.addAction("✏️ Renommer la colonne")
         hide_action = menu.addAction("🙈 Masquer la colonne")
         show_hidden_action = menu.addAction("👁️ Afficher les colonnes masquées...")
+        menu.addSeparator()
+        sort_asc_action = menu.addAction("⬆️ Trier (croissant)")
+        sort_desc_action = menu.addAction("⬇️ Trier (décroissant)")
+        add_sort_action = menu.addAction("➕ Ajouter au tri (croissant)")
+        clear_sort_action = menu.addAction("✖️ Annuler le tri")
 
         action = menu.exec_(header.mapToGlobal(position))
 
@@ -163,6 +333,12 @@ class MainWindow(QWidget):
             self.table.hide_column(col)
         elif action == show_hidden_action:
             self.table.show_hidden_columns_menu()
+        elif action in (sort_asc_action, sort_desc_action, add_sort_action):
+            self.table.sort_by_column(
+                self.table.df.columns[col], action != sort_desc_action, add=action == add_sort_action
+            )
+        elif action == clear_sort_action:
+            self.table.clear_sort()
 
     def load_table_settings(self, path="table_settings.json"):
         try:
@@ -191,7 +367,7 @@ class MainWindow(QWidget):
                         self.table.setColumnWidth(i, width)
 
         except Exception as e:
-            print(f"Erreur lors du chargement des préférences d'affichage : {e}")
+            logger.warning(f"Erreur lors du chargement des préférences d'affichage : {e}")
 
     def save_table_settings(self, path="table_settings.json"):
         header = self.table.horizontalHeader()
@@ -0,0 +1,100 @@
+# schema.py
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+
+def type_name(value):
+    """Nom du type Python d'une valeur (les scalaires numpy comptent comme leur équivalent Python)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    return type(value).__name__
+
+
+def type_counts(values):
+    """Compte des types des valeurs non vides d'une série."""
+    if not len(values):
+        return Counter()
+    if values.dtype != object:
+        # Colonne typée : un seul type, pas besoin de regarder les valeurs
+        return Counter({type_name(values.iloc[0]): len(values)})
+    return Counter(values.map(type_name).value_counts().to_dict())
+
+
+class ColumnStats:
+    """Types des valeurs non vides d'une colonne."""
+
+    __slots__ = ("types",)
+
+    def __init__(self, series):
+        self.types = type_counts(series[series.notna()])
+
+    def add(self, values, sign=1):
+        values = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+        present = values[values.notna()]
+        self.types.update({name: sign * count for name, count in type_counts(present).items()})
+        self.types = +self.types  # supprime les compteurs à zéro
+
+    def remove(self, values):
+        self.add(values, sign=-1)
+
+
+class ColumnSchema:
+    """Schéma des colonnes pour l'autocomplétion du filtre avancé.
+
+    Chaque colonne est analysée une seule fois, puis ses statistiques suivent
+    les éditions, insertions et suppressions de lignes. Une colonne n'est
+    réanalysée qu'après son ajout, sa suppression, un changement de type ou
+    un remplacement complet.
+    """
+
+    def __init__(self):
+        self.columns = {}  # nom de colonne → ColumnStats
+
+    # ========== INVALIDATION ==========
+    def invalidate(self):
+        self.columns.clear()
+
+    def invalidate_column(self, name):
+        self.columns.pop(name, None)
+
+    def rename_column(self, old, new):
+        if old in self.columns:
+            self.columns[new] = self.columns.pop(old)
+
+    # ========== MISE A JOUR ==========
+    def update_value(self, name, old, new):
+        self.update_values(name, [old], [new])
+
+    def update_values(self, name, olds, news):
+        stats = self.columns.get(name)
+        if stats is not None:
+            stats.remove(olds)
+            stats.add(news)
+
+    def add_rows(self, rows):
+        for name, stats in self.columns.items():
+            if name in rows.columns:
+                stats.add(rows[name])
+
+    def remove_rows(self, rows):
+        for name, stats in self.columns.items():
+            if name in rows.columns:
+                stats.remove(rows[name])
+
+    # ========== LECTURE ==========
+    def stats(self, df, name):
+        stats = self.columns.get(name)
+        if stats is None:
+            stats = self.columns[name] = ColumnStats(df[name])
+        return stats
+
+    def dominant_type(self, df, name):
+        types = self.stats(df, name).types
+        return types.most_common(1)[0][0] if types else 'unknown'
+
+    def completions(self, df):
+        """Entrées « colonne (type) » proposées par l'autocomplétion."""
+        return [f"{name} ({self.dominant_type(df, name)})" for name in df.columns]
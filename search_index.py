@@ -0,0 +1,148 @@
+# search_index.py
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import config
+
+SEPARATOR = "\x1f"  # ne peut pas être saisi dans la recherche rapide
+
+
+def lower_text(series):
+    """Texte affiché (str(valeur)) en minuscules, chaîne vide pour les NaN."""
+    text = series.astype(str)
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        text = text.str.lower()
+    return text.where(series.notna().to_numpy(), "").astype(object)
+
+
+class SearchIndex:
+    """Clé de recherche par ligne pour la recherche rapide.
+
+    Chaque colonne est convertie une seule fois en texte minuscule ; la clé
+    d'une ligne est la concaténation des colonnes visibles. Une édition
+    n'invalide que sa ligne, un masquage / affichage de colonne ne fait que
+    recombiner les colonnes déjà converties.
+
+    Les résultats des derniers termes sont gardés (LRU, positions des lignes
+    trouvées) : un terme qui en contient un autre ne cherche que parmi ses
+    résultats, et revenir à un terme récent (retour arrière) est immédiat.
+    Toute modification des clés vide ce cache.
+    """
+
+    def __init__(self, max_results=config.SEARCH_CACHE_SIZE):
+        self.columns = {}  # nom de colonne → textes minuscules (alignés sur les positions)
+        self.visible = None
+        self.keys = None
+        self.row_count = 0
+        self.dirty_rows = set()
+        self.max_results = max_results
+        self.results = OrderedDict()  # terme → positions des lignes qui le contiennent
+
+    # ========== INVALIDATION ==========
+    def invalidate(self):
+        self.columns.clear()
+        self.keys = None
+        self.dirty_rows.clear()
+        self.results.clear()
+
+    def invalidate_row(self, position):
+        self.dirty_rows.add(position)
+        self.results.clear()
+
+    def invalidate_column(self, name):
+        self.columns.pop(name, None)
+        self.keys = None
+        self.results.clear()
+
+    def remove_rows(self, positions):
+        """Retire des lignes (positions triées) des textes déjà convertis, sans reconversion."""
+        self.results.clear()
+        if not self.columns and self.keys is None:
+            return
+        if self.dirty_rows:
+            self.invalidate()
+            return
+        keep = np.ones(self.row_count, dtype=bool)
+        keep[positions] = False
+        for name, texts in self.columns.items():
+            self.columns[name] = texts[keep]
+        if self.keys is not None:
+            self.keys = self.keys[keep].reset_index(drop=True)
+        self.row_count = int(keep.sum())
+
+    # ========== CONSTRUCTION ==========
+    def build(self, df, visible_columns):
+        visible = tuple(visible_columns)
+        if len(df) != self.row_count:
+            self.invalidate()
+            self.row_count = len(df)
+
+        if self.dirty_rows:
+            self.refresh_rows(df, sorted(self.dirty_rows))
+            self.dirty_rows.clear()
+
+        if self.keys is not None and visible == self.visible:
+            return self.keys
+        self.results.clear()
+
+        for name in visible:
+            if name not in self.columns:
+                self.columns[name] = lower_text(df[name])
+
+        if not visible:
+            self.keys = pd.Series([""] * len(df), dtype=object)
+        elif len(visible) == 1:
+            self.keys = self.columns[visible[0]].reset_index(drop=True)
+        else:
+            first = self.columns[visible[0]].reset_index(drop=True)
+            others = [self.columns[name].reset_index(drop=True) for name in visible[1:]]
+            self.keys = first.str.cat(others, sep=SEPARATOR)
+        self.visible = visible
+        return self.keys
+
+    def refresh_rows(self, df, positions):
+        positions = [p for p in positions if p < len(df)]
+        if not positions:
+            return
+        for name, texts in self.columns.items():
+            if name in df.columns:
+                texts.iloc[positions] = lower_text(df[name].iloc[positions]).to_numpy()
+        if self.keys is not None:
+            parts = [self.columns[name].iloc[positions].to_numpy() for name in self.visible]
+            self.keys.iloc[positions] = [SEPARATOR.join(values) for values in zip(*parts)] if parts else ""
+
+    # ========== RECHERCHE ==========
+    def search(self, df, visible_columns, text):
+        """Masque booléen (positions du DataFrame) des lignes contenant `text`."""
+        keys = self.build(df, visible_columns)
+        mask = np.zeros(len(keys), dtype=bool)
+        if not text:
+            mask[:] = True
+            return mask
+        mask[self.matching_positions(keys, text)] = True
+        return mask
+
+    def matching_positions(self, keys, text):
+        positions = self.results.get(text)
+        if positions is not None:
+            self.results.move_to_end(text)
+            return positions
+
+        # Un terme récent contenu dans `text` borne les candidats (ex. "0xab" → "0xabc")
+        candidates = None
+        for term, found in self.results.items():
+            if term in text and (candidates is None or len(found) < len(candidates)):
+                candidates = found
+        if candidates is None:
+            positions = np.flatnonzero(keys.str.contains(text, regex=False).to_numpy(dtype=bool))
+        else:
+            matches = keys.iloc[candidates].str.contains(text, regex=False).to_numpy(dtype=bool)
+            positions = candidates[matches]
+
+        self.results[text] = positions
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+        return positions
@@ -0,0 +1,121 @@
+# sorting.py
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import config
+
+
+NUMBER_CHARS = "0123456789+-.eE "
+MAX_FIXED_WIDTH = 256  # au-delà, les textes sont comparés en Python (tableau 'U' trop lourd)
+
+
+def column_sort_keys(series, ascending=True):
+    """Clés np.lexsort d'une colonne (de la moins à la plus significative), selon son type.
+
+    Nombres triés numériquement, texte sans la casse ; dans une colonne
+    object mélangée, les nombres (y compris saisis en texte) passent avant
+    le texte. Les valeurs vides sont toujours en dernier, quel que soit le sens.
+    """
+    missing = series.isna().to_numpy()
+    sign = 1 if ascending else -1
+
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values = series.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        return [sign * np.where(missing, 0, values), missing]
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        return [sign * np.where(missing, 0.0, values), missing]
+
+    # Colonne object : travail sur les valeurs distinctes, puis report sur les lignes
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype=object)
+    numbers = numeric_values(uniques)
+    is_number = ~np.isnan(numbers)
+    texts = uniques.where(~is_number, "").astype(str).str.lower().to_numpy()
+    text_rank = text_ranks(texts)
+
+    codes = np.where(missing, 0, codes)
+    group = np.where(missing, 2, np.where(is_number[codes], 0, 1))  # nombres, texte, vides
+    return [sign * text_rank[codes], sign * np.where(is_number, numbers, 0.0)[codes], group]
+
+
+def numeric_values(values):
+    """Valeur numérique de chaque élément (NaN si ce n'est pas un nombre).
+
+    Seuls les textes écrits avec des caractères numériques passent par pd.to_numeric.
+    """
+    numbers = np.full(len(values), np.nan)
+    is_text = (values.map(type) == str).to_numpy()
+    if (~is_text).any():
+        numbers[~is_text] = pd.to_numeric(values[~is_text], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    if is_text.any():
+        texts = values[is_text].to_numpy()
+        candidates = looks_numeric(texts)
+        if candidates.any():
+            numbers[np.flatnonzero(is_text)[candidates]] = pd.to_numeric(texts[candidates], errors="coerce")
+    return numbers
+
+
+def looks_numeric(texts):
+    """Pré-filtre vectorisé : textes composés uniquement de chiffres, signes, point, exposant."""
+    if max(map(len, texts)) > MAX_FIXED_WIDTH:
+        return np.ones(len(texts), dtype=bool)
+    return np.char.strip(texts.astype("U"), NUMBER_CHARS) == ""
+
+
+def text_ranks(texts):
+    """Rang lexicographique de chaque texte (textes égaux → même rang)."""
+    if not len(texts):
+        return np.zeros(0, dtype=np.int64)
+    if max(map(len, texts)) > MAX_FIXED_WIDTH:
+        return pd.factorize(texts, sort=True)[0]
+    fixed = texts.astype("U")  # comparaison native, bien plus rapide que sur des objets Python
+    order = np.argsort(fixed, kind="stable")
+    ordered = fixed[order]
+    ranks = np.empty(len(texts), dtype=np.int64)
+    ranks[order] = np.cumsum(np.r_[False, ordered[1:] != ordered[:-1]])
+    return ranks
+
+
+def sort_order(df, sort_keys):
+    """Permutation (positions du DataFrame) triant selon [(colonne, croissant), ...], tri stable."""
+    keys = []
+    for column, ascending in reversed(sort_keys):
+        keys.extend(column_sort_keys(df[column], ascending))
+    return np.lexsort(keys) if keys else np.arange(len(df))
+
+
+class SortCache:
+    """Cache LRU des permutations de tri.
+
+    La clé combine les colonnes et sens du tri avec les versions de
+    structure et de colonnes tenues par le FilterCache : une édition ne
+    périme que les tris qui lisent sa colonne. Les données ne sont jamais
+    réordonnées, seule la vue applique la permutation.
+    """
+
+    def __init__(self, max_entries=config.SORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def clear(self):
+        self.entries.clear()
+
+    def get(self, df, sort_keys, versions):
+        key = (
+            tuple(sort_keys),
+            versions.structure_version,
+            tuple(versions.column_versions.get(column, 0) for column, _ in sort_keys),
+        )
+        order = self.entries.get(key)
+        if order is None:
+            order = sort_order(df, sort_keys)
+            self.entries[key] = order
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return order
@@ -0,0 +1,431 @@
+# sqlite_backend.py
+
+import ast
+import json
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import config
+import storage
+from history import ColumnRename, CompoundOperation, LocksChange
+from logger import logger
+
+TABLE = "tokens"
+ROW_ID = "row_id"
+ROW_ORDER = "row_order"  # ordre des lignes : clé réelle, une insertion prend une valeur entre ses voisines
+KEY_INDEX = "token_key"
+MIN_ORDER_GAP = 1e-9  # en dessous, les clés d'ordre sont renumérotées
+
+# Types numpy / pandas que sqlite3 ne sait pas écrire tels quels
+for numpy_type in (np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64):
+    sqlite3.register_adapter(numpy_type, int)
+sqlite3.register_adapter(np.float32, float)
+sqlite3.register_adapter(np.bool_, bool)
+sqlite3.register_adapter(pd.Timestamp, lambda value: value.isoformat())
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def column_affinity(dtype):
+    """Type SQLite d'une colonne. Les colonnes object n'en ont pas : chaque valeur
+    garde son type (texte saisi dans une colonne de nombres, par exemple)."""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return ""
+
+
+def sql_rows(df, order=None):
+    """Lignes (identifiant, [clé d'ordre,] valeurs...) prêtes pour executemany : NaN → NULL."""
+    values = df.astype(object)
+    values = values.where(df.notna(), None)
+    if order is not None:
+        values.insert(0, ROW_ORDER, order)
+    return list(values.itertuples(index=True, name=None))
+
+
+def insert_statement(columns):
+    names = ", ".join(quote(name) for name in columns)
+    return (
+        f"INSERT OR REPLACE INTO {TABLE} ({ROW_ID}, {ROW_ORDER}, {names}) "
+        f"VALUES ({', '.join('?' * (len(columns) + 2))})"
+    )
+
+
+# ========== TRADUCTION DES FILTRES ==========
+class UnsupportedFilter(Exception):
+    """Construction du filtre avancé sans équivalent SQL : évaluation par pandas."""
+
+
+COMPARISONS = {
+    ast.Eq: "=",
+    ast.NotEq: "IS NOT",  # comme pandas : une valeur vide est différente de tout
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+}
+
+
+def translate_filter(expression, columns):
+    """Traduit une expression du filtre avancé (syntaxe df.eval) en clause WHERE.
+
+    Retourne (sql, paramètres), ou None si l'expression sort du sous-ensemble
+    traduisible (comparaisons, in / not in, and / or / not, & | ~) : elle est
+    alors évaluée par pandas sur les lignes chargées.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+        params = []
+        return FilterTranslator(set(columns), params).condition(tree.body), params
+    except (SyntaxError, UnsupportedFilter):
+        return None
+
+
+class FilterTranslator:
+    def __init__(self, columns, params):
+        self.columns = columns
+        self.params = params
+
+    def condition(self, node):
+        if isinstance(node, ast.BoolOp):
+            joiner = " AND " if isinstance(node.op, ast.And) else " OR "
+            return "(" + joiner.join(self.condition(value) for value in node.values) + ")"
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+            joiner = " AND " if isinstance(node.op, ast.BitAnd) else " OR "
+            return f"({self.condition(node.left)}{joiner}{self.condition(node.right)})"
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.Invert)):
+            # NULL → faux avant la négation, comme pandas
+            return f"(NOT COALESCE({self.condition(node.operand)}, 0))"
+        if isinstance(node, ast.Compare):
+            parts, left = [], node.left
+            for op, right in zip(node.ops, node.comparators):
+                parts.append(self.comparison(left, op, right))
+                left = right
+            return parts[0] if len(parts) == 1 else "(" + " AND ".join(parts) + ")"
+        raise UnsupportedFilter(ast.dump(node))
+
+    def comparison(self, left, op, right):
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if not isinstance(right, (ast.List, ast.Tuple, ast.Set)) or not right.elts:
+                raise UnsupportedFilter("in")
+            values = ", ".join(self.operand(element, column=False) for element in right.elts)
+            test = f"{self.operand(left, constant=False)} IN ({values})"
+            return test if isinstance(op, ast.In) else f"(NOT COALESCE({test}, 0))"
+        if type(op) not in COMPARISONS:
+            raise UnsupportedFilter(type(op).__name__)
+        return f"{self.operand(left)} {COMPARISONS[type(op)]} {self.operand(right)}"
+
+    def operand(self, node, column=True, constant=True):
+        if column and isinstance(node, ast.Name):
+            if node.id not in self.columns:
+                raise UnsupportedFilter(node.id)
+            return quote(node.id)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            node = ast.Constant(-node.operand.value) if isinstance(node.operand, ast.Constant) else None
+        if constant and isinstance(node, ast.Constant) and isinstance(node.value, (str, int, float, bool)):
+            self.params.append(node.value)
+            return "?"
+        raise UnsupportedFilter(ast.dump(node) if node is not None else "-")
+
+
+# ========== FICHIER ==========
+def connect(path):
+    connection = sqlite3.connect(str(path))
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def write_table(path, df, metadata, progress=None, cancelled=None):
+    """Crée une base SQLite : table des lignes (clé naturelle indexée), verrous et métadonnées.
+
+    Les identifiants de ligne du DataFrame deviennent les row_id de la table.
+    """
+    connection = sqlite3.connect(str(path))
+    try:
+        columns = ", ".join(f"{quote(name)} {column_affinity(dtype)}".rstrip() for name, dtype in df.dtypes.items())
+        connection.execute(f"CREATE TABLE {TABLE} ({ROW_ID} INTEGER PRIMARY KEY, {ROW_ORDER} REAL, {columns})")
+        connection.execute(f"CREATE INDEX token_order ON {TABLE} ({ROW_ORDER})")
+        connection.execute("CREATE TABLE locks (column_name TEXT, row_id INTEGER, PRIMARY KEY (column_name, row_id)) WITHOUT ROWID")
+        connection.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+        ensure_key_index(connection, df.columns)
+
+        insert = insert_statement(df.columns)
+        chunk_size = config.IO_CHUNK_ROWS
+        for start in range(0, len(df), chunk_size):
+            storage.check_cancelled(cancelled)
+            chunk = df.iloc[start:start + chunk_size]
+            connection.executemany(insert, sql_rows(chunk, np.arange(start, start + len(chunk), dtype=float)))
+            storage.report(progress, 95 * min(start + chunk_size, len(df)) / max(len(df), 1), "Écriture des données")
+
+        for column, positions in storage.locks_by_column(metadata.get('locked_cells', {}), df).items():
+            connection.executemany(
+                "INSERT INTO locks VALUES (?, ?)", ((str(column), int(row_id)) for row_id in df.index[positions])
+            )
+        small = {key: value for key, value in metadata.items() if key != 'locked_cells'}
+        small['column_dtypes'] = {str(col): str(dtype) for col, dtype in df.dtypes.items()}
+        small['columns'] = [str(name) for name in df.columns]
+        write_metadata(connection, small)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def read_table(path, expression=None, progress=None, cancelled=None):
+    """Charge la table, ou seulement les lignes qui satisfont `expression` si elle se
+    traduit en SQL. Retourne (DataFrame indexé par row_id, métadonnées)."""
+    connection = sqlite3.connect(str(path))
+    try:
+        metadata = read_metadata(connection)
+        available = table_columns(connection)
+        columns = [name for name in metadata.get('columns', []) if name in available]
+        columns += [name for name in available if name not in columns]
+
+        where, params = "", []
+        if expression:
+            translated = translate_filter(expression, columns)
+            if translated is None:
+                logger.info(f"🔍 Filtre non traduisible en SQL, évalué après chargement : {expression}")
+            else:
+                where, params = f" WHERE {translated[0]}", translated[1]
+                metadata['view_filter'] = expression
+
+        total = connection.execute(f"SELECT COUNT(*) FROM {TABLE}{where}", params).fetchone()[0] if progress else 0
+        query = f"SELECT {ROW_ID}, {', '.join(quote(name) for name in columns)} FROM {TABLE}{where} ORDER BY {ROW_ORDER}"
+        chunks = []
+        for chunk in pd.read_sql_query(query, connection, index_col=ROW_ID, params=params, chunksize=config.IO_CHUNK_ROWS):
+            storage.check_cancelled(cancelled)
+            chunks.append(chunk)
+            storage.report(progress, 90 * sum(map(len, chunks)) / max(total, 1), "Lecture des données")
+        if len(chunks) > 1:
+            # Colonnes entièrement vides d'un morceau : sans type propre, écartées de la concaténation
+            chunks = [chunk.dropna(axis=1, how='all') for chunk in chunks]
+            df = pd.concat(chunks).reindex(columns=columns)
+        elif chunks:
+            df = chunks[0]
+        else:
+            df = pd.DataFrame(columns=columns, index=pd.Index([], name=ROW_ID))
+        df.index.name = None
+        restore_dtypes(df, metadata.get('column_dtypes', {}))
+
+        locked_cells = {}
+        for column, row_id in connection.execute("SELECT column_name, row_id FROM locks"):
+            locked_cells.setdefault(column, []).append(row_id)
+        metadata['locked_cells'] = {}
+        for column, row_ids in locked_cells.items():
+            positions = df.index.get_indexer(row_ids)
+            metadata['locked_cells'][column] = np.sort(positions[positions >= 0])
+
+        max_id = connection.execute(f"SELECT MAX({ROW_ID}) FROM {TABLE}").fetchone()[0]
+        metadata['next_row_id'] = max(int(metadata.get('next_row_id', 0)), (max_id if max_id is not None else -1) + 1)
+    finally:
+        connection.close()
+    storage.report(progress, 100, "Chargement terminé")
+    return df, metadata
+
+
+def restore_dtypes(df, column_dtypes):
+    """Types pandas d'origine (SQLite ne distingue ni entiers nullables, ni booléens, ni dates)."""
+    for column, dtype in column_dtypes.items():
+        if column not in df.columns or str(df[column].dtype) == dtype:
+            continue
+        try:
+            if dtype.startswith("datetime64"):
+                df[column] = pd.to_datetime(df[column])
+            elif dtype == "object":
+                df[column] = df[column].astype(object)
+            elif dtype == "bool" or pd.api.types.is_numeric_dtype(dtype):
+                values = pd.to_numeric(df[column], errors="coerce")
+                df[column] = values if values.isna().any() else values.astype(dtype)
+        except Exception as e:
+            logger.warning(f"Erreur lors de la conversion du type de la colonne '{column}' : {e}")
+
+
+def table_columns(connection):
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({TABLE})") if row[1] not in (ROW_ID, ROW_ORDER)]
+
+
+def ensure_key_index(connection, columns):
+    """Index sur la clé naturelle, tant que toutes ses colonnes existent."""
+    if all(column in columns for column in config.IMMUTABLE_COLUMNS):
+        keys = ", ".join(quote(column) for column in config.IMMUTABLE_COLUMNS)
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {KEY_INDEX} ON {TABLE} ({keys})")
+
+
+def read_metadata(connection):
+    row = connection.execute("SELECT value FROM metadata WHERE key = 'table'").fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+def write_metadata(connection, metadata):
+    connection.execute(
+        "INSERT OR REPLACE INTO metadata VALUES ('table', ?)", (json.dumps(metadata, default=str),)
+    )
+
+
+# ========== ECRITURE INCREMENTALE ==========
+class SqliteBackend:
+    """Base SQLite rattachée au TokenStore : chaque opération y est répercutée.
+
+    Une édition de cellule devient un UPDATE d'une ligne, une insertion ou
+    une suppression de lignes un INSERT / DELETE, un changement de colonne
+    un ALTER TABLE ; rien n'est réécrit en bloc. L'état écrit est celui du
+    DataFrame après l'opération (do, undo ou redo) : seules les lignes,
+    cellules et colonnes qu'elle touche sont relues.
+
+    `view_filter` : filtre avancé poussé dans la requête de chargement,
+    seules les lignes correspondantes sont en mémoire.
+    """
+
+    def __init__(self, path, view_filter=None):
+        self.path = path
+        self.view_filter = view_filter
+        self.connection = connect(path)
+
+    def close(self):
+        self.connection.close()
+
+    def read(self, expression=None):
+        return read_table(self.path, expression)
+
+    def apply(self, op, action, store):
+        with self.connection:
+            self.sync_columns(op, action, store)
+            operations = op.operations if isinstance(op, CompoundOperation) else [op]
+            for child in operations:
+                if isinstance(child, LocksChange):
+                    self.sync_locks(child.cells(), store)
+                else:
+                    self.sync_rows(child.touched_rows(store), store)
+                    self.sync_cells(child.cells(), store)
+            self.save_metadata(store)
+
+    def save_metadata(self, store):
+        write_metadata(self.connection, {
+            'column_dtypes': {str(col): str(dtype) for col, dtype in store.df.dtypes.items()},
+            'hidden_columns': sorted(store.hidden_columns),
+            'active_filter': str(store.active_filter),
+            'quick_search_term': str(store.quick_search_term),
+            'columns': [str(name) for name in store.df.columns],
+            'next_row_id': store.next_row_id,
+        })
+
+    def commit(self, store):
+        with self.connection:
+            self.save_metadata(store)
+
+    # ========== SYNCHRONISATION ==========
+    def sync_columns(self, op, action, store):
+        operations = op.operations if isinstance(op, CompoundOperation) else [op]
+        for child in operations:
+            if isinstance(child, ColumnRename):
+                old, new = (child.new, child.old) if action == "undo" else (child.old, child.new)
+                self.connection.execute(f"ALTER TABLE {TABLE} RENAME COLUMN {quote(old)} TO {quote(new)}")
+                self.connection.execute("UPDATE locks SET column_name = ? WHERE column_name = ?", (new, old))
+
+        existing = table_columns(self.connection)
+        removed = [name for name in existing if name not in store.df.columns]
+        if any(name in config.IMMUTABLE_COLUMNS for name in removed):
+            self.connection.execute(f"DROP INDEX IF EXISTS {KEY_INDEX}")
+        for name in removed:
+            self.connection.execute(f"ALTER TABLE {TABLE} DROP COLUMN {quote(name)}")
+            self.connection.execute("DELETE FROM locks WHERE column_name = ?", (name,))
+
+        for name in store.df.columns:
+            if name in existing:
+                continue
+            self.connection.execute(
+                f"ALTER TABLE {TABLE} ADD COLUMN {quote(name)} {column_affinity(store.df[name].dtype)}".rstrip()
+            )
+            self.sync_cells([(row_id, name) for row_id in store.df.index], store)
+            self.sync_locks([(row_id, name) for row_id in store.locks.columns.get(name, ())], store)
+        ensure_key_index(self.connection, store.df.columns)
+
+    def sync_rows(self, row_ids, store):
+        """Lignes présentes dans le DataFrame : écrites en entier ; absentes : supprimées."""
+        if not len(row_ids):
+            return
+        row_ids = pd.Index(row_ids)
+        positions = store.df.index.get_indexer(row_ids)
+        removed = [(int(row_id),) for row_id in row_ids[positions < 0]]
+        self.connection.executemany(f"DELETE FROM {TABLE} WHERE {ROW_ID} = ?", removed)
+        self.connection.executemany("DELETE FROM locks WHERE row_id = ?", [(int(row_id),) for row_id in row_ids])
+
+        positions = np.sort(positions[positions >= 0])
+        present = store.df.iloc[positions]
+        if len(present):
+            self.connection.executemany(
+                insert_statement(present.columns), sql_rows(present, self.order_keys(positions, store))
+            )
+            # Les verrous suivent les lignes (rétablis avec elles à l'undo)
+            self.connection.executemany("INSERT INTO locks VALUES (?, ?)", [
+                (str(column), int(row_id))
+                for column, locked_rows in store.locks.columns.items() if column in present.columns
+                for row_id in locked_rows.intersection(present.index)
+            ])
+
+    def order_keys(self, positions, store):
+        """Clés d'ordre des lignes aux positions (triées) données, entre celles de leurs voisines."""
+        keys = np.empty(len(positions))
+        runs = np.split(np.arange(len(positions)), np.flatnonzero(np.diff(positions) != 1) + 1)
+        for run in runs:
+            first, last = positions[run[0]], positions[run[-1]]
+            before = self.row_order(store, first - 1)
+            after = self.row_order(store, last + 1)
+            if before is not None and after is not None and (after - before) / (len(run) + 1) < MIN_ORDER_GAP:
+                self.renumber()
+                before, after = self.row_order(store, first - 1), self.row_order(store, last + 1)
+            steps = np.arange(1, len(run) + 1)
+            if before is None and after is None:
+                keys[run] = steps
+            elif after is None:
+                keys[run] = before + steps
+            elif before is None:
+                keys[run] = after - steps[::-1]
+            else:
+                keys[run] = before + (after - before) * steps / (len(run) + 1)
+        return keys
+
+    def row_order(self, store, position):
+        if not 0 <= position < len(store.df):
+            return None
+        row = self.connection.execute(
+            f"SELECT {ROW_ORDER} FROM {TABLE} WHERE {ROW_ID} = ?", (int(store.df.index[position]),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def renumber(self):
+        """Clés d'ordre ramenées à 0, 1, 2... (insertions répétées au même endroit)."""
+        self.connection.execute(f"""
+            WITH ranked AS (SELECT {ROW_ID}, ROW_NUMBER() OVER (ORDER BY {ROW_ORDER}, {ROW_ID}) AS rank FROM {TABLE})
+            UPDATE {TABLE} SET {ROW_ORDER} = (SELECT rank FROM ranked WHERE ranked.{ROW_ID} = {TABLE}.{ROW_ID})
+        """)
+
+    def sync_cells(self, cells, store):
+        """Un UPDATE par cellule, regroupés par colonne."""
+        by_column = {}
+        for row_id, column in cells:
+            by_column.setdefault(column, []).append(row_id)
+        for column, row_ids in by_column.items():
+            if column not in store.df.columns:
+                continue
+            positions = store.df.index.get_indexer(row_ids)
+            positions = positions[positions >= 0]
+            values = store.df[column].iloc[positions]
+            self.connection.executemany(
+                f"UPDATE {TABLE} SET {quote(column)} = ? WHERE {ROW_ID} = ?",
+                [(value, int(row_id)) for row_id, value in sql_rows(values.to_frame())],
+            )
+
+    def sync_locks(self, cells, store):
+        locked, unlocked = [], []
+        for row_id, column in cells:
+            (locked if store.locks.is_locked(row_id, column) else unlocked).append((str(column), int(row_id)))
+        self.connection.executemany("INSERT OR IGNORE INTO locks VALUES (?, ?)", locked)
+        self.connection.executemany("DELETE FROM locks WHERE column_name = ? AND row_id = ?", unlocked)
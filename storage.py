@@ -0,0 +1,464 @@
+# storage.py
+
+import ast
+import json
+import os
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from xml.etree import ElementTree
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.packaging.custom import StringProperty
+
+import config
+import lazy_columns
+import sqlite_backend
+from logger import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow absent : seul le format xlsx reste disponible
+    pa = None
+
+METADATA_KEY = b"token_manager"
+PARQUET_SUFFIXES = {".parquet", ".pq"}
+FEATHER_SUFFIXES = {".feather", ".arrow"}
+EXCEL_SUFFIXES = {".xlsx", ".xlsm"}
+SQLITE_SUFFIXES = {".sqlite", ".sqlite3", ".db"}
+SIDECAR_SUFFIX = ".meta.npz"
+SIDECAR_VERSION = 1
+
+
+def columnar_available():
+    return pa is not None
+
+
+def default_path():
+    """Fichier principal : le store colonnaire si pyarrow est installé, sinon l'ancien xlsx."""
+    return Path(config.DEFAULT_DB_FILE) if columnar_available() else Path(config.LEGACY_DB_FILE)
+
+
+def file_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in PARQUET_SUFFIXES:
+        return "parquet"
+    if suffix in FEATHER_SUFFIXES:
+        return "feather"
+    if suffix in EXCEL_SUFFIXES:
+        return "excel"
+    if suffix in SQLITE_SUFFIXES:
+        return "sqlite"
+    raise ValueError(f"Format de fichier non supporté : {path}")
+
+
+class Cancelled(Exception):
+    """Lecture ou écriture interrompue à la demande de l'utilisateur."""
+
+
+def resolve_load_path(path=None):
+    """Fichier à charger : `path`, sinon le store principal, sinon l'ancien data.xlsx."""
+    if path is not None:
+        return Path(path)
+    path = default_path()
+    if not path.exists() and Path(config.LEGACY_DB_FILE).exists():
+        logger.info(f"Store {path.name} absent : import de {Path(config.LEGACY_DB_FILE).name}")
+        return Path(config.LEGACY_DB_FILE)
+    return path
+
+
+def check_cancelled(cancelled):
+    if cancelled is not None and cancelled():
+        raise Cancelled()
+
+
+def report(progress, percent, message):
+    if progress is not None:
+        progress(int(percent), message)
+
+
+# ========== LECTURE ==========
+def load_table(path, progress=None, cancelled=None, expression=None):
+    """Charge un fichier de données. Retourne (DataFrame, métadonnées).
+
+    Les métadonnées sont lues dans un thread séparé pendant la lecture des
+    données ; `progress(pourcentage, message)` et `cancelled()` sont optionnels.
+    `expression` (filtre avancé) n'est utilisée que par SQLite, qui ne charge
+    alors que les lignes correspondantes ; ailleurs, elle est ignorée.
+
+    Parquet et feather : les colonnes masquées ne sont pas lues (voir
+    lazy_columns) ; les métadonnées sont alors lues avant les données.
+    """
+    fmt = file_format(path)
+    if fmt == "sqlite":
+        return sqlite_backend.read_table(path, expression, progress, cancelled)
+    if fmt != "excel":
+        require_pyarrow(fmt)
+
+    if fmt != "excel" and config.LAZY_HIDDEN_COLUMNS:
+        metadata = read_metadata(path, fmt)
+        names = arrow_schema(path, fmt).names
+        deferred = lazy_columns.deferred_columns(names, metadata.get('hidden_columns', []))
+        df = read_data(path, fmt, progress, cancelled, [name for name in names if name not in deferred])
+        if deferred:
+            lazy_columns.insert_placeholders(df, names, deferred)
+            metadata['lazy_columns'] = {'path': str(path), 'columns': deferred}
+            logger.info(f"💤 Colonnes masquées laissées sur disque : {', '.join(deferred)}")
+        report(progress, 100, "Chargement terminé")
+        return df, metadata
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        metadata_future = executor.submit(read_metadata, path, fmt)
+        df = read_data(path, fmt, progress, cancelled)
+        metadata = metadata_future.result()
+
+    if fmt == "excel":
+        # Excel ne conserve pas les types : on réapplique ceux des métadonnées
+        apply_column_dtypes(df, metadata.get('column_dtypes', {}))
+    report(progress, 100, "Chargement terminé")
+    return df, metadata
+
+
+def read_metadata(path, fmt):
+    """Métadonnées intégrées au fichier, complétées par le fichier annexe binaire."""
+    if fmt == "excel":
+        # L'identifiant de sauvegarde est dans les propriétés du classeur : la feuille
+        # Metadata (lente à ouvrir, openpyxl parcourt toutes les feuilles) ne sert
+        # qu'aux fichiers sans annexe
+        sidecar = read_sidecar(sidecar_path(path), excel_generation(path))
+        if sidecar is not None:
+            return sidecar
+    metadata = read_embedded_metadata(path, fmt)
+    sidecar = read_sidecar(sidecar_path(path), metadata.get('metadata_generation'))
+    if sidecar is not None:
+        metadata.update(sidecar)
+    elif metadata.get('locked_cells_count'):
+        logger.warning(f"⚠️ {sidecar_path(path).name} absent ou d'une autre sauvegarde : verrous non restaurés.")
+    return metadata
+
+
+def read_embedded_metadata(path, fmt):
+    if fmt == "excel":
+        return read_excel_metadata(path)
+    raw = (arrow_schema(path, fmt).metadata or {}).get(METADATA_KEY)
+    return json.loads(raw) if raw else {}
+
+
+def arrow_schema(path, fmt):
+    if fmt == "parquet":
+        return pq.read_schema(path)
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).schema
+
+
+def read_data(path, fmt, progress=None, cancelled=None, columns=None):
+    """`columns` : colonnes à lire (parquet, feather), toutes si None."""
+    if fmt == "parquet":
+        parquet_file = pq.ParquetFile(path)
+        groups = []
+        for i in range(parquet_file.num_row_groups):
+            check_cancelled(cancelled)
+            groups.append(parquet_file.read_row_group(i, columns=columns))
+            report(progress, 90 * (i + 1) / parquet_file.num_row_groups, "Lecture des données")
+        if groups:
+            table = pa.concat_tables(groups)
+        else:
+            table = parquet_file.schema_arrow.empty_table()
+            table = table.select(columns) if columns is not None else table
+        return table.to_pandas()
+
+    if fmt == "feather":
+        check_cancelled(cancelled)
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    header, rows = None, []
+    for chunk_header, chunk, percent in iter_excel_chunks(path, 'Data', config.IO_CHUNK_ROWS):
+        check_cancelled(cancelled)
+        header = chunk_header
+        rows.extend(chunk)
+        report(progress, 90 * percent, "Lecture des données")
+    return excel_rows_to_frame(header or [], rows)
+
+
+def read_column(path, name):
+    """Une seule colonne d'un fichier parquet ou feather (colonnes lues à la demande)."""
+    fmt = file_format(path)
+    require_pyarrow(fmt)
+    if fmt == "parquet":
+        table = pq.read_table(path, columns=[name])
+    else:
+        table = feather.read_table(path, columns=[name], memory_map=True)
+    return table.to_pandas()[name]
+
+
+def iter_excel_chunks(path, sheet_name, chunk_size):
+    """Lit une feuille en mode read-only par paquets de lignes.
+
+    Produit (en-tête, lignes, avancement 0..1). La feuille 'Data' absente → première feuille.
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name in workbook.sheetnames else workbook.worksheets[0]
+        total = sheet.max_row or 0
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+
+        width = len(header)
+        chunk, done = [], 1
+        for row in rows:
+            # Les cellules vides en fin de ligne ne sont pas toujours écrites
+            chunk.append(row[:width] if len(row) >= width else row + (None,) * (width - len(row)))
+            if len(chunk) >= chunk_size:
+                done += len(chunk)
+                yield header, chunk, min(done / total, 1.0) if total else 0.0
+                chunk = []
+        yield header, chunk, 1.0
+    finally:
+        workbook.close()
+
+
+def excel_rows_to_frame(header, rows):
+    # Les lignes vides en fin de feuille ne font pas partie des données
+    while rows and all(value is None for value in rows[-1]):
+        rows.pop()
+    df = pd.DataFrame(rows, columns=header).infer_objects()
+    # Comme pd.read_excel : une colonne entièrement vide est numérique (NaN)
+    for col in df.columns[(df.dtypes == object).to_numpy() & df.isna().all().to_numpy()]:
+        df[col] = df[col].astype(float)
+    return df
+
+
+def excel_generation(path):
+    """Identifiant de sauvegarde écrit dans docProps/custom.xml (None si absent)."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            tree = ElementTree.fromstring(archive.read("docProps/custom.xml"))
+    except (KeyError, OSError, zipfile.BadZipFile, ElementTree.ParseError):
+        return None
+    for prop in tree:
+        if prop.get("name") == "metadata_generation" and len(prop):
+            return prop[0].text
+    return None
+
+
+def read_excel_metadata(path):
+    """Format historique : feuille 'Metadata' (littéraux Python dans une seule ligne)."""
+    # Lecture seule : seule la feuille Metadata est parcourue, pas les données
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if 'Metadata' not in workbook.sheetnames:
+            return {}
+        rows = list(workbook['Metadata'].iter_rows(min_row=1, max_row=2, values_only=True))
+    finally:
+        workbook.close()
+    raw = {key: value for key, value in zip(*rows) if key is not None and value is not None} if len(rows) == 2 else {}
+
+    # Conversion des chaînes en listes Python (les verrous sont dans le fichier annexe,
+    # sauf pour les fichiers écrits avant son introduction)
+    return {
+        'hidden_columns': ast.literal_eval(raw.get('hidden_columns', '[]')),
+        'locked_cells': ast.literal_eval(raw.get('locked_cells', '[]')),
+        'column_dtypes': ast.literal_eval(raw.get('column_dtypes', '{}')),
+        'active_filter': str(raw.get('active_filter', '')),
+        'quick_search_term': str(raw.get('quick_search_term', '')),
+        'metadata_generation': str(raw.get('metadata_generation', '')),
+        'locked_cells_count': int(raw.get('locked_cells_count', 0) or 0),
+    }
+
+
+def apply_column_dtypes(df, column_dtypes):
+    for col, dtype in column_dtypes.items():
+        if col in df.columns:
+            try:
+                if dtype == 'object':
+                    df[col] = df[col].astype('object')
+                elif pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype)):
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+                # Catégories, texte Arrow : lus en object, recompactés au chargement
+            except Exception as e:
+                logger.warning(f"Erreur lors de la conversion du type de la colonne '{col}' : {e}")
+
+
+# ========== ECRITURE ==========
+def save_table(path, df, metadata, progress=None, cancelled=None):
+    """Écrit le DataFrame et ses métadonnées, de façon atomique (fichier temporaire + rename).
+
+    Les verrous partent dans le fichier annexe binaire ; le fichier de données
+    ne garde que les petites métadonnées et l'identifiant de sauvegarde qui
+    relie les deux.
+    """
+    path = Path(path)
+    fmt = file_format(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if fmt == "sqlite":
+        # Base complète (verrous compris) : pas de fichier annexe
+        tmp_path.unlink(missing_ok=True)
+        try:
+            sqlite_backend.write_table(tmp_path, df, metadata, progress, cancelled)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        for suffix in ("-wal", "-shm"):  # journaux SQLite de l'ancienne base
+            path.with_name(path.name + suffix).unlink(missing_ok=True)
+        os.replace(tmp_path, path)
+        report(progress, 100, "Sauvegarde terminée")
+        return
+
+    meta_path = sidecar_path(path)
+    meta_tmp_path = meta_path.with_name(meta_path.name + ".tmp")
+
+    locked_cells = locks_by_column(metadata.get('locked_cells', {}), df)
+    embedded = {key: value for key, value in metadata.items() if key != 'locked_cells'}
+    embedded['metadata_generation'] = uuid.uuid4().hex
+    embedded['locked_cells_count'] = sum(len(rows) for rows in locked_cells.values())
+
+    try:
+        if fmt == "excel":
+            write_excel(tmp_path, df, embedded, progress, cancelled)
+        else:
+            require_pyarrow(fmt)
+            write_arrow(tmp_path, fmt, df, embedded, progress, cancelled)
+        check_cancelled(cancelled)
+        write_sidecar(meta_tmp_path, embedded, locked_cells)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        meta_tmp_path.unlink(missing_ok=True)
+        raise
+
+    # Données d'abord : interrompu entre les deux, le fichier de données est à jour
+    # et l'ancienne annexe, d'une autre génération, est ignorée à la lecture
+    os.replace(tmp_path, path)
+    os.replace(meta_tmp_path, meta_path)
+    report(progress, 100, "Sauvegarde terminée")
+
+
+def write_arrow(path, fmt, df, metadata, progress=None, cancelled=None):
+    df = arrow_compatible(df)
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(metadata, default=str).encode("utf-8")
+    schema = schema.with_metadata(schema_metadata)
+
+    if fmt == "feather":
+        check_cancelled(cancelled)
+        feather.write_feather(pa.Table.from_pandas(df, schema=schema, preserve_index=False), path)
+        return
+
+    # Un row group par paquet : progression et annulation entre deux paquets
+    chunk_size = config.IO_CHUNK_ROWS
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, max(len(df), 1), chunk_size):
+            check_cancelled(cancelled)
+            chunk = df.iloc[start:start + chunk_size]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            report(progress, 100 * min(start + chunk_size, len(df)) / max(len(df), 1), "Écriture des données")
+
+
+def write_excel(path, df, metadata, progress=None, cancelled=None):
+    workbook = openpyxl.Workbook(write_only=True)
+    data_sheet = workbook.create_sheet('Data')
+    data_sheet.append([str(col) for col in df.columns])
+
+    chunk_size = config.IO_CHUNK_ROWS
+    for start in range(0, len(df), chunk_size):
+        if cancelled is not None and cancelled():
+            data_sheet.close()  # libère le fichier temporaire d'openpyxl
+            raise Cancelled()
+        chunk = df.iloc[start:start + chunk_size].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            data_sheet.append(row)
+        report(progress, 95 * min(start + chunk_size, len(df)) / max(len(df), 1), "Écriture des données")
+
+    metadata_sheet = workbook.create_sheet('Metadata')
+    metadata_sheet.append(list(metadata.keys()))
+    metadata_sheet.append([str(value) for value in metadata.values()])
+    if metadata.get('metadata_generation'):
+        workbook.custom_doc_props.append(StringProperty(name='metadata_generation', value=metadata['metadata_generation']))
+    workbook.save(path)
+
+
+# ========== FICHIER ANNEXE ==========
+def sidecar_path(path):
+    """Fichier annexe des métadonnées volumineuses (à côté du fichier de données)."""
+    path = Path(path)
+    return path.with_name(path.name + SIDECAR_SUFFIX)
+
+
+def locks_by_column(locked_cells, df):
+    """{colonne: positions} ; accepte aussi l'ancien format [(ligne, index de colonne), ...]."""
+    if isinstance(locked_cells, dict):
+        return locked_cells
+    by_column = {}
+    for row, col in locked_cells:
+        if 0 <= col < len(df.columns):
+            by_column.setdefault(str(df.columns[col]), []).append(row)
+    return by_column
+
+
+def write_sidecar(path, metadata, locked_cells):
+    """Archive numpy non compressée : en-tête JSON (schéma des types, colonnes
+    masquées, filtres) + verrous en un tableau d'entiers et ses bornes par colonne."""
+    columns = [column for column, rows in locked_cells.items() if len(rows)]
+    arrays = [np.asarray(locked_cells[column], dtype=np.int64) for column in columns]
+    rows = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64)
+    if not len(rows) or rows.max() < np.iinfo(np.int32).max:
+        rows = rows.astype(np.int32)
+    header = dict(metadata, sidecar_version=SIDECAR_VERSION, lock_columns=columns)
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            header=np.frombuffer(json.dumps(header, default=str).encode("utf-8"), dtype=np.uint8),
+            lock_offsets=np.cumsum([0] + [len(array) for array in arrays], dtype=np.int64),
+            lock_rows=rows,
+        )
+
+
+def read_sidecar(path, generation):
+    """Métadonnées du fichier annexe, ou None s'il manque ou vient d'une autre sauvegarde."""
+    if not generation or not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            header = json.loads(archive["header"].tobytes().decode("utf-8"))
+            if header.get('metadata_generation') != generation or header.get('sidecar_version') != SIDECAR_VERSION:
+                return None
+            offsets = archive["lock_offsets"]
+            rows = archive["lock_rows"]
+    except Exception as e:
+        logger.warning(f"⚠️ Fichier annexe {path.name} illisible : {e}")
+        return None
+    columns = header.pop('lock_columns', [])
+    header.pop('sidecar_version', None)
+    header['locked_cells'] = {column: rows[offsets[i]:offsets[i + 1]] for i, column in enumerate(columns)}
+    return header
+
+
+def arrow_compatible(df):
+    """Les colonnes object aux types mélangés (texte saisi dans une colonne numérique)
+    sont écrites en texte : Arrow exige un type unique par colonne."""
+    converted = None
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != object:
+            continue
+        types = {type(value) for value in series.dropna()}
+        if len(types) > 1:
+            if converted is None:
+                converted = df.copy(deep=False)
+            converted[col] = series.map(lambda value: str(value) if pd.notna(value) else None)
+    return df if converted is None else converted
+
+
+def require_pyarrow(fmt):
+    if pa is None:
+        raise ImportError(f"pyarrow est requis pour le format {fmt}")
@@ -1,60 +1,98 @@
-from PyQt5.QtWidgets import QMenu, QInputDialog, QMessageBox, QTableWidgetItem, QTableWidget, QApplication
-from PyQt5.QtCore import Qt
-import pandas as pd
-import ast 
+from PyQt5.QtWidgets import QMenu, QInputDialog, QMessageBox, QTableView, QApplication
+from PyQt5.QtCore import Qt, QTimer
+import numpy as np
 
+import config
+from instrumentation import table_rows, timed
 from logger import logger
+from table_model import DataFrameModel
+from token_store import TokenStore
 
 
+class TokenTableWidget(QTableView):
+    """Vue Qt du TokenStore : affichage, sélection, menus et rafraîchissements.
 
-class TokenTableWidget(QTableWidget):
+    Toute la logique de données (édition, verrous, filtres, historique) vit
+    dans `self.store` ; le widget ne fait que traduire les lignes de la vue
+    en positions du DataFrame et rafraîchir ce qui a changé.
+    """
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.df = pd.DataFrame()
-        self.history = []
-        self.redo_stack = []
-        self.locked_cells = set()  # (row, col)
+        self.store = TokenStore()
         self.active_filter = None
-        self.filtered_index = []
-        self.hidden_columns = set()  # Stockage persistant des colonnes masquées
-        self.quick_search_term = ""
+        self.filtered_index = np.arange(0)  # positions DataFrame des lignes visibles (vue → df)
         self.clipboard = QApplication.clipboard()
-        self.active_advanced_filter = None  # État du filtre1
         self.active_filters = []  # Liste pour stocker les filtres actifs
-        self.active_advanced_filter = None
         self.column_order = []
-        self.updating = False 
+        self.updating = False
+
+        # Recherche rapide différée : une seule recherche quand la frappe s'arrête
+        self.pending_search = ""
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(config.QUICK_SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(lambda: self.filter_table(self.pending_search))
 
         self.setup_table()
         self.setSortingEnabled(True)
+        self.default_edit_triggers = self.editTriggers()
 
         # Raccourcis clavier
         self.setFocusPolicy(Qt.StrongFocus)
         self.setFocus()
         self.setShortcutEnabled(True)
 
-        self.itemChanged.connect(self.on_item_changed)
+    # État de données partagé avec la fenêtre principale et le modèle
+    @property
+    def df(self):
+        return self.store.df
 
-    def on_item_changed(self, item):
-        row = item.row()
-        col = item.column()
-        df_row = self.filtered_index[row] if row < len(self.filtered_index) else row
+    @property
+    def hidden_columns(self):
+        return self.store.hidden_columns
 
-        # Si la cellule est verrouillée → on rétablit l’ancienne valeur
-        if (df_row, col) in self.locked_cells:
-            self.blockSignals(True)
-            old_value = str(self.df.iat[df_row, col]) if pd.notna(self.df.iat[df_row, col]) else ""
-            item.setText(old_value)
-            self.blockSignals(False)
-            #logger.warning(f"✋ Modification bloquée : cellule verrouillée ({row}, {col})")
-            return
+    @hidden_columns.setter
+    def hidden_columns(self, columns):
+        self.store.set_hidden_columns(columns)
+
+    @property
+    def schema(self):
+        return self.store.schema
+
+    def on_cell_edited(self, row, col, new_value):
+        if not self.check_writable():
+            return False
+        df_row = self.df_row(row)
+        dtype = self.df.dtypes.iat[col]
+
+        # Cellule verrouillée ou clé en double → on garde l’ancienne valeur
+        accepted, op = self.store.edit_cell(df_row, col, new_value)
+        if op is None:
+            return accepted
 
-        # Appliquer la modif dans le DataFrame
-        new_value = item.text()
-        self.df.iat[df_row, col] = new_value if new_value != "" else None
+        self.refresh_row(df_row, col)
 
-        self.update_table_and_filters()
+        # Les types proposés à l'autocomplétion ne peuvent changer que si le
+        # type de la valeur (ou de la colonne) a changé
+        if self.df.dtypes.iat[col] != dtype or type(op.old) is not type(op.new):
+            if hasattr(self.parent(), "update_filter_autocompletion"):
+                self.parent().update_filter_autocompletion()
+        return True
+
+    def refresh_row(self, df_row, col):
+        """Met à jour une seule cellule : affichage, appartenance aux filtres et compteur."""
+        row = self.view_row(df_row)
+        if row is not None:
+            self.model.refresh_cell(row, col)
+
+        visibility = self.store.visibility
+        if visibility.row_count != len(self.df):
+            return
+        self.store.update_row_filters(df_row, self.quick_search_text())
+        sort_key = any(column == self.df.columns[col] for column, _ in self.store.active_sort_keys())
+        if sort_key or visibility.combined_row(df_row) != (row is not None):
+            self.apply_visibility()  # ligne filtrée, ou à déplacer dans la vue triée
 
     # ========== RIGHT CLICK MENU ========== OK
     def contextMenuEvent(self, event):
@@ -71,7 +109,7 @@ class TokenTableWidget(QTableWidget):
 
         # Gestion des lignes
         menu.addAction("➕ Ajouter une ligne vide", lambda: self.add_row())
-        menu.addAction("📄 Dupliquer les lignes sélectionnées", lambda: self.duplicate_selected_rows(self.selectedIndexes()))
+        menu.addAction("📄 Dupliquer les lignes sélectionnées", self.duplicate_selected_rows)
         menu.addAction("🗑️ Supprimer les lignes sélectionnées", self.delete_selected_rows)
 
         # Colonnes
@@ -96,402 +134,303 @@ class TokenTableWidget(QTableWidget):
         menu.addAction("📋 Coller", self.paste_selected_cells) # a implementer
         menu.addAction("🧹 Effacer (protégé si verrouillé)", self.clear_selected_cells)
 
+        # Chargement / sauvegarde en cours : seule la copie reste disponible
+        if self.read_only:
+            for action in menu.actions():
+                if action.text() != "📋 Copier":
+                    action.setEnabled(False)
+
         menu.exec_(self.viewport().mapToGlobal(pos))
 
     # ========== SETUP ========== OK
     def setup_table(self):
-        self.setColumnCount(0)
-        self.setRowCount(0)
+        self.model = DataFrameModel(self)
+        self.setModel(self.model)
+
+    def rowCount(self):
+        return self.model.rowCount()
+
+    def columnCount(self):
+        return self.model.columnCount()
+
+    def df_row(self, row):
+        """Ligne du DataFrame affichée à la ligne `row` de la vue."""
+        return int(self.filtered_index[row]) if row < len(self.filtered_index) else row
+
+    def view_row(self, df_row):
+        """Ligne de la vue qui affiche la ligne `df_row` du DataFrame (None si masquée)."""
+        if self.store.sort_keys:
+            rows = np.flatnonzero(self.filtered_index == df_row)
+            return int(rows[0]) if len(rows) else None
+        row = int(np.searchsorted(self.filtered_index, df_row))
+        if row < len(self.filtered_index) and self.filtered_index[row] == df_row:
+            return row
+        return None
+
+    def is_cell_locked(self, df_row, col):
+        return self.store.is_cell_locked(df_row, col)
+
+    def cell_text(self, row, col):
+        return self.model.data(self.model.index(row, col)) or ""
+
+    def selected_ranges(self):
+        return list(self.selectionModel().selection()) if self.selectionModel() else []
 
     def update_table_and_filters(self):
-        self.backup()
         self.update_table_from_df()
         self.reapply_filters()
         if hasattr(self.parent(), "update_filter_autocompletion"):
             self.parent().update_filter_autocompletion()
-    
+
     def update_df_and_filters(self):
-        self.backup()
         self.update_df_from_table()
         self.reapply_filters()
         if hasattr(self.parent(), "update_filter_autocompletion"):
             self.parent().update_filter_autocompletion()
 
     # ========== DATA MANAGEMENT ========== OK
-    def load_data(self):
+    @timed("table.load_data", rows=table_rows)
+    def load_data(self, path=None):
+        """Charge le store principal (ou `path`). L'ancien data.xlsx sert de repli."""
         try:
-            with pd.ExcelFile("data.xlsx", engine='openpyxl') as xls:
-                self.df = pd.read_excel(xls, sheet_name='Data')
-
-                if 'Metadata' in xls.sheet_names:
-                    metadata_df = pd.read_excel(xls, sheet_name='Metadata')
-                    metadata = metadata_df.iloc[0].to_dict() if not metadata_df.empty else {}
-
-                    # Conversion des chaînes en listes Python
-                    hidden_cols = ast.literal_eval(metadata.get('hidden_columns', '[]'))
-                    locked_cells = ast.literal_eval(metadata.get('locked_cells', '[]'))
-                    column_dtypes = ast.literal_eval(metadata.get('column_dtypes', '{}'))
-                    self.active_filter = str(metadata.get('active_filter', ''))
-                    self.quick_search_term = str(metadata.get('quick_search_term', ''))
-
-                    # Appliquer les types de colonnes
-                    for col, dtype in column_dtypes.items():
-                        if col in self.df.columns:
-                            try:
-                                if dtype == 'object':
-                                    self.df[col] = self.df[col].astype('object')
-                                else:
-                                    self.df[col] = pd.to_numeric(self.df[col], errors='coerce')
-                            except Exception as e:
-                                logger.warning(f"Erreur lors de la conversion du type de la colonne '{col}' : {e}")
-
-                    self.hidden_columns = set(hidden_cols) if isinstance(hidden_cols, list) else set()
-                    self.locked_cells = set(tuple(cell) for cell in locked_cells) if isinstance(locked_cells, list) else set()
-                else:
-                    self.hidden_columns = set()
-                    self.locked_cells = set()
-           
-            for col in self.hidden_columns:
-                if col < self.columnCount():
-                    self.setColumnHidden(col, True)
-            
-            self.update_table_from_df()
-            if hasattr(self.parent(), "update_filter_autocompletion"):
-                self.parent().update_filter_autocompletion()
-
+            self.store.load(path)
+            self.show_data()
         except Exception as e:
             logger.error(f"❌ Erreur lors du chargement : {e}")
 
-    def save_data(self):
-        try:
-            if self.df.empty:
-                raise ValueError("Le DataFrame est vide. Impossible de sauvegarder.")
-
-            # Préparer les métadonnées
-            metadata = {
-                'column_dtypes': {col: str(dtype) for col, dtype in self.df.dtypes.items()},
-                'hidden_columns': list(self.hidden_columns),
-                'locked_cells': [list(cell) for cell in self.locked_cells],
-                'active_filter': str(self.active_filter),
-                'quick_search_term': str(self.quick_search_term)
-            }
-            metadata_df = pd.DataFrame([metadata])
-
-            # Écrire dans un seul fichier avec deux feuilles. A terme peut-être passer sur un json
-            with pd.ExcelWriter("data.xlsx", engine='openpyxl') as writer:
-                self.df.to_excel(writer, sheet_name='Data', index=False)
-                metadata_df.to_excel(writer, sheet_name='Metadata', index=False)
+    def set_data(self, df, metadata):
+        """Installe un DataFrame chargé (éventuellement par un worker) et ses métadonnées."""
+        self.store.set_data(df, metadata)
+        self.show_data()
+
+    def show_data(self):
+        self.active_filter = self.store.active_filter
+        for col in self.hidden_columns:
+            if col < self.columnCount():
+                self.setColumnHidden(col, True)
+
+        self.update_table_from_df()
+        if hasattr(self.parent(), "update_filter_autocompletion"):
+            self.parent().update_filter_autocompletion()
+
+    @property
+    def read_only(self):
+        return self.store.read_only
+
+    def set_read_only(self, read_only):
+        """Lecture seule pendant un chargement / une sauvegarde en arrière-plan (imposée par le store)."""
+        self.store.read_only = read_only
+        self.setEditTriggers(QTableView.NoEditTriggers if read_only else self.default_edit_triggers)
+
+    def check_writable(self):
+        return self.store.check_writable()
 
+    @timed("table.save_data", rows=table_rows)
+    def save_data(self, path=None):
+        """Sauvegarde dans le store principal (ou `path`, au format déduit de l'extension)."""
+        try:
+            self.store.save(path)
         except Exception as e:
             logger.error(f"❌ Erreur lors de la sauvegarde : {e}")
-    # ========== UNDO / REDO ========== # a clean et implementer y compris logique
-    def undo(self):
-        """Annulation avec préservation du filtre actif et des métadonnées"""
-        if self.history:
-            # Restaurer l'état précédent
-            state = self.history.pop()
-            self.df = state['df']
-            self.hidden_columns = state['hidden_columns']
-            self.locked_cells = state['locked_cells']
-            self.active_filter = state['active_filter']
-            self.filtered_index = state['filtered_index']
 
-            self.update_table_from_df()
+    def export_data(self, path=None):
+        """Export xlsx explicite (feuilles Data + Metadata)."""
+        self.save_data(path or config.EXPORT_FILE)
+        logger.info(f"📤 Export xlsx : {path or config.EXPORT_FILE}")
 
-            logger.info("↩️ Undo effectué.")
-        else:
+    def metadata(self):
+        return self.store.metadata()
+
+    # ========== STOCKAGE RATTACHE ==========
+    def attach_storage(self, path):
+        """Rattache la base SQLite ou le journal de `path` ; affiche les modifications rejouées après un crash."""
+        try:
+            replayed = self.store.attach_storage(path)
+        except Exception as e:
+            logger.error(f"❌ Journal / base SQLite indisponible : {e}")
+            return
+        if replayed:
+            self.update_table_and_filters()
+            self.update_visible_counter()
+
+    # ========== IMPORT ==========
+    def begin_import(self):
+        self.store.begin_import()
+
+    def append_import_chunk(self, chunk):
+        """Ajoute un paquet importé en une fois ; un seul rafraîchissement de la vue."""
+        self.store.append_import_chunk(chunk)
+        self.update_table_from_df()
+        self.update_visible_counter()
+
+    def end_import(self):
+        """Clôt l'import (terminé ou interrompu) : une entrée d'historique, filtres réappliqués."""
+        op = self.store.end_import()
+        if op is not None:
+            self.refresh_after(op)
+
+    # ========== UNDO / REDO ==========
+    def undo(self):
+        """Annule la dernière opération enregistrée (coût proportionnel au delta)"""
+        if not self.check_writable():
+            return
+        op = self.store.undo()
+        if op is None:
             logger.warning("⚠️ Aucun historique pour undo.")
+            return
+        self.refresh_after(op)
+        logger.info(f"↩️ Undo effectué : {op.label}.")
 
     def redo(self):
-        """Rétablissement avec préservation du filtre actif et des métadonnées"""
-        if self.redo_stack:
-            # Restaurer l'état suivant
-            state = self.redo_stack.pop()
-            self.df = state['df']
-            self.hidden_columns = state['hidden_columns']
-            self.locked_cells = state['locked_cells']
-            self.active_filter = state['active_filter']
-            self.filtered_index = state['filtered_index']
+        """Rejoue la dernière opération annulée"""
+        if not self.check_writable():
+            return
+        op = self.store.redo()
+        if op is None:
+            logger.warning("⚠️ Aucun historique pour redo.")
+            return
+        self.refresh_after(op)
+        logger.info(f"↪️ Redo effectué : {op.label}.")
 
-            self.update_table_from_df()
+    def refresh_after(self, op):
+        """Rafraîchit la vue après une opération du store (None : rien n'a changé)."""
+        if op is None:
+            return
 
-            logger.info("↪️ Redo effectué.")
-        else:
-            logger.warning("⚠️ Aucun historique pour redo.")
+        if op.rows_only:
+            # Masques de visibilité déjà ajustés par les primitives : pas de réévaluation des filtres
+            self.update_table_from_df()
+            self.update_visible_counter()
+            return
 
-    def backup(self):
-        self.history.append({
-            'df': self.df.copy(),
-            'hidden_columns': self.hidden_columns.copy(),
-            'locked_cells': self.locked_cells.copy(),
-            'active_filter': self.active_filter,
-            'filtered_index': self.filtered_index.copy() if hasattr(self, 'filtered_index') else []
-        })
-        self.redo_stack.clear()
-    
-    # ========== TABLE <-> DF SYNCHRONISATION ========== # OK
-    def update_df_from_table(self):
-        self.filtered_index = list(self.df.index)
+        if op.structural:
+            self.update_table_and_filters()
+            return
 
-        for row in range(self.rowCount()):
-            for col in range(self.columnCount()):
-                df_row = self.filtered_index[row] if hasattr(self, 'filtered_index') and row < len(self.filtered_index) else row
-                item = self.item(row, col)
-                value = item.text() if item else ""
+        cells = op.cells()
+        if len(cells) > 100:
+            # Gros lot de cellules : un seul rafraîchissement global
+            self.update_table_from_df()
+            self.reapply_filters()
+            if hasattr(self.parent(), "update_filter_autocompletion"):
+                self.parent().update_filter_autocompletion()
+            return
 
-                if (df_row, col) in self.locked_cells:
-                    if item:
-                        item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                    else:
-                        logger.warning(f"Cellule verrouillée mais item est None à la position ({row}, {col})")
+        for row_id, column in cells:
+            if row_id in self.df.index and column in self.df.columns:
+                self.refresh_row(self.df.index.get_loc(row_id), self.df.columns.get_loc(column))
 
-                self.df.iat[df_row, col] = value if value != "" else None
+    # ========== TABLE <-> DF SYNCHRONISATION ========== # OK
+    def update_df_from_table(self):
+        # Le modèle lit et écrit directement dans le DataFrame du store : rien à recopier
+        pass
 
+    @timed("table.update_table_from_df", rows=table_rows)
     def update_table_from_df(self):
-        self.blockSignals(True)
         if self.updating:
             return
         self.updating = True
 
         header = self.horizontalHeader()
-        # Stocker les largeurs et l'ordre des colonnes avant de réinitialiser la table
+        # Stocker les largeurs et l'ordre des colonnes avant un éventuel reset du modèle
         column_widths = [self.columnWidth(i) for i in range(self.columnCount())]
         column_order = [header.visualIndex(i) for i in range(self.columnCount())]
-        
-        # Réinitialiser la table
-        self.setup_table()
 
-        df = self.df
-
-        # Configurer la table
-        self.setColumnCount(len(df.columns))
-        self.setHorizontalHeaderLabels(df.columns)
-        self.setRowCount(len(df))
-
-        # Pré-créer les items en dehors de la boucle principale
-        items = []
-        for row in range(len(df)):
-            row_items = []
-            for col, value in enumerate(df.iloc[row]):
-                item = QTableWidgetItem(str(value) if pd.notna(value) else "")
-                row_items.append(item)
-            items.append(row_items)
-            
-        # Placer les items dans la table
-        for row in range(len(items)):
-            for col in range(len(items[row])):
-                item = items[row][col]
-                df_row = self.filtered_index[row] if hasattr(self, 'filtered_index') and row < len(self.filtered_index) else row
-                if (df_row, col) in self.locked_cells:
-                    self.update_item_flags(item, True)
-                self.setItem(row, col, item)
-     
-        # Restaurer la visibilité des colonnes
-        for col in range(len(df.columns)):
-            self.setColumnHidden(col, col in self.hidden_columns)
+        # Mise à jour des indices filtrés (masques périmés si le nombre de lignes a changé)
+        self.filtered_index = self.store.view_positions()
 
-        # Mise à jour des indices filtrés
-        self.filtered_index = df.index.tolist()
-     
-        # Restaurer les largeurs et l'ordre des colonnes
-        for i, width in enumerate(column_widths):
-            self.setColumnWidth(i, width)
- 
-        for logical in range(self.columnCount()):
-            try:
-                to_visual = column_order[logical]
-            except IndexError:
-                to_visual = logical
-            current_visual = header.visualIndex(logical)
-            if current_visual != to_visual:
-                header.moveSection(current_visual, to_visual)
-
-        self.blockSignals(False)   
-        self.updating = False
-    
-    # ========== SAUVEGARDE DES CELLULES ========== selfback up en pause
-    def setItem(self, row, col, item):
-        self.blockSignals(True)
-        super().setItem(row, col, item)
-        self.blockSignals(False)
-
-    # ========== AJOUT / SUPPRESSION DE LIGNES & COLONNES ========== 
-    def add_row(self, row_data=None):        
-        if row_data is None:
-            row_data = [None] * self.columnCount()
-
-        # Ajouter la nouvelle ligne au DataFrame
-        new_row_index = len(self.df)
-        self.df.loc[new_row_index] = row_data
-
-        # 🔓 S'assurer qu'aucune cellule de la nouvelle ligne n'est verrouillée
-        for col in range(self.columnCount()):
-            self.unlock_cell(new_row_index, col)
-        
-        self.update_table_and_filters()
-
-    def delete_selected_rows(self):
-        selected_indexes = self.selectedIndexes()
-        if not selected_indexes:
-            return
-        
-        # Obtenir les indices originaux du DataFrame
-        selected_rows = sorted(set(
-            index.row()
-            for index in selected_indexes
-        ), reverse=True)
-
-        if hasattr(self, 'filtered_index'):
-            selected_rows = [self.filtered_index[row] for row in selected_rows]
-        
-        # Déverrouiller les cellules de la ligne avant suppression
-        for row_index in selected_rows:
-            for col in range(self.columnCount()):
-                self.unlock_cell(row_index, col)
-       
-        for row_index in selected_rows:
-            self.df.drop(index=row_index, inplace=True)
-        self.df.reset_index(drop=True, inplace=True)
-       
-        # Mettre à jour les indices des cellules verrouillées
-        new_locked_cells = set()
-        for (r, c) in self.locked_cells:
-            if r in selected_rows:
-                continue
-            elif r > selected_rows[-1]:  # Si la ligne verrouillée est après les lignes supprimées
-                new_locked_cells.add((r - len(selected_rows), c))
-            else:
-                new_locked_cells.add((r, c))
-    
-        self.locked_cells = new_locked_cells
-        self.update_table_and_filters()
+        # Seules les cellules du viewport seront relues
+        reset = self.model.refresh()
 
-    def duplicate_selected_rows(self, indexes):
+        if reset:
+            # Restaurer les largeurs et l'ordre des colonnes
+            for i, width in enumerate(column_widths[:self.columnCount()]):
+                self.setColumnWidth(i, width)
 
-        row_indices = sorted([index.row() for index in indexes], reverse=True)
+            for logical in range(self.columnCount()):
+                try:
+                    to_visual = column_order[logical]
+                except IndexError:
+                    to_visual = logical
+                current_visual = header.visualIndex(logical)
+                if current_visual != to_visual and 0 <= to_visual < self.columnCount():
+                    header.moveSection(current_visual, to_visual)
 
-        for row_index in row_indices:
+        # Restaurer la visibilité des colonnes
+        for col in range(self.columnCount()):
+            self.setColumnHidden(col, col in self.hidden_columns)
 
-            # Obtenir la ligne d'origine
-            original_row = self.df.loc[row_index].copy()
+        self.updating = False
 
-            # Insérer la nouvelle ligne juste après la ligne d'origine
-            self.df = pd.concat([self.df.iloc[:row_index+1], pd.DataFrame([original_row]), self.df.iloc[row_index+1:]]).reset_index(drop=True)
+    # ========== AJOUT / SUPPRESSION DE LIGNES & COLONNES ==========
+    def add_row(self, row_data=None):
+        self.refresh_after(self.store.add_row(row_data))
 
-            # Cloner les éléments de la ligne dupliquée
-            for col in range(self.columnCount()):
-                original_item = self.item(row_index, col)
-                if original_item:
-                    cloned_item = self.clone_item(original_item)
-                    self.insertRow(row_index + 1)
-                    self.setItem(row_index + 1, col, cloned_item)
+    def selected_positions(self):
+        """Positions DataFrame (triées, uniques) des lignes touchées par la sélection."""
+        view_rows = [np.arange(r.top(), r.bottom() + 1) for r in self.selected_ranges()]
+        if not view_rows:
+            return np.empty(0, dtype=np.int64)
+        view_rows = np.unique(np.concatenate(view_rows))
+        view_rows = view_rows[view_rows < len(self.filtered_index)]
+        return np.sort(self.filtered_index[view_rows])
 
-            # Mettre à jour les indices des cellules verrouillées
-            new_locked_cells = set()
-            for (r, c) in self.locked_cells:
-                if r > row_index:
-                    new_locked_cells.add((r + 1, c))
-                else:
-                    new_locked_cells.add((r, c))
+    def delete_selected_rows(self):
+        # Plages de sélection → positions en une passe vectorisée, suppression en un seul iloc
+        positions = self.selected_positions()
+        if not len(positions):
+            return
 
-            # Ajouter les nouvelles cellules verrouillées pour la ligne dupliquée
-            for col in range(self.columnCount()):
-                if (row_index, col) in self.locked_cells:
-                    new_locked_cells.add((row_index + 1, col))
+        self.clearSelection()
+        self.refresh_after(self.store.delete_rows(positions))
+        logger.info(f"🗑️ {len(positions)} lignes supprimées")
 
-            self.locked_cells = new_locked_cells
+    def duplicate_selected_rows(self):
+        positions = self.selected_positions()
+        if not len(positions):
+            return
 
-        self.update_table_and_filters()
+        op = self.store.duplicate_rows(positions)
+        if op is not None:
+            self.refresh_after(op)
+            logger.info(f"📄 {len(positions)} lignes dupliquées")
 
     def add_column(self, column_name, default_value=None):
-        if column_name not in self.df.columns:
-            self.backup()
-            self.df[column_name] = default_value
-            self.update_table_and_filters()
-        else:
-            logger.warning(f"La colonne '{column_name}' existe déjà.")
-        
+        self.refresh_after(self.store.add_column(column_name, default_value))
+
     def prompt_add_column(self):
         name, ok = QInputDialog.getText(self, "Ajouter une colonne", "Nom de la nouvelle colonne :")
         if ok and name:
             self.add_column(name)  # Utilise la méthode synchronisée
-        
+
     def delete_column(self, column_name_or_index):
-        
+
         if isinstance(column_name_or_index, int):
             # Suppression par index
             index = column_name_or_index
             if index < 0 or index >= self.columnCount():
                 logger.warning("Index de colonne invalide pour suppression.")
                 return
-
-            column_name = self.horizontalHeaderItem(index).text() if self.horizontalHeaderItem(index) else f"Colonne {index}"
+            column_name = self.df.columns[index]
+        else:
+            # Suppression par nom de colonne
+            column_name = column_name_or_index
             if column_name not in self.df.columns:
                 logger.error(f"Nom de colonne introuvable dans le DataFrame : {column_name}")
                 return
-            
-            # Supprimer du DataFrame
-            self.df.drop(columns=[column_name], inplace=True)
-
-            # Mettre à jour les positions des cellules verrouillées
-            new_locked = set()
-            for row, col in self.locked_cells:
-                if col < index:
-                    new_locked.add((row, col))
-                elif col > index:
-                    new_locked.add((row, col - 1))
-            self.locked_cells = new_locked
-
-            # Mettre à jour les colonnes masquées
-            new_hidden = set()
-            for col in self.hidden_columns:
-                if col < index:
-                    new_hidden.add(col)
-                elif col > index:
-                    new_hidden.add(col - 1)
-            self.hidden_columns = new_hidden
+            index = self.df.columns.get_loc(column_name)
+
+        self.refresh_after(self.store.delete_column(index))
+        logger.info(f"🗑️ Colonne '{column_name}' supprimée")
 
-        else:
-            # Suppression par nom de colonne
-            column_name = column_name_or_index
-            if column_name in self.df.columns:
-                col_idx = self.df.columns.get_loc(column_name)
-
-                # Sauvegarder l'état
-                self.backup()
-
-                # Supprimer du DataFrame
-                self.df.drop(columns=[column_name], inplace=True)
-
-                # Mettre à jour les positions des cellules verrouillées
-                new_locked = set()
-                for row, col in self.locked_cells:
-                    if col < col_idx:
-                        new_locked.add((row, col))
-                    elif col > col_idx:
-                        new_locked.add((row, col - 1))
-                self.locked_cells = new_locked
-
-                # Mettre à jour les colonnes masquées
-                new_hidden = set()
-                for col in self.hidden_columns:
-                    if col < col_idx:
-                        new_hidden.add(col)
-                    elif col > col_idx:
-                        new_hidden.add(col - 1)
-                self.hidden_columns = new_hidden
-                logger.info(f"🗑️ Colonne '{column_name}' supprimée")
-
-        self.update_table_and_filters()
-        
     def rename_column(self, col):
+        if not self.check_writable():
+            return
 
-        old_name = self.horizontalHeaderItem(col).text()
+        old_name = self.df.columns[col]
         new_name, ok = QInputDialog.getText(self, "Renommer la colonne", f"Nom actuel : {old_name}\nNouveau nom :")
         if ok and new_name and new_name != old_name:
-            self.backup()
-            self.df.rename(columns={old_name: new_name}, inplace=True)
-            self.update_table_and_filters()
+            self.refresh_after(self.store.rename_column(old_name, new_name))
 
     # ========== VISIBILITE DES COLONNES ========== ajouter self.update_and_reapply() ? a tester data
     def hide_column(self, col):
@@ -499,7 +438,7 @@ class TokenTableWidget(QTableWidget):
         prev = header.blockSignals(True)
         try:
             header.hideSection(col)
-            self.hidden_columns.add(col)
+            self.store.hide_column(col)
         finally:
             header.blockSignals(prev)
 
@@ -508,14 +447,14 @@ class TokenTableWidget(QTableWidget):
         prev = header.blockSignals(True)
         try:
             header.showSection(col)
-            self.hidden_columns.discard(col)
+            self.store.show_column(col)  # colonne différée : lue dans le fichier
         finally:
             header.blockSignals(prev)
 
     def show_hidden_columns_menu(self):
-        
+
         hidden_columns = [
-            (i, self.horizontalHeaderItem(i).text())
+            (i, str(self.df.columns[i]))
             for i in range(self.columnCount())
             if self.isColumnHidden(i)
         ]
@@ -532,44 +471,61 @@ class TokenTableWidget(QTableWidget):
             self.show_column(col_num)
             self.update_table_and_filters()
 
+    # Le déplacement / redimensionnement ne touche que l'en-tête : la vue lit
+    # le modèle par index logique, aucune reconstruction n'est nécessaire
     def on_section_moved(self, logicalIndex, oldVisualIndex, newVisualIndex):
         if self.updating: return
-        self.updating = True
-        self.update_table_and_filters()
-        self.updating = False
+        self.viewport().update()
 
     def on_section_resized(self, logical_index, old_size, new_size):
         if self.updating:
             return
-        self.updating = True
-        self.horizontalHeader().blockSignals(True)
-        self.update_table_and_filters()
-        self.horizontalHeader().blockSignals(False)
-        self.updating = False
-        print(f"Colonne redimensionnée de {old_size} à {new_size}")
+        logger.debug(f"Colonne {logical_index} redimensionnée de {old_size} à {new_size}")
 
     # ========== TRI & DEPLACEMENT DE COLONNES ==========
     def move_column(self, from_index, to_index):
-        
+
         cols = list(self.df.columns)
         if 0 <= from_index < len(cols) and 0 <= to_index < len(cols):
-            self.backup()
-            col = cols.pop(from_index)
-            cols.insert(to_index, col)
-            self.df = self.df[cols]
-            self.update_table_and_filters()
-        
+            self.refresh_after(self.store.move_column(from_index, to_index))
 
-    def sort_by_column(self, column_name, ascending=True):
-        
-        if column_name in self.df.columns:
-            self.backup()
-            self.df[column_name] = self.df[column_name].astype(str)
-            self.df.sort_values(by=column_name, ascending=ascending, inplace=True)
-            self.update_table_and_filters()
-        
 
-   # ========== FILTRAGE & QUICK SEARCH ========== 
+    def sort_by_column(self, column_name, ascending=True, add=False):
+        """Tri de la vue uniquement : les données et l'historique ne changent pas."""
+        if column_name in self.df.columns:
+            self.store.sort_by_column(column_name, ascending, add)
+            self.apply_visibility()
+            keys = ", ".join(f"{column} {'↑' if asc else '↓'}" for column, asc in self.store.sort_keys)
+            logger.info(f"↕️ Tri : {keys}")
+
+    def clear_sort(self):
+        self.store.clear_sort()
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.apply_visibility()
+
+
+    # ========== RECHERCHE PAR CLE ==========
+    def find_token(self, contract_address, token_id, chain):
+        """Positions DataFrame des lignes portant la clé donnée (index de hachage, O(1))."""
+        return self.store.find_token(contract_address, token_id, chain)
+
+    def jump_to_token(self, contract_address, token_id, chain):
+        """Sélectionne et fait défiler jusqu'à la ligne du token. Retourne False si introuvable."""
+        positions = self.find_token(contract_address, token_id, chain)
+        if not positions:
+            logger.warning(f"🔎 Token introuvable : {contract_address} / {token_id} / {chain}")
+            return False
+
+        row = self.view_row(positions[0])
+        if row is None:
+            logger.warning("🔎 Token masqué par les filtres actifs.")
+            return False
+        self.scrollTo(self.model.index(row, 0), QTableView.PositionAtCenter)
+        self.selectRow(row)
+        return True
+
+   # ========== FILTRAGE & QUICK SEARCH ==========
+    @timed("table.apply_filter", rows=table_rows)
     def apply_filter(self, filter_text):
         normalized_filter = filter_text.strip()  # ne pas le lower()
 
@@ -577,27 +533,10 @@ class TokenTableWidget(QTableWidget):
             QMessageBox.warning(self, "Filtre vide", "Le champ de filtre est vide.")
             return
 
+        rows = self.df
         try:
-            self.active_advanced_filter = normalized_filter  # 🔹 Enregistrer le filtre
-
             # Appliquer le filtre à TOUTES les lignes (pas seulement les visibles)
-            filtered_df = self.df.query(normalized_filter)
-            matching_indices = filtered_df.index.tolist()
-
-            for row in range(self.rowCount()):
-                df_index = self.df.index[row]
-                self.setRowHidden(row, df_index not in matching_indices)
-
-            print(f"Filtre appliqué : {normalized_filter}")
-
-            # Réappliquer recherche rapide s’il y en a une
-            main_window = self.parent()
-            if main_window:
-                current_search = main_window.quick_search_input.text()
-                self.filter_table(current_search)
-
-            self.update_visible_counter()
-
+            applied = self.store.set_advanced_filter(normalized_filter, self.confirm_history_loss)
         except Exception as e:
             columns_info = "\n".join(
                 f"- {col} ({self.df[col].dtype})" for col in self.df.columns
@@ -607,231 +546,180 @@ class TokenTableWidget(QTableWidget):
                 "Filtre invalide",
                 f"{str(e)}\n\nColonnes disponibles :\n{columns_info}",
             )
+            return
+        finally:
+            if self.df is not rows:
+                self.show_data()  # base SQLite : lignes rechargées depuis la base
+        if not applied:
+            return
 
+        logger.info(f"🔍 Filtre appliqué : {normalized_filter}")
+
+        # Réappliquer recherche rapide s’il y en a une (applique aussi la visibilité)
+        self.filter_table(self.quick_search_text())
+
+    def schedule_quick_search(self, quick_search_text):
+        """Relance le délai à chaque frappe : la recherche en attente pour l'ancien terme est abandonnée."""
+        self.pending_search = quick_search_text
+        self.search_timer.start()
+
+    @timed("table.filter_table", rows=table_rows)
     def filter_table(self, quick_search_text):
-        text = self.normalize_text(quick_search_text)
-
-        # 🔹 D’abord, appliquer le filtre avancé s’il existe
-        base_visible_rows = []
-        if self.active_advanced_filter:
-            try:
-                filtered_df = self.df.query(self.active_advanced_filter)
-                base_visible_rows = filtered_df.index.tolist()
-            except Exception as e:
-                print(f"[filter_table] Erreur filtre avancé : {e}")
-                base_visible_rows = self.df.index.tolist()  # fallback : tout visible
-        else:
-            base_visible_rows = self.df.index.tolist()
-
-        for row in range(self.rowCount()):
-            df_index = self.df.index[row]
-
-            if df_index not in base_visible_rows:
-                self.setRowHidden(row, True)
-                continue
-
-            if text:
-                match = False
-                for column in range(self.columnCount()):
-                    if self.isColumnHidden(column):
-                        continue
-                    item = self.item(row, column)
-                    if item and text in item.text().lower():
-                        match = True
-                        break
-                self.setRowHidden(row, not match)
-            else:
-                self.setRowHidden(row, False)
+        self.search_timer.stop()
+        # Le filtre avancé est déjà dans son masque : seule la recherche est recalculée
+        self.store.set_quick_search(quick_search_text)
+        self.apply_visibility()
 
-        self.update_visible_counter()
-    
-    def normalize_text(self, text):
-        return text.strip().lower()
+    def quick_search_text(self):
+        main_window = self.parent()
+        return main_window.quick_search_input.text() if hasattr(main_window, "quick_search_input") else ""
+
+    def apply_visibility(self):
+        """Combine les masques et ne transmet à la vue que les lignes qui basculent."""
+        visible = self.store.visibility.combined()
+        new_index = self.store.view_positions(visible)
+        old_index = self.filtered_index
+        if len(old_index) != len(new_index) or not np.array_equal(old_index, new_index):
+            # Ordre des lignes changé (tri actif, ou vue triée qui revient à l'ordre du DataFrame)
+            if self.store.sort_keys or np.any(np.diff(old_index) < 0):
+                self.model.set_view_rows(new_index, len(self.df))
+            else:
+                self.model.set_visible_rows(new_index, len(self.df))
+        self.update_visible_counter(int(visible.sum()))
 
     def reset_filters(self):
-        for row in range(self.rowCount()):
-            self.setRowHidden(row, False)
-        self.update_visible_counter()
-        self.active_advanced_filter = None
+        """Retourne False si l'utilisateur refuse de perdre l'historique (vue SQLite à recharger)."""
+        rows = self.df
+        if not self.store.reset_filters(self.confirm_history_loss):
+            return False
+        if self.df is not rows:
+            self.show_data()  # vue SQLite filtrée : toutes les lignes rechargées
+        self.apply_visibility()
+        return True
+
+    def confirm_history_loss(self):
+        """Vue SQLite à recharger alors que l'historique undo porte sur des lignes qu'elle perd."""
+        answer = QMessageBox.question(
+            self,
+            "Historique d'annulation",
+            "Recharger la vue depuis la base vide l'historique d'annulation : "
+            "des modifications portent sur des lignes hors de la nouvelle vue.\n\nContinuer ?",
+        )
+        return answer == QMessageBox.Yes
 
-    def update_visible_counter(self):
+    def update_visible_counter(self, visible=None):
         if hasattr(self.parent(), "result_counter"):
-            visible = sum(not self.isRowHidden(row) for row in range(self.rowCount()))
-            total = self.rowCount()
+            if visible is None:
+                visible = len(self.filtered_index)
+            total = len(self.df)
             self.parent().result_counter.setText(f"{visible} lignes visibles sur {total}")
-            
+
     def reapply_filters(self):
-        if self.active_advanced_filter:
-            self.apply_filter(self.active_advanced_filter)
-        main_window = self.parent()
-        if main_window:
-            current_search = main_window.quick_search_input.text()
-            self.filter_table(current_search)
-    
-    # ========== CUT COPY PASTE ERASE ========== rajouter self.update_and_reapply() ? a test data dans cut
-    def copy_selected_cells(self):
-        selection = self.selectedRanges()
-        if not selection:
-            return
+        # Les masques sont recalculés sur le DataFrame courant
+        self.store.reapply_filters(self.quick_search_text())
+        self.apply_visibility()
 
+    # ========== CUT COPY PASTE ERASE ========== rajouter self.update_and_reapply() ? a test data dans cut
+    def selection_text(self, selection):
+        """TSV des plages sélectionnées. Les colonnes masquées encore sur disque sont lues
+        d'abord : sinon elles seraient copiées vides (et perdues par couper)."""
+        self.store.materialize_columns({
+            self.df.columns[col]
+            for range_ in selection
+            for col in range(range_.left(), range_.right() + 1)
+        })
         copied_text = ""
         for range_ in selection:
-            for row in range(range_.topRow(), range_.bottomRow() + 1):
+            for row in range(range_.top(), range_.bottom() + 1):
                 row_data = []
-                for col in range(range_.leftColumn(), range_.rightColumn() + 1):
-                    item = self.item(row, col)
-                    row_data.append(item.text() if item else "")
+                for col in range(range_.left(), range_.right() + 1):
+                    row_data.append(self.cell_text(row, col))
                 copied_text += "\t".join(row_data) + "\n"
+        return copied_text.strip()
+
+    def copy_selected_cells(self):
+        selection = self.selected_ranges()
+        if not selection:
+            return
 
         clipboard = QApplication.clipboard()
-        clipboard.setText(copied_text.strip())
+        clipboard.setText(self.selection_text(selection))
 
     def cut_selected_cells(self):
-        selection = self.selectedRanges()
+        selection = self.selected_ranges()
         if not selection:
             return
 
         clipboard = QApplication.clipboard()
-        copied_text = ""
-        for range_ in selection:
-            for row in range(range_.topRow(), range_.bottomRow() + 1):
-                row_data = []
-                for col in range(range_.leftColumn(), range_.rightColumn() + 1):
-                    item = self.item(row, col)
-                    text = item.text() if item else ""
-                    row_data.append(text)
-                copied_text += "\t".join(row_data) + "\n"
-
-        clipboard.setText(copied_text.strip())
+        clipboard.setText(self.selection_text(selection))
 
         # Maintenant on efface seulement les cellules non verrouillées
-        for range_ in selection:
-            for row in range(range_.topRow(), range_.bottomRow() + 1):
-                for col in range(range_.leftColumn(), range_.rightColumn() + 1):
-                    df_row = self.filtered_index[row] if hasattr(self, 'filtered_index') else row
-                    if (df_row, col) not in self.locked_cells:
-                        item = self.item(row, col)
-                        if item:
-                            item.setText("")
-        
+        self.edit_cells(
+            (self.df_row(row), col, "")
+            for range_ in selection
+            for row in range(range_.top(), range_.bottom() + 1)
+            for col in range(range_.left(), range_.right() + 1)
+        )
+
     def paste_selected_cells(self):
-        clipboard = QApplication.clipboard()
-        text = clipboard.text()
+        text = QApplication.clipboard().text()
         if not text:
             return
 
-        rows = text.splitlines()
-        sel = self.selectedRanges()
+        sel = self.selected_ranges()
         if sel:
-            start_row = sel[0].topRow()
-            start_col = sel[0].leftColumn()
+            start_row = sel[0].top()
+            start_col = sel[0].left()
         else:
             start_row = 0
             start_col = 0
+        self.paste_block(self.parse_block(text), start_row, start_col)
 
-        for i, row_text in enumerate(rows):
-            values = row_text.split("\t")
-            target_row = start_row + i
-
-            # ➕ Ajouter des lignes si nécessaire
-            while target_row >= self.rowCount():
-                self.add_row()
+    @staticmethod
+    def parse_block(text):
+        """TSV du presse-papier → tableau 2-D (object). None : pas de valeur (ligne plus courte)."""
+        lines = [line.split("\t") for line in text.splitlines()]
+        block = np.full((len(lines), max(map(len, lines), default=0)), None, dtype=object)
+        for i, values in enumerate(lines):
+            block[i, :len(values)] = values
+        return block
 
-            for j, val in enumerate(values):
-                target_col = start_col + j
-
-                # ➕ Ajouter des colonnes si nécessaire
-                while target_col >= self.columnCount():
-                    col_name = f"Col_{self.columnCount()}"
-                    self.add_column(col_name)
-
-                df_row = self.filtered_index[target_row] if hasattr(self, 'filtered_index') else target_row
-
-                # ➖ Respect verrouillage
-                if (df_row, target_col) in self.locked_cells:
-                    continue
-
-                item = self.item(target_row, target_col)
-                if not item:
-                    item = QTableWidgetItem()
-                    self.setItem(target_row, target_col, item)
-                item.setText(val)
-        self.update_table_and_filters()
+    def paste_block(self, block, start_row, start_col):
+        """Colle un bloc à partir de la cellule (start_row, start_col) de la vue, en une entrée d'historique."""
+        self.refresh_after(self.store.paste_block(block, start_row, start_col))
 
     def clear_selected_cells(self):
-        
-        for index in self.selectedIndexes():
-            item = self.item(index.row(), index.column())
-            if item and (item.flags() & Qt.ItemIsEditable):
-                item.setText("")
-            else:
-                logger.debug(f"Cellule {index.row()}, {index.column()} non effacée (verrouillée ou vide)")
-        self.update_table_and_filters()
-
-    def clone_item(self, item):
-        new_item = QTableWidgetItem(item.text())
-        new_item.setFlags(item.flags())
-        new_item.setFont(item.font())
-        new_item.setBackground(item.background())
-        if not item.flags() & Qt.ItemIsEditable:
-            new_item.setFlags(new_item.flags() & ~Qt.ItemIsEditable)
-        return new_item
-  
-    # ========== GESTION DES CELLULES VERROUILLÉES ========== 
-    def lock_cell(self, row, col):
-        df_row = self.filtered_index[row] if hasattr(self, 'filtered_index') and row < len(self.filtered_index) else row
-        df_col = col  # Les colonnes sont stockées en index relatif
 
-        try:
-            value = self.df.iloc[df_row, df_col]
-        except IndexError:
-            logger.warning("❌ Impossible de verrouiller une cellule hors des limites.")
-            return
+        self.edit_cells((self.df_row(index.row()), index.column(), "") for index in self.selectedIndexes())
 
-        if pd.isna(value) or (isinstance(value, str) and value.strip() == ""):
-            logger.warning("❌ Impossible de verrouiller une cellule vide.")
-            return
+    def edit_cells(self, edits):
+        """Écrit un lot de (df_row, col, texte) hors cellules verrouillées, en une entrée d'historique."""
+        self.refresh_after(self.store.edit_cells(edits))
 
-        self.locked_cells.add((df_row, df_col))
+    # ========== GESTION DES CELLULES VERROUILLÉES ==========
+    def lock_cell(self, row, col):
+        if not self.store.lock_cell(self.df_row(row), col):
+            return False
+        self.model.refresh_cell(row, col)
+        return True
 
-        item = self.item(row, col)
-        if item:
-            self.update_item_flags(item, True)
-        
     def unlock_cell(self, row, col):
-        
-        df_row = self.filtered_index[row] if hasattr(self, 'filtered_index') and row < len(self.filtered_index) else row
-        df_col = col  # Les colonnes sont stockées en index relatif
 
-        self.locked_cells.discard((df_row, df_col))
+        if not self.store.unlock_cell(self.df_row(row), col):
+            return False
+        if row < self.rowCount():
+            self.model.refresh_cell(row, col)
+        return True
 
-        item = self.item(row, col)
-        if item:
-            self.update_item_flags(item, False)
-        else:
-            logger.warning(f"Item non trouvé à la position ({row}, {col}) lors du déverrouillage de la cellule.")
-    
     def lock_selected_cells(self):
-        for index in self.selectedIndexes():
-            self.lock_cell(index.row(), index.column())
-        self.update_table_and_filters()
-        
+        self.record_lock_change(
+            [index for index in self.selectedIndexes() if self.lock_cell(index.row(), index.column())], True
+        )
+
     def unlock_selected_cells(self):
-        for index in self.selectedIndexes():
-            self.unlock_cell(index.row(), index.column())
-        self.update_table_and_filters()
-
-    def update_item_flags(self, item, is_locked):
-        self.blockSignals(True)
-        if is_locked:
-            item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            font = item.font()
-            font.setBold(True)
-            item.setFont(font)
-        else:
-            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable)
-            font = item.font()
-            font.setBold(False)
-            item.setFont(font)
-        self.blockSignals(False)
+        self.record_lock_change(
+            [index for index in self.selectedIndexes() if self.unlock_cell(index.row(), index.column())], False
+        )
 
+    def record_lock_change(self, indexes, locked):
+        self.store.record_lock_change([(self.df_row(index.row()), index.column()) for index in indexes], locked)
@@ -0,0 +1,186 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QFont
+import pandas as pd
+import numpy as np
+
+from visibility import flipped_runs
+
+MAX_INCREMENTAL_RUNS = 64  # au-delà, on renotifie toutes les lignes d'un coup
+
+
+class DataFrameModel(QAbstractTableModel):
+    """Modèle Qt qui lit directement dans le DataFrame de la table.
+
+    Aucune cellule n'est matérialisée : la vue ne demande que les cellules
+    visibles dans le viewport, le coût dépend donc de la taille de la fenêtre
+    et non de celle du jeu de données.
+    """
+
+    def __init__(self, table):
+        super().__init__(table)
+        self.table = table  # TokenTableWidget (df, verrous, mapping des lignes)
+        self._columns = []
+        self._row_count = 0
+        self._bold_font = QFont()
+        self._bold_font.setBold(True)
+
+    # ========== DIMENSIONS ==========
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._columns)
+
+    # ========== LECTURE ==========
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role not in (Qt.DisplayRole, Qt.EditRole, Qt.FontRole):
+            return None
+        if index.row() >= len(self.table.filtered_index):
+            return None
+
+        df_row = self.table.df_row(index.row())
+        col = index.column()
+
+        if role == Qt.FontRole:
+            return self._bold_font if self.table.is_cell_locked(df_row, col) else None
+
+        value = self.table.df.iat[df_row, col]
+        return str(value) if pd.notna(value) else ""
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            if 0 <= section < len(self._columns):
+                return str(self._columns[section])
+            return None
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if not self.table.is_cell_locked(self.table.df_row(index.row()), index.column()):
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    # ========== ECRITURE ==========
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        return self.table.on_cell_edited(index.row(), index.column(), "" if value is None else str(value))
+
+    # ========== TRI ==========
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Clic sur un en-tête : tri de la vue (Maj + clic ajoute une clé secondaire)."""
+        if not 0 <= column < len(self._columns):
+            return
+        add = bool(QApplication.keyboardModifiers() & Qt.ShiftModifier)
+        self.table.sort_by_column(self._columns[column], order == Qt.AscendingOrder, add=add)
+
+    # ========== SYNCHRONISATION ==========
+    def refresh(self):
+        """Aligne le modèle sur le DataFrame courant.
+
+        Retourne True si la structure des colonnes a changé (reset complet du
+        modèle, l'en-tête perd alors son état), False sinon.
+        """
+        df = self.table.df
+        columns = list(df.columns)
+        row_count = len(self.table.filtered_index)
+
+        if columns != self._columns:
+            self.beginResetModel()
+            self._columns = columns
+            self._row_count = row_count
+            self.endResetModel()
+            return True
+
+        if row_count > self._row_count:
+            self.beginInsertRows(QModelIndex(), self._row_count, row_count - 1)
+            self._row_count = row_count
+            self.endInsertRows()
+        elif row_count < self._row_count:
+            self.beginRemoveRows(QModelIndex(), row_count, self._row_count - 1)
+            self._row_count = row_count
+            self.endRemoveRows()
+
+        # La vue ne repeint que ce qui est affiché
+        if row_count and columns:
+            self.dataChanged.emit(self.index(0, 0), self.index(row_count - 1, len(columns) - 1))
+        return False
+
+    def set_visible_rows(self, new_positions, total):
+        """Applique un changement de visibilité en ne notifiant que les lignes qui basculent.
+
+        `new_positions` : positions DataFrame visibles (triées). Le mapping
+        `table.filtered_index` est mis à jour au fil des notifications pour que
+        le modèle reste cohérent à chaque étape.
+        """
+        old_positions = self.table.filtered_index
+        old = np.zeros(total, dtype=bool)
+        old[old_positions] = True
+        new = np.zeros(total, dtype=bool)
+        new[new_positions] = True
+
+        removed_runs = flipped_runs((np.cumsum(old) - 1)[old & ~new])
+        added_runs = flipped_runs((np.cumsum(new) - 1)[new & ~old])
+
+        if len(removed_runs) + len(added_runs) > MAX_INCREMENTAL_RUNS:
+            removed_runs = [(0, self._row_count - 1)] if self._row_count else []
+            added_runs = [(0, len(new_positions) - 1)] if len(new_positions) else []
+
+        # Suppressions de la fin vers le début (coordonnées de l'ancienne vue),
+        # puis insertions dans l'ordre (coordonnées de la nouvelle vue)
+        for first, last in reversed(removed_runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self.table.filtered_index = np.delete(self.table.filtered_index, np.s_[first:last + 1])
+            self._row_count -= last - first + 1
+            self.endRemoveRows()
+        for first, last in added_runs:
+            self.beginInsertRows(QModelIndex(), first, last)
+            self.table.filtered_index = np.insert(self.table.filtered_index, first, new_positions[first:last + 1])
+            self._row_count += last - first + 1
+            self.endInsertRows()
+
+        self.table.filtered_index = np.asarray(new_positions)
+
+    def set_view_rows(self, new_positions, total):
+        """Remplace l'ordre des lignes affichées (tri actif) : ajustement du nombre de
+        lignes en fin de vue, puis un seul layoutChanged. Les index persistants
+        (sélection, cellule courante) suivent leur ligne du DataFrame."""
+        new_positions = np.asarray(new_positions)
+        count = len(new_positions)
+        if count < self._row_count:
+            self.beginRemoveRows(QModelIndex(), count, self._row_count - 1)
+            self.table.filtered_index = self.table.filtered_index[:count]
+            self._row_count = count
+            self.endRemoveRows()
+        elif count > self._row_count:
+            self.beginInsertRows(QModelIndex(), self._row_count, count - 1)
+            self.table.filtered_index = np.concatenate((self.table.filtered_index, new_positions[self._row_count:]))
+            self._row_count = count
+            self.endInsertRows()
+
+        self.layoutAboutToBeChanged.emit()
+        view_rows = np.full(total, -1, dtype=np.int64)
+        view_rows[new_positions] = np.arange(count)
+        old_indexes = self.persistentIndexList()
+        new_indexes = []
+        for index in old_indexes:
+            row = view_rows[self.table.filtered_index[index.row()]] if index.row() < count else -1
+            new_indexes.append(self.index(int(row), index.column()) if row >= 0 else QModelIndex())
+        self.table.filtered_index = new_positions
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def refresh_cell(self, row, col):
+        index = self.index(row, col)
+        self.dataChanged.emit(index, index)
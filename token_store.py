@@ -0,0 +1,1080 @@
+# token_store.py
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import compaction
+import config
+import importer
+import sqlite_backend
+import storage
+from instrumentation import table_rows, timed
+from journal import Journal, journal_path, snapshot_signature
+from logger import logger
+from search_index import SearchIndex
+from visibility import RowVisibility
+from filter_cache import FilterCache, referenced_columns
+from lazy_columns import LazyColumns
+from locks import LockStore
+from key_index import KeyIndex
+from schema import ColumnSchema
+from sorting import SortCache
+from history import (
+    UndoHistory, CellEdit, CellsEdit, RowsInsert, RowsDelete, ColumnInsert, ColumnDelete,
+    ColumnRename, ColumnMove, LocksChange, CompoundOperation,
+    RowsAppend, RowsDuplicate, BlockEdit,
+)
+
+
+SEARCH_ROW_REFRESH_LIMIT = 1000  # au-delà, la colonne entière est reconvertie pour la recherche
+
+
+class TokenStore:
+    """Moteur de données sans Qt : DataFrame, verrous, index, filtres et historique.
+
+    Le widget de table l'enveloppe pour l'affichage ; le CLI l'utilise seul.
+    Les lignes sont adressées par position dans le DataFrame (`df_row`), les
+    colonnes par position (`col`) ou par nom selon les méthodes. Les méthodes
+    d'édition appliquent le changement, l'enregistrent dans l'historique et
+    retournent l'opération (None si rien n'a changé).
+    """
+
+    def __init__(self, max_undo=config.MAX_UNDO_STACK):
+        self.df = pd.DataFrame()
+        self.history = UndoHistory(max_entries=max_undo)
+        self.locks = LockStore()  # verrous par (identifiant de ligne, nom de colonne)
+        self.next_row_id = 0  # identifiants de ligne stables (labels de l'index du df)
+        self.key_index = KeyIndex()  # (contract_address, token_id, chain) → identifiant de ligne
+        self.schema = ColumnSchema()  # types par colonne pour l'autocomplétion du filtre
+        self.visibility = RowVisibility()
+        self.search_index = SearchIndex()
+        self.filter_cache = FilterCache()
+        self.sort_cache = SortCache()
+        self.sort_keys = []  # tri de la vue : [(colonne, croissant), ...], les données ne bougent pas
+        self.hidden_columns = set()  # positions des colonnes masquées (persistées)
+        self.active_filter = None
+        self.active_advanced_filter = None
+        self.quick_search_term = ""
+        self.import_start = 0
+        self.import_ops = []
+        self.journal = None  # journal des modifications depuis le dernier snapshot (GUI)
+        self.backend = None  # base SQLite écrite au fil des éditions (GUI)
+        self.lazy = None  # colonnes masquées pas encore lues dans le fichier chargé
+        self.read_only = False  # chargement / sauvegarde en arrière-plan : éditions refusées
+
+    def __len__(self):
+        return len(self.df)
+
+    # ========== DONNEES ==========
+    @timed("store.load", rows=table_rows)
+    def load(self, path=None, progress=None, cancelled=None, expression=None):
+        """Charge le store principal (ou `path`). L'ancien data.xlsx sert de repli.
+
+        `expression` : filtre avancé poussé dans la requête (SQLite uniquement).
+        """
+        df, metadata = storage.load_table(storage.resolve_load_path(path), progress, cancelled, expression)
+        self.set_data(df, metadata)
+
+    def set_data(self, df, metadata):
+        """Installe un DataFrame chargé et ses métadonnées."""
+        self.detach_storage()  # journal et base SQLite suivent le fichier chargé : voir attach_storage
+        self.install_data(df, metadata)
+
+    def install_data(self, df, metadata):
+        if 'next_row_id' in metadata:
+            # Base SQLite : les identifiants de ligne sont les row_id de la table
+            self.df = df
+            self.next_row_id = int(metadata['next_row_id'])
+        else:
+            # Identifiants de ligne stables : positions au chargement, puis compteur
+            self.df = df.reset_index(drop=True)
+            self.next_row_id = len(self.df)
+        if config.COMPACT_DTYPES:
+            self.compact_columns()
+
+        hidden_cols = metadata.get('hidden_columns', [])
+        locked_cells = metadata.get('locked_cells', [])
+        self.active_filter = str(metadata.get('active_filter', ''))
+        self.quick_search_term = str(metadata.get('quick_search_term', ''))
+        self.hidden_columns = set(hidden_cols) if isinstance(hidden_cols, list) else set()
+        self.locks = LockStore.from_metadata(locked_cells, self.df)
+        lazy = metadata.get('lazy_columns')
+        self.lazy = LazyColumns(lazy['path'], lazy['columns'], self.df.index) if lazy else None
+
+        self.history.clear()
+        self.search_index.invalidate()
+        self.filter_cache.clear()
+        self.sort_cache.clear()
+        self.visibility.reset(len(self.df))
+        self.key_index.invalidate()
+        self.schema.invalidate()
+        if self.key_index.unique:
+            self.key_index.build(self.df)
+
+    @timed("store.save", rows=table_rows)
+    def save(self, path=None, progress=None, cancelled=None):
+        """Sauvegarde dans le store principal (ou `path`, au format déduit de l'extension)."""
+        if self.backend is not None and (path is None or self.writes_in_place(path)):
+            # Base SQLite rattachée : les éditions y sont déjà, seules les métadonnées changent
+            self.backend.commit(self)
+            return
+        if self.df.empty:
+            raise ValueError("Le DataFrame est vide. Impossible de sauvegarder.")
+        self.materialize_columns()
+        storage.save_table(path or storage.default_path(), self.df, self.metadata(), progress, cancelled)
+
+    def metadata(self):
+        return {
+            'column_dtypes': {str(col): str(dtype) for col, dtype in self.df.dtypes.items()},
+            'hidden_columns': sorted(self.hidden_columns),
+            'locked_cells': self.locks.to_positions(self.df),
+            'active_filter': str(self.active_filter),
+            'quick_search_term': str(self.quick_search_term)
+        }
+
+    def is_cell_locked(self, df_row, col):
+        if not self.locks:
+            return False
+        return self.locks.is_locked(self.df.index[df_row], self.df.columns[col])
+
+    def new_row_ids(self, count):
+        """Identifiants pour `count` nouvelles lignes (jamais réutilisés)."""
+        ids = pd.RangeIndex(self.next_row_id, self.next_row_id + count)
+        self.next_row_id += count
+        return ids
+
+    # ========== UNDO / REDO ==========
+    def check_writable(self):
+        """Les méthodes d'édition ne touchent pas au DataFrame qu'une sauvegarde est en train d'écrire."""
+        if self.read_only:
+            logger.warning("⏳ Opération en cours : la table est en lecture seule.")
+            return False
+        return True
+
+    def record(self, op):
+        """Enregistre une opération déjà appliquée au DataFrame et la retourne."""
+        self.history.push(op)
+        self.log_operation("do", op)
+        return op
+
+    def undo(self):
+        if not self.check_writable():
+            return None
+        op = self.history.undo(self)
+        self.log_operation("undo", op)
+        return op
+
+    def redo(self):
+        if not self.check_writable():
+            return None
+        op = self.history.redo(self)
+        self.log_operation("redo", op)
+        return op
+
+    # ========== STOCKAGE RATTACHE ==========
+    def log_operation(self, action, op):
+        """Répercute une opération (do, undo, redo) sur le journal ou la base SQLite rattachés."""
+        if op is None:
+            return
+        if self.journal is not None:
+            self.journal.append(action, op.journal_copy(self), self.next_row_id)
+        if self.backend is not None:
+            self.backend.apply(op, action, self)
+
+    def attach_storage(self, path):
+        """À appeler juste après le chargement de `path` : une base SQLite reçoit
+        chaque édition, les autres formats un journal. Retourne le nombre
+        d'opérations rejouées depuis le journal."""
+        self.detach_storage()
+        if storage.file_format(path) == "sqlite":
+            self.backend = sqlite_backend.SqliteBackend(path)
+            return 0
+        return self.open_journal(path)
+
+    def detach_storage(self):
+        self.close_journal()
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def writes_in_place(self, path):
+        """True si `path` est la base SQLite rattachée : rien à réécrire pour sauvegarder."""
+        return self.backend is not None and Path(path).resolve() == Path(self.backend.path).resolve()
+
+    def reload_view(self, expression=None, confirm=None):
+        """Recharge depuis la base SQLite les seules lignes du filtre (toutes si None).
+
+        Les éditions sont déjà en base. L'historique undo est conservé s'il reste
+        applicable aux lignes rechargées (voir UndoHistory.replayable) ; sinon il
+        est vidé, après accord de `confirm()` s'il est fourni. Retourne False si refusé.
+        """
+        df, metadata = self.backend.read(expression)
+        history = self.history
+        keep = history.replayable(df.index)
+        if not keep and (len(history) or history.redo_stack):
+            if confirm is not None and not confirm():
+                return False
+            logger.warning("⚠️ Historique undo vidé : il porte sur des lignes hors de la vue rechargée.")
+
+        self.history = UndoHistory(history.max_entries, history.max_bytes)
+        self.install_data(df, metadata)
+        if keep:
+            self.history = history
+        self.backend.view_filter = metadata.get('view_filter')
+        self.active_advanced_filter = expression
+        logger.info(f"🗄️ SQLite : {len(self.df)} lignes chargées" + (f" ({expression})" if expression else ""))
+        return True
+
+    # ========== JOURNAL ==========
+    def open_journal(self, path):
+        """Rattache le journal du fichier `path` et rejoue les opérations postérieures au snapshot.
+
+        À appeler juste après le chargement de `path`. Retourne le nombre
+        d'opérations rejouées (elles ne sont pas dans l'historique undo).
+        """
+        self.close_journal()
+        journal = Journal(journal_path(path))
+        signature = snapshot_signature(path)
+        header, records = journal.open(signature)
+        replayed = 0
+        if header is not None:
+            self.restore_row_ids(header["row_ids"], header["next_row_id"])
+            for action, op, next_row_id in records:
+                try:
+                    if action == "undo":
+                        op.undo(self)
+                    else:
+                        op.redo(self)
+                except Exception as e:
+                    logger.error(f"❌ Journal : rejeu interrompu ({op.label}) : {e}")
+                    break
+                self.next_row_id = next_row_id
+                replayed += 1
+            if replayed < len(records):
+                header = None
+        if header is None:
+            journal.reset(signature, self.row_ids(), self.next_row_id)
+        self.journal = journal
+        if replayed:
+            logger.info(f"📜 Journal : {replayed} modifications rejouées depuis le dernier snapshot.")
+        return replayed
+
+    def checkpoint_journal(self, path):
+        """Le fichier `path` vient d'être écrit avec l'état courant : le journal le suit, vidé.
+
+        Sauvegarde sous un autre nom (ex. data.xlsx → parquet) : journal recréé à
+        côté de `path`, l'ancien supprimé. Retourne False si le journal reste sur
+        le fichier chargé (pas de journal, ou `path` est une base SQLite).
+        """
+        if self.journal is None or storage.file_format(path) == "sqlite":
+            return False
+        old_path = self.journal.path
+        if journal_path(path).resolve() != old_path.resolve():
+            self.journal.close()
+            self.journal = Journal(journal_path(path))
+        self.journal.reset(snapshot_signature(path), self.row_ids(), self.next_row_id)
+        if self.journal.path != old_path:
+            old_path.unlink(missing_ok=True)
+            logger.info(f"📜 Journal rattaché à {Path(path).name}")
+        return True
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def row_ids(self):
+        """Identifiants de ligne courants (None : les positions 0..n-1, cas du chargement)."""
+        if self.df.index.equals(pd.RangeIndex(len(self.df))):
+            return None
+        return self.df.index.to_numpy()
+
+    def restore_row_ids(self, row_ids, next_row_id):
+        """Rétablit les identifiants de ligne qu'avait le DataFrame lors du snapshot."""
+        self.next_row_id = max(self.next_row_id, next_row_id)
+        if row_ids is None or len(row_ids) != len(self.df):
+            return
+        locked_cells = self.locks.to_positions(self.df)
+        self.df.index = pd.Index(row_ids)
+        self.locks = LockStore.from_metadata(locked_cells, self.df)
+        if self.lazy:
+            self.lazy.row_ids = self.df.index
+        self.key_index.invalidate()
+        if self.key_index.unique:
+            self.key_index.build(self.df)
+
+    # ========== EDITION DE CELLULES ==========
+    def edit_cell(self, df_row, col, text):
+        """Saisie d'une cellule. Retourne (acceptée, opération enregistrée ou None)."""
+        if not self.check_writable():
+            return False, None
+        if self.is_cell_locked(df_row, col):
+            return False, None
+        column = self.df.columns[col]
+        self.materialize_columns([column])
+
+        old_value = self.df.iat[df_row, col]
+        before = {column: self.df[column].dtype}
+        dtype_changed = self.set_cell_value(df_row, col, text)
+        if self.reject_duplicate_key(df_row, col, old_value):
+            self.set_dtypes(before)
+            return False, None
+        value = self.df.iat[df_row, col]
+        if not dtype_changed and self.same_value(old_value, value):
+            return True, None
+
+        # Historique au niveau de la cellule : pas de copie du DataFrame
+        return True, self.record(CellEdit(self.df.index[df_row], column, old_value, value, self.dtype_changes(before)))
+
+    def edit_cells(self, edits):
+        """Écrit un lot de (df_row, col, texte) hors cellules verrouillées, en une entrée d'historique."""
+        if not self.check_writable():
+            return None
+        edits = list(edits)
+        self.materialize_columns({self.df.columns[col] for _, col, _ in edits})
+        before = self.df.dtypes.to_dict()
+        row_ids, columns, olds, news = [], [], [], []
+        for df_row, col, text in edits:
+            if self.is_cell_locked(df_row, col):
+                logger.debug(f"Cellule {df_row}, {col} non modifiée (verrouillée)")
+                continue
+            old_value = self.df.iat[df_row, col]
+            self.set_cell_value(df_row, col, text)
+            if self.reject_duplicate_key(df_row, col, old_value):
+                continue
+            new_value = self.df.iat[df_row, col]
+            if self.same_value(old_value, new_value):
+                continue
+            row_ids.append(self.df.index[df_row])
+            columns.append(self.df.columns[col])
+            olds.append(old_value)
+            news.append(new_value)
+
+        if row_ids:
+            return self.record(CellsEdit(row_ids, columns, olds, news, self.dtype_changes(before)))
+        self.set_dtypes(before)  # rien d'écrit : types élargis pour des saisies refusées
+        return None
+
+    def set_cell_value(self, df_row, col, text):
+        """Écrit le texte saisi dans le DataFrame en respectant le type de la colonne.
+
+        Retourne True si la colonne a dû changer de type pour accueillir la valeur.
+        """
+        column = self.df.columns[col]
+        dtype = self.df[column].dtype
+        value = None if text == "" else text
+        dtype_changed = False
+
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            number = pd.to_numeric(value, errors='coerce') if value is not None else None
+            if value is not None and pd.isna(number):
+                # Texte dans une colonne numérique → la colonne passe en object
+                self.replace_dtype(column, 'object')
+                dtype_changed = True
+            elif number is None and compaction.is_compact(dtype) and pd.api.types.is_integer_dtype(dtype):
+                # Cellule vidée : entier nullable de même taille plutôt que float64
+                target = compaction.nullable_dtype(dtype)
+                dtype_changed = target != dtype
+                if dtype_changed:
+                    self.replace_dtype(column, target)
+            elif pd.api.types.is_integer_dtype(dtype) and (number is None or not float(number).is_integer()):
+                self.replace_dtype(column, 'float64')
+                dtype_changed = True
+                value = number
+            else:
+                value = int(number) if pd.api.types.is_integer_dtype(dtype) else number
+                dtype_changed = self.fit_column(column, [value])
+        elif compaction.is_compact(dtype):
+            dtype_changed = self.fit_column(column, [value])  # catégorie ajoutée au besoin
+        elif not pd.api.types.is_object_dtype(dtype):
+            self.replace_dtype(column, 'object')
+            dtype_changed = True
+
+        old_key = self.key_index.row_key(self.df, df_row) if self.key_index.tracks(column) else None
+        old_value = self.df.iat[df_row, col]
+        self.df.iat[df_row, col] = value
+        self.schema.update_value(column, old_value, self.df.iat[df_row, col])
+        if self.key_index.tracks(column):
+            self.key_index.replace(self.df.index[df_row], old_key, self.key_index.row_key(self.df, df_row))
+        self.search_index.invalidate_row(df_row)
+        self.filter_cache.bump_columns([column])
+        return dtype_changed
+
+    def reject_duplicate_key(self, df_row, col, old_value):
+        """Unicité des clés imposée : annule l'écriture si la clé de la ligne existe déjà ailleurs."""
+        if not (self.key_index.unique and self.key_index.tracks(self.df.columns[col])):
+            return False
+        key = self.key_index.row_key(self.df, df_row)
+        if not self.key_index.is_shared(key):
+            return False
+        self.write_cells([self.df.index[df_row]], [self.df.columns[col]], [old_value])
+        logger.warning(f"❌ Clé {key} déjà utilisée : modification refusée.")
+        return True
+
+    @staticmethod
+    def same_value(a, b):
+        if pd.isna(a) and pd.isna(b):
+            return True
+        return type(a) is type(b) and a == b
+
+    def replace_dtype(self, column, dtype):
+        self.df[column] = self.df[column].astype(dtype)
+        self.search_index.invalidate_column(column)
+        self.schema.invalidate_column(column)
+
+    def fit_column(self, column, values):
+        """Élargit juste assez le type compact de `column` pour recevoir `values`
+        (entier plus large, float64, catégories ajoutées). Retourne True s'il a changé."""
+        dtype = self.df[column].dtype
+        target = compaction.fitting_dtype(dtype, values)
+        if target == dtype:
+            return False
+        if isinstance(dtype, pd.CategoricalDtype) and isinstance(target, pd.CategoricalDtype):
+            # Mêmes valeurs, codes inchangés : rien à invalider
+            self.df[column] = self.df[column].cat.set_categories(target.categories)
+        else:
+            self.replace_dtype(column, target)
+        return True
+
+    def set_dtypes(self, dtypes):
+        """Remet les colonnes aux types `dtypes` ({colonne: type}), ex. à l'annulation d'une édition qui les avait élargis."""
+        changed = [column for column, dtype in dtypes.items() if column in self.df.columns and self.df[column].dtype != dtype]
+        for column in changed:
+            self.replace_dtype(column, dtypes[column])
+        if changed:
+            self.filter_cache.bump_columns(changed)
+
+    def dtype_changes(self, before):
+        """{colonne: (type avant, type actuel)} des colonnes de `before` dont le type a changé."""
+        return {
+            column: (dtype, self.df[column].dtype) for column, dtype in before.items()
+            if column in self.df.columns and self.df[column].dtype != dtype
+        }
+
+    def fit_rows(self, rows):
+        """Lignes à insérer converties aux types compacts de la table, élargis au besoin."""
+        cast = {}
+        for column in rows.columns.intersection(self.df.columns):
+            dtype = self.df[column].dtype
+            if not compaction.is_compact(dtype) or rows[column].dtype == dtype:
+                continue
+            if pd.api.types.is_integer_dtype(dtype) and rows[column].isna().any():
+                # Lignes vides : entier nullable, sinon la concaténation passe la colonne en float64
+                self.set_dtypes({column: compaction.nullable_dtype(dtype)})
+            self.fit_column(column, rows[column])
+            cast[column] = self.df[column].dtype
+        return rows.astype(cast) if cast else rows
+
+    @timed("store.compact_columns", rows=table_rows)
+    def compact_columns(self, columns=None):
+        """Passe les colonnes `columns` (toutes si None) en types compacts (voir compaction)."""
+        columns = list(self.df.columns if columns is None else columns)
+        if not columns:
+            return
+        before = compaction.memory_mb(self.df, columns)
+        changed = compaction.compact_frame(self.df, columns)
+        for column in changed:
+            self.search_index.invalidate_column(column)
+            self.schema.invalidate_column(column)
+        logger.info(
+            f"🗜️ Types compacts : {before:.1f} Mo → {compaction.memory_mb(self.df, columns):.1f} Mo "
+            f"({len(changed)} colonnes converties sur {len(columns)})"
+        )
+
+    # ========== COLLAGE ==========
+    def paste_block(self, block, start_row, start_col):
+        """Colle un bloc à partir de la cellule (start_row, start_col), `start_row` comptée parmi les lignes visibles.
+
+        La table est agrandie une seule fois si besoin, chaque colonne est
+        écrite en une affectation hors cellules verrouillées, et le tout forme
+        une seule entrée d'historique. Retourne l'opération (None si refusée ou sans effet).
+        """
+        if not self.check_writable():
+            return None
+        height, width = block.shape
+        if not height or not width:
+            return None
+        self.materialize_columns(self.df.columns[start_col:start_col + width])
+        ops = []
+
+        # ➕ Colonnes et lignes manquantes, ajoutées en une fois
+        while start_col + width > len(self.df.columns):
+            op = ColumnInsert(len(self.df.columns), f"Col_{len(self.df.columns)}", None)
+            op.redo(self)
+            ops.append(op)
+        missing_rows = start_row + height - len(self.view_positions())
+        if missing_rows > 0:
+            rows = pd.DataFrame(index=self.new_row_ids(missing_rows), columns=self.df.columns)
+            op = RowsInsert(np.arange(len(self.df), len(self.df) + missing_rows), rows)
+            op.redo(self)
+            ops.append(op)
+
+        positions = self.view_positions()[start_row:start_row + height]
+
+        before = self.df.dtypes.to_dict()
+        columns, row_ids, olds, news = [], [], [], []
+        for j in range(width):
+            column = self.df.columns[start_col + j]
+            present = block[:, j] != None  # noqa: E711 (comparaison élément par élément)
+            targets = positions[present]
+            ids = self.df.index[targets]
+            # ➖ Les cellules verrouillées sont laissées telles quelles
+            writable = ~self.locks.mask(column, ids)
+            targets, ids = targets[writable], ids[writable]
+            if not len(targets):
+                continue
+
+            new = self.coerce_block(column, block[present, j][writable])
+            old = self.df[column].iloc[targets].to_numpy(dtype=object, na_value=None)
+            changed = ~(pd.isna(old) & pd.isna(new)) & (old != new)
+            if not changed.any():
+                continue
+            columns.append(column)
+            row_ids.append(ids[changed].to_numpy())
+            olds.append(old[changed])
+            news.append(new[changed])
+
+        if columns:
+            block_op = BlockEdit(columns, row_ids, olds, news, self.dtype_changes(before))
+            block_op.redo(self)
+            ops.append(block_op)
+        if not ops:
+            return None
+
+        op = ops[0] if len(ops) == 1 else CompoundOperation(ops, "collage")
+        if self.key_index.unique and any(self.key_index.tracks(column) for column in columns) and any(
+            self.key_index.is_shared(self.key_index.row_key(self.df, p)) for p in positions
+        ):
+            op.undo(self)
+            logger.warning("❌ Collage refusé : il dupliquerait des clés existantes.")
+            return None
+        return self.record(op)
+
+    def coerce_block(self, column, texts):
+        """Convertit des textes collés selon le type de la colonne (comme set_cell_value, en vectorisé).
+
+        Élargit le type de la colonne si nécessaire. Retourne un tableau object.
+        """
+        values = np.where(texts == "", None, texts).astype(object)
+        dtype = self.df[column].dtype
+
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+            if (numbers.isna().to_numpy() & pd.notna(values)).any():
+                # Texte dans une colonne numérique → la colonne passe en object
+                self.replace_dtype(column, 'object')
+                return values
+            if pd.api.types.is_integer_dtype(dtype):
+                empty = numbers.isna().any()
+                if (numbers.dropna() % 1 != 0).any() or (empty and not compaction.is_compact(dtype)):
+                    self.replace_dtype(column, 'float64')
+                    return numbers.to_numpy(dtype=object)
+                if empty:
+                    self.set_dtypes({column: compaction.nullable_dtype(dtype)})  # cellules vidées
+                self.fit_column(column, numbers)
+                return numbers.astype(self.df[column].dtype).to_numpy(dtype=object, na_value=None)
+            return numbers.to_numpy(dtype=object)
+
+        if compaction.is_compact(dtype):
+            self.fit_column(column, values)
+        elif not pd.api.types.is_object_dtype(dtype):
+            self.replace_dtype(column, 'object')
+        return values
+
+    # ========== LIGNES & COLONNES ==========
+    def add_row(self, row_data=None):
+        if not self.check_writable():
+            return None
+        if row_data is None:
+            row_data = [None] * len(self.df.columns)
+
+        # Nouvelle ligne en fin de DataFrame (aucun verrou)
+        rows = pd.DataFrame([row_data], columns=self.df.columns, index=self.new_row_ids(1))
+        op = RowsInsert([len(self.df)], rows)
+        op.redo(self)
+        return self.record(op)
+
+    def delete_rows(self, positions):
+        """Supprime les lignes aux positions données, en un seul iloc."""
+        if not self.check_writable():
+            return None
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        if not len(positions):
+            return None
+        rows = self.remove_rows_at(positions)
+        return self.record(RowsDelete(positions, rows))
+
+    def duplicate_rows(self, positions):
+        if not self.check_writable():
+            return None
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        if not len(positions):
+            return None
+        if self.key_index.unique and self.key_index.ensure(self.df) and any(
+            self.key_index.row_key(self.df, position) is not None for position in positions
+        ):
+            logger.warning("❌ Unicité des clés imposée : duplication de lignes identifiées impossible.")
+            return None
+
+        op = RowsDuplicate(positions, self.new_row_ids(len(positions)))
+        op.redo(self)
+        return self.record(op)
+
+    def add_column(self, column_name, default_value=None):
+        if not self.check_writable():
+            return None
+        if column_name in self.df.columns:
+            logger.warning(f"La colonne '{column_name}' existe déjà.")
+            return None
+        op = ColumnInsert(len(self.df.columns), column_name, default_value)
+        op.redo(self)
+        return self.record(op)
+
+    def delete_column(self, index):
+        if not self.check_writable():
+            return None
+        if self.backend is not None and self.backend.view_filter:
+            # Les lignes hors du filtre perdraient leur valeur sans retour possible
+            logger.warning("⚠️ Suppression de colonne impossible sur une vue SQLite filtrée : réinitialisez les filtres.")
+            return None
+        # Verrous et visibilité de la colonne sont conservés pour l'undo
+        column_name = self.df.columns[index]
+        self.materialize_columns([column_name])
+        values, locked_rows, hidden = self.remove_column_at(index)
+        return self.record(ColumnDelete(index, column_name, values, locked_rows, hidden))
+
+    def rename_column(self, old_name, new_name):
+        if not self.check_writable():
+            return None
+        op = ColumnRename(old_name, new_name)
+        op.redo(self)
+        return self.record(op)
+
+    def move_column(self, from_index, to_index):
+        if not self.check_writable():
+            return None
+        op = ColumnMove(from_index, to_index)
+        op.redo(self)
+        return self.record(op)
+
+    # ========== COLONNES MASQUEES ==========
+    def hide_column(self, col):
+        self.hidden_columns.add(col)
+
+    def show_column(self, col):
+        self.hidden_columns.discard(col)
+        self.materialize_columns([self.df.columns[col]])
+
+    def set_hidden_columns(self, columns):
+        self.hidden_columns = set(columns)
+        self.materialize_columns(self.visible_column_names())
+
+    @timed("store.materialize_columns", rows=table_rows)
+    def materialize_columns(self, columns=None):
+        """Lit dans le fichier les colonnes différées parmi `columns` (toutes si None)."""
+        if not self.lazy:
+            return
+        names = list(self.lazy.pending) if columns is None else [name for name in columns if name in self.lazy]
+        for name in names:
+            values = self.lazy.load(name, self.df)
+            self.replace_column(name, compaction.compact_series(values) if config.COMPACT_DTYPES else values)
+
+    # ========== TRI ==========
+    def sort_by_column(self, column_name, ascending=True, add=False):
+        """Trie la vue par `column_name` ; `add` : clé secondaire ajoutée au tri en cours."""
+        keys = [(column, asc) for column, asc in self.sort_keys if column != column_name] if add else []
+        self.sort_keys = keys + [(column_name, ascending)]
+
+    def clear_sort(self):
+        self.sort_keys = []
+
+    def active_sort_keys(self):
+        # Une colonne supprimée ou renommée sort du tri
+        return [(column, asc) for column, asc in self.sort_keys if column in self.df.columns]
+
+    def sort_order(self):
+        """Permutation triée de toutes les lignes (None sans tri), en cache tant que les colonnes triées ne changent pas."""
+        keys = self.active_sort_keys()
+        if not keys:
+            return None
+        self.materialize_columns([column for column, _ in keys])
+        return self.sort_cache.get(self.df, keys, self.filter_cache)
+
+    # ========== VERROUS ==========
+    def lock_cell(self, df_row, col):
+        if not self.check_writable():
+            return False
+        try:
+            self.materialize_columns([self.df.columns[col]])
+            value = self.df.iloc[df_row, col]
+        except IndexError:
+            logger.warning("❌ Impossible de verrouiller une cellule hors des limites.")
+            return False
+
+        if pd.isna(value) or (isinstance(value, str) and value.strip() == ""):
+            logger.warning("❌ Impossible de verrouiller une cellule vide.")
+            return False
+        return self.locks.lock(self.df.index[df_row], self.df.columns[col])
+
+    def unlock_cell(self, df_row, col):
+        if not self.check_writable():
+            return False
+        return self.locks.unlock(self.df.index[df_row], self.df.columns[col])
+
+    def record_lock_change(self, cells, locked):
+        """`cells` : (df_row, col) dont le verrou vient de changer."""
+        if not self.check_writable():
+            return None
+        cells = [(self.df.index[df_row], self.df.columns[col]) for df_row, col in cells]
+        if cells:
+            return self.record(LocksChange(cells, locked))
+        return None
+
+    # ========== IMPORT ==========
+    def begin_import(self):
+        self.import_start = len(self.df)
+        self.import_ops = []  # colonnes créées par l'import
+
+    def append_import_chunk(self, chunk):
+        """Ajoute un paquet importé en une fois. Retourne le nombre de lignes ajoutées."""
+        self.materialize_columns(chunk.columns)  # valeurs importées dans une colonne différée
+        chunk = importer.coerce_chunk(chunk, self.df.dtypes.to_dict())
+        for name in chunk.columns[len(self.df.columns):]:
+            op = ColumnInsert(len(self.df.columns), name, None)
+            op.redo(self)
+            self.import_ops.append(op)
+
+        if self.key_index.unique and self.key_index.ensure(self.df):
+            mask = self.key_index.new_key_mask(chunk)
+            if not all(mask):
+                logger.warning(f"⚠️ Import : {len(mask) - sum(mask)} lignes ignorées (clé déjà présente).")
+                chunk = chunk[mask]
+        chunk.index = self.new_row_ids(len(chunk))
+        self.insert_rows_at(np.arange(len(self.df), len(self.df) + len(chunk)), chunk)
+        return len(chunk)
+
+    def end_import(self):
+        """Clôt l'import (terminé ou interrompu) : une seule entrée d'historique."""
+        count = len(self.df) - self.import_start
+        if config.COMPACT_DTYPES:
+            self.compact_columns([op.name for op in self.import_ops if op.name in self.df.columns])
+        if count:
+            self.import_ops.append(RowsAppend(self.import_start, count))
+        op = self.record(CompoundOperation(self.import_ops, "import de lignes")) if self.import_ops else None
+        self.import_ops = []
+        logger.info(f"📥 Import : {count} lignes ajoutées.")
+        return op
+
+    def import_file(self, path, chunk_size=config.IO_CHUNK_ROWS):
+        """Import complet d'un fichier (csv, parquet, xlsx), paquet par paquet."""
+        self.begin_import()
+        try:
+            for chunk, _ in importer.iter_chunks(path, chunk_size):
+                self.append_import_chunk(chunk)
+        finally:
+            op = self.end_import()
+        return op
+
+    # ========== CLES ==========
+    def find_token(self, contract_address, token_id, chain):
+        """Positions DataFrame des lignes portant la clé donnée (index de hachage, O(1))."""
+        if not self.key_index.ensure(self.df):
+            logger.warning(f"⚠️ Colonnes de clé absentes : {', '.join(self.key_index.columns)}")
+            return []
+        row_ids = self.key_index.lookup(contract_address, token_id, chain)
+        return sorted(self.df.index.get_indexer(row_ids).tolist())
+
+    def duplicate_key_positions(self, keep="first"):
+        """Positions des lignes dont la clé (complète) est déjà portée par une autre ligne à garder."""
+        if not self.key_index.available(self.df):
+            logger.warning(f"⚠️ Colonnes de clé absentes : {', '.join(self.key_index.columns)}")
+            return np.empty(0, dtype=np.int64)
+        keys = pd.Series(self.key_index.frame_keys(self.df), dtype=object)
+        duplicated = keys.duplicated(keep=keep).to_numpy() & keys.notna().to_numpy()
+        return np.flatnonzero(duplicated)
+
+    # ========== FILTRAGE & RECHERCHE ==========
+    def ensure_visibility_rows(self):
+        if self.visibility.row_count != len(self.df):
+            self.visibility.reset(len(self.df))
+
+    def visible_positions(self):
+        self.ensure_visibility_rows()
+        return self.visibility.visible_positions()
+
+    def view_positions(self, visible=None):
+        """Positions des lignes visibles dans l'ordre d'affichage (tri appliqué)."""
+        if visible is None:
+            self.ensure_visibility_rows()
+            visible = self.visibility.combined()
+        order = self.sort_order()
+        if order is None:
+            return np.flatnonzero(visible)
+        return order[visible[order]]
+
+    def visible_column_names(self):
+        return [name for col, name in enumerate(self.df.columns) if col not in self.hidden_columns]
+
+    @staticmethod
+    def normalize_text(text):
+        return text.strip().lower()
+
+    @timed("store.advanced_filter_mask", rows=table_rows)
+    def advanced_filter_mask(self, expression):
+        """Masque booléen (positions du DataFrame) des lignes satisfaisant l'expression."""
+        self.materialize_columns(referenced_columns(expression, self.df.columns))
+
+        def compute():
+            result = self.df.eval(expression)
+            if not isinstance(result, pd.Series) or not pd.api.types.is_bool_dtype(result.dtype):
+                raise ValueError(f"L'expression ne produit pas un booléen par ligne : {expression}")
+            return result.fillna(False).to_numpy(dtype=bool)
+
+        # Réutilisé tant que ni l'expression ni les colonnes qu'elle lit n'ont changé
+        return self.filter_cache.get(expression, self.df.columns, compute)
+
+    def set_advanced_filter(self, expression, confirm=None):
+        """Applique le filtre avancé à toutes les lignes. Lève une exception si l'expression est invalide.
+
+        Avec une base SQLite, une expression traduisible en SQL recharge les
+        seules lignes correspondantes (le DataFrame est alors remplacé, voir
+        reload_view pour `confirm`). Retourne False si le rechargement est refusé.
+        """
+        if self.backend is not None:
+            if sqlite_backend.translate_filter(expression, self.df.columns) is not None:
+                return self.reload_view(expression, confirm)
+            if self.backend.view_filter and not self.reload_view(None, confirm):
+                return False  # évaluée par pandas : sur toutes les lignes
+        mask = self.advanced_filter_mask(expression)
+        self.active_advanced_filter = expression
+        self.ensure_visibility_rows()
+        self.visibility.set_mask("advanced", mask)
+        return True
+
+    @timed("store.set_quick_search", rows=table_rows)
+    def set_quick_search(self, text):
+        """Recherche rapide en une passe vectorisée sur les clés de recherche pré-calculées."""
+        text = self.normalize_text(text)
+        self.ensure_visibility_rows()
+        if text:
+            self.visibility.set_mask("search", self.search_index.search(self.df, self.visible_column_names(), text))
+        else:
+            self.visibility.clear_mask("search")
+
+    def update_row_filters(self, df_row, search_text=""):
+        """Recalcule l'appartenance d'une seule ligne au filtre avancé et à la recherche rapide."""
+        if self.active_advanced_filter:
+            try:
+                matches = self.df.iloc[[df_row]].eval(self.active_advanced_filter)
+                self.visibility.set_row("advanced", df_row, bool(matches.fillna(False).iloc[0]))
+            except Exception as e:
+                logger.warning(f"⚠️ Filtre avancé non évaluable sur la ligne {df_row} : {e}")
+
+        text = self.normalize_text(search_text)
+        if text:
+            values = self.df.iloc[df_row][self.visible_column_names()]
+            match = any(text in str(value).lower() for value in values if pd.notna(value))
+            self.visibility.set_row("search", df_row, match)
+
+    def reapply_filters(self, search_text=""):
+        # Les masques sont recalculés sur le DataFrame courant
+        self.visibility.reset(len(self.df))
+        if self.active_advanced_filter:
+            try:
+                self.visibility.set_mask("advanced", self.advanced_filter_mask(self.active_advanced_filter))
+            except Exception as e:
+                logger.warning(f"⚠️ Filtre avancé non réappliqué : {e}")
+        self.set_quick_search(search_text)
+
+    def reset_filters(self, confirm=None):
+        """Retire les filtres. Retourne False si le rechargement de la vue SQLite est refusé."""
+        if self.backend is not None and self.backend.view_filter and not self.reload_view(None, confirm):
+            return False  # vue SQLite filtrée : toutes les lignes
+        self.visibility.reset(len(self.df))
+        self.active_advanced_filter = None
+        return True
+
+    # ========== PRIMITIVES D'EDITION ==========
+    # Appliquées telles quelles par l'historique : n'enregistrent rien.
+    def write_cells(self, row_ids, columns, values):
+        self.materialize_columns(set(columns))
+        by_column = {}
+        for column, value in zip(columns, values):
+            by_column.setdefault(column, []).append(value)
+        for column, column_values in by_column.items():
+            self.fit_column(column, column_values)
+        for row_id, column, value in zip(row_ids, columns, values):
+            position = self.df.index.get_loc(row_id)
+            old_key = self.key_index.row_key(self.df, position) if self.key_index.tracks(column) else None
+            col = self.df.columns.get_loc(column)
+            old_value = self.df.iat[position, col]
+            self.df.iat[position, col] = value
+            self.schema.update_value(column, old_value, self.df.iat[position, col])
+            if self.key_index.tracks(column):
+                self.key_index.replace(row_id, old_key, self.key_index.row_key(self.df, position))
+            self.search_index.invalidate_row(position)
+            self.filter_cache.bump_columns([column])
+
+    def write_block(self, row_ids, column, values):
+        """Écrit un tableau de valeurs dans une colonne, pour les lignes `row_ids`, en une affectation."""
+        self.materialize_columns([column])
+        positions = self.df.index.get_indexer(row_ids)
+        col = self.df.columns.get_loc(column)
+        tracked = self.key_index.tracks(column)
+        old_keys = [self.key_index.row_key(self.df, p) for p in positions] if tracked else None
+
+        self.fit_column(column, values)
+        dtype = self.df[column].dtype
+        if dtype != object:
+            try:
+                values = pd.Series(values, dtype=object).astype(dtype).to_numpy()
+            except (TypeError, ValueError):
+                self.replace_dtype(column, 'object')
+        old_values = self.df[column].iloc[positions]
+        self.df.iloc[positions, col] = values
+        self.schema.update_values(column, old_values, self.df[column].iloc[positions])
+
+        if tracked:
+            for row_id, position, old_key in zip(row_ids, positions, old_keys):
+                self.key_index.replace(row_id, old_key, self.key_index.row_key(self.df, position))
+        if len(positions) > SEARCH_ROW_REFRESH_LIMIT:
+            self.search_index.invalidate_column(column)
+        else:
+            for position in positions:
+                self.search_index.invalidate_row(position)
+        self.filter_cache.bump_columns([column])
+
+    def insert_rows_at(self, positions, rows):
+        """Insère `rows` (avec leurs identifiants) aux positions finales `positions` (triées)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        old_count = len(self.df)
+        new_count = old_count + len(positions)
+        if self.lazy:
+            rows = self.lazy.fill_rows(rows)
+        rows = self.fit_rows(rows)
+        if rows.isna().to_numpy().all():
+            # Lignes vides : on étend simplement le DataFrame
+            combined = self.df.reindex(self.df.index.append(rows.index))
+        else:
+            combined = pd.concat([self.df, rows])
+        self.key_index.add_rows(rows)
+        self.schema.add_rows(rows)
+        for column in combined.columns[(combined.dtypes != self.df.dtypes.reindex(combined.columns)).to_numpy()]:
+            # Type élargi par la concaténation : statistiques à refaire
+            self.schema.invalidate_column(column)
+        if self.visibility.row_count == old_count:
+            self.visibility.insert_rows(positions)
+
+        if len(positions) and positions[0] == old_count and positions[-1] == new_count - 1:
+            # Ajout en fin de table : aucune ligne existante ne bouge
+            self.df = combined
+            self.search_index.invalidate()
+            self.filter_cache.bump_structure()
+            return
+
+        # order[i] = ligne de `combined` qui occupe la position finale i
+        inserted = np.zeros(new_count, dtype=bool)
+        inserted[positions] = True
+        order = np.empty(new_count, dtype=np.int64)
+        order[~inserted] = np.arange(old_count)
+        order[positions] = old_count + np.arange(len(positions))
+        self.df = combined.iloc[order]
+
+        self.search_index.invalidate()
+        self.filter_cache.bump_structure()
+
+    def duplicate_rows_at(self, sources, row_ids):
+        """Copie les lignes `sources` (triées) juste après chacune d'elles, en un seul gather."""
+        rows = self.df.iloc[sources]
+        self.locks.copy_rows(dict(zip(rows.index, row_ids)))
+        if self.lazy:
+            self.lazy.copy_rows(dict(zip(rows.index, row_ids)))
+        self.insert_rows_at(sources + np.arange(1, len(sources) + 1), rows.set_axis(row_ids))
+
+    def remove_rows_at(self, positions):
+        """Supprime les lignes aux positions données et les retourne (identifiants compris).
+
+        Leurs verrous restent dans le LockStore : ils reviennent avec elles à l'undo.
+        """
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        rows = self.df.iloc[positions]
+
+        keep = np.ones(len(self.df), dtype=bool)
+        keep[positions] = False
+        if self.visibility.row_count == len(self.df):
+            self.visibility.remove_rows(positions)
+        self.search_index.remove_rows(positions)
+        self.df = self.df.iloc[keep]
+        self.key_index.remove_rows(rows)
+        self.schema.remove_rows(rows)
+
+        self.filter_cache.bump_structure()
+        return rows
+
+    def insert_column_at(self, position, name, values=None, locked_rows=(), hidden=False):
+        if isinstance(values, pd.Series):
+            values = values.array  # garde le type (catégories, texte Arrow)
+        self.df.insert(position, name, values)
+
+        self.locks.set_column(name, locked_rows)
+        self.invalidate_key_index([name])
+        self.schema.invalidate_column(name)
+        self.hidden_columns = {c + 1 if c >= position else c for c in self.hidden_columns}
+        if hidden:
+            self.hidden_columns.add(position)
+        self.search_index.invalidate_column(name)
+        self.filter_cache.bump_columns([name])
+
+    def remove_column_at(self, position):
+        """Supprime une colonne. Retourne (valeurs, lignes verrouillées, masquée)."""
+        name = self.df.columns[position]
+        values = self.df[name].copy()
+        self.df.drop(columns=[name], inplace=True)
+        self.search_index.invalidate_column(name)
+        self.filter_cache.bump_columns([name])
+
+        locked_rows = self.locks.pop_column(name)
+        self.invalidate_key_index([name])
+        self.schema.invalidate_column(name)
+        hidden = position in self.hidden_columns
+        self.hidden_columns = {c - 1 if c > position else c for c in self.hidden_columns if c != position}
+        return values, locked_rows, hidden
+
+    def set_column_name(self, old_name, new_name):
+        self.df.rename(columns={old_name: new_name}, inplace=True)
+        self.locks.rename_column(old_name, new_name)
+        if self.lazy:
+            self.lazy.rename_column(old_name, new_name)
+        self.schema.rename_column(old_name, new_name)
+        self.invalidate_key_index([old_name, new_name])
+        self.search_index.invalidate_column(old_name)
+        self.filter_cache.bump_columns([old_name, new_name])
+
+    def move_column_at(self, from_index, to_index):
+        order = list(range(len(self.df.columns)))
+        order.insert(to_index, order.pop(from_index))
+        self.df = self.df.iloc[:, order]
+
+        new_position = {old: new for new, old in enumerate(order)}
+        self.hidden_columns = {new_position[c] for c in self.hidden_columns}
+
+    def replace_column(self, name, values):
+        self.df[name] = values.set_axis(self.df.index)
+        self.invalidate_key_index([name])
+        self.schema.invalidate_column(name)
+        self.search_index.invalidate_column(name)
+        self.filter_cache.bump_columns([name])
+
+    def invalidate_key_index(self, columns):
+        # Colonne de la clé ajoutée, supprimée ou remplacée : reconstruction à la prochaine recherche
+        if any(column in self.key_index.columns for column in columns):
+            self.key_index.invalidate()
+
+    def set_locks(self, cells, locked):
+        for row_id, column in cells:
+            if locked:
+                self.locks.lock(row_id, column)
+            else:
+                self.locks.unlock(row_id, column)
@@ -0,0 +1,73 @@
+# visibility.py
+
+import numpy as np
+
+
+class RowVisibility:
+    """Visibilité des lignes sous forme de masques booléens composables.
+
+    Chaque source de filtrage (filtre avancé, recherche rapide, ...) dépose
+    son masque sous un nom ; la visibilité finale est leur ET logique, indexé
+    par position dans le DataFrame.
+    """
+
+    def __init__(self):
+        self.masks = {}
+        self.row_count = 0
+
+    def reset(self, row_count):
+        self.masks.clear()
+        self.row_count = row_count
+
+    def set_mask(self, name, mask):
+        mask = np.asarray(mask, dtype=bool)
+        if len(mask) != self.row_count:
+            raise ValueError(f"Masque '{name}' de longueur {len(mask)} pour {self.row_count} lignes")
+        self.masks[name] = mask
+
+    def clear_mask(self, name):
+        self.masks.pop(name, None)
+
+    def set_row(self, name, position, visible):
+        if name in self.masks:
+            self.masks[name][position] = visible
+        elif not visible:
+            mask = np.ones(self.row_count, dtype=bool)
+            mask[position] = False
+            self.masks[name] = mask
+
+    def remove_rows(self, positions):
+        """Retire des lignes (positions triées) de tous les masques, sans les recalculer."""
+        for name, mask in self.masks.items():
+            self.masks[name] = np.delete(mask, positions)
+        self.row_count -= len(positions)
+
+    def insert_rows(self, positions):
+        """Insère des lignes visibles aux positions finales `positions` (triées)."""
+        positions = np.asarray(positions)
+        insert_at = positions - np.arange(len(positions))  # positions avant insertion
+        for name, mask in self.masks.items():
+            self.masks[name] = np.insert(mask, insert_at, True)
+        self.row_count += len(positions)
+
+    def combined(self):
+        visible = np.ones(self.row_count, dtype=bool)
+        for mask in self.masks.values():
+            visible &= mask
+        return visible
+
+    def combined_row(self, position):
+        return all(mask[position] for mask in self.masks.values())
+
+    def visible_positions(self):
+        return np.flatnonzero(self.combined())
+
+
+def flipped_runs(positions):
+    """Regroupe des positions triées en plages contiguës [(début, fin), ...]."""
+    if len(positions) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(positions) != 1)
+    starts = np.concatenate(([positions[0]], positions[breaks + 1]))
+    ends = np.concatenate((positions[breaks], [positions[-1]]))
+    return list(zip(starts.tolist(), ends.tolist()))
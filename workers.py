@@ -0,0 +1,96 @@
+# workers.py
+
+from abc import ABCMeta, abstractmethod
+
+from PyQt5.QtCore import QSemaphore, QThread, pyqtSignal
+
+import importer
+import storage
+
+
+class WorkerMeta(type(QThread), ABCMeta):
+    """Métaclasse de QThread combinée à ABCMeta, pour les méthodes abstraites."""
+
+
+class StorageWorker(QThread, metaclass=WorkerMeta):
+    """Lecture / écriture de fichier hors du thread GUI.
+
+    L'avancement, le résultat et les erreurs reviennent par signaux (reçus
+    dans le thread GUI). L'annulation passe par requestInterruption() et est
+    prise en compte entre deux paquets de lignes.
+    """
+
+    progress = pyqtSignal(int, str)  # pourcentage, étape
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+
+    def run(self):
+        try:
+            result = self.work()
+        except storage.Cancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
+    @abstractmethod
+    def work(self):
+        """Lecture / écriture dans le thread du worker ; retourne le résultat émis par `succeeded`."""
+
+    def report(self, percent, message):
+        self.progress.emit(percent, message)
+
+
+class LoadWorker(StorageWorker):
+    """Charge un fichier ; résultat : (DataFrame, métadonnées)."""
+
+    def work(self):
+        return storage.load_table(self.path, self.report, self.isInterruptionRequested)
+
+
+class SaveWorker(StorageWorker):
+    """Sauvegarde un DataFrame ; la table reste en lecture seule pendant l'écriture."""
+
+    def __init__(self, path, df, metadata, parent=None):
+        super().__init__(path, parent)
+        self.df = df
+        self.metadata = metadata
+
+    def work(self):
+        storage.save_table(self.path, self.df, self.metadata, self.report, self.isInterruptionRequested)
+        return self.path
+
+
+class ImportWorker(StorageWorker):
+    """Lit un fichier d'import par paquets ; chaque paquet est remis au thread GUI.
+
+    Un seul paquet est en vol : le worker attend que le précédent ait été
+    ajouté à la table avant de lire le suivant, la mémoire reste donc
+    proportionnelle à la taille d'un paquet.
+    """
+
+    chunk_ready = pyqtSignal(object)
+
+    def __init__(self, path, parent=None):
+        super().__init__(path, parent)
+        self.consumed = QSemaphore(0)
+
+    def work(self):
+        count = 0
+        for chunk, percent in importer.iter_chunks(self.path):
+            storage.check_cancelled(self.isInterruptionRequested)
+            self.chunk_ready.emit(chunk)
+            while not self.consumed.tryAcquire(1, 100):
+                storage.check_cancelled(self.isInterruptionRequested)
+            count += len(chunk)
+            self.report(100 * percent, "Import des lignes")
+        return count
+
+    def chunk_done(self):
+        self.consumed.release()